@@ -0,0 +1,89 @@
+"""The cached analytics history against the SQL report paths and per-row loops.
+
+Run from backend/expensetracker:  python -m benchmarks.analytics [rows ...]
+
+For each history size every report is computed four ways: a loop over model
+instances, the SQL path (summaries/aggregates), and the columnar engine with
+the user's history already cached (warm) and loaded for the call (cold). The
+reports only take the columnar path warm; a cold miss goes to SQL, and the
+running balance always reads DailyBalance. Peak memory of loading one history
+is reported as well.
+"""
+import sys
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks import harness
+
+SIZES=[1000,10000,50000]
+
+
+def loops(user,spec):
+    # what the reports did before the derived tables: one instance per row
+    from expenses.models import Expense,Income
+    def rows(model):
+        return model.objects.filter(user=user,date__gte=spec.fromDate,date__lte=spec.toDate).select_related("category")
+    def totals():
+        income=sum((row.amount for row in rows(Income)),Decimal(0))
+        expense=sum((row.amount for row in rows(Expense)),Decimal(0))
+        return income-expense
+    def breakdown():
+        found={}
+        for row in rows(Expense):
+            found[row.category.name]=found.get(row.category.name,Decimal(0))+row.amount
+        return found
+    return {"totals":totals,"breakdown":breakdown}
+
+
+def sql(user,spec):
+    from expenses import summaries
+    return {
+        "totals":lambda:summaries.totals(user,spec),
+        "breakdown":lambda:summaries.category_totals_by_kind(user,["expense"],spec),
+    }
+
+
+def columnar(history_of,spec):
+    from expenses import analytics
+    return {
+        "totals":lambda:analytics.totals(history_of(),spec),
+        "breakdown":lambda:analytics.category_totals_by_kind(history_of(),["expense"],spec),
+    }
+
+
+def main(sizes):
+    harness.setup()
+    from datetime import date,timedelta
+    from expenses import analytics,filters
+    rows=[]
+    with harness.test_database():
+        for n,size in enumerate(sizes):
+            user=harness.seed_user(f"columns{n}@example.com",expenses=size//2,incomes=size//2,days=1500,seed=n)
+            today=date.today()
+            specs={
+                "one year":filters.Filters(today-timedelta(days=365),today),
+                "one year, 10-200":filters.Filters(today-timedelta(days=365),today,amount_min="10",amount_max="200"),
+            }
+            tracemalloc.start()
+            history=analytics.load(user)
+            peak=tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{size} rows: history peak {peak/1024:.0f} KiB while loading")
+            for label,spec in specs.items():
+                ways={
+                    "loops":loops(user,spec),
+                    "sql":sql(user,spec),
+                    "columnar warm":columnar(lambda:history,spec),
+                    "columnar cold":columnar(lambda:analytics.load(user),spec),
+                }
+                for report in ways["sql"]:
+                    results={name:harness.measure(reports[report]) for name,reports in ways.items()}
+                    rows.append([
+                        size,label,report,
+                        *(f"{results[name]['ms']:.2f} ({results[name]['queries']}q)" for name in ways),
+                    ])
+    harness.print_table(["rows","range","report","loops ms","sql ms","columnar warm ms","columnar cold ms"],rows)
+
+
+if __name__=="__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
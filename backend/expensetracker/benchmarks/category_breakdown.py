@@ -0,0 +1,39 @@
+"""Query count and latency of the category breakdown endpoints.
+
+Run from backend/expensetracker:  python -m benchmarks.category_breakdown
+
+The summary cache runs with the dummy backend so every call computes. Each
+endpoint is measured as served, where whole months come from MonthlySummary,
+and with an amount filter that keeps no summary path, so the grouped query
+over the raw rows is what gets timed.
+"""
+from benchmarks import harness
+
+SIZES=[(10,100),(100,1000),(300,5000)]
+# amount filters bypass MonthlySummary; every seeded amount is at least this
+RAW_ROWS={"amount_min":"0.01"}
+
+
+def main():
+    harness.setup()
+    from django.test import override_settings
+    from expenses.views import expense_views,income_views
+    rows=[]
+    with harness.test_database(),override_settings(SUMMARY_CACHE={"BACKEND":"dummy"}):
+        for n,(categories,transactions) in enumerate(SIZES):
+            user=harness.seed_user(
+                f"bench{n}@example.com",
+                categories=categories,
+                expenses=transactions,
+                incomes=transactions,
+                seed=n
+            )
+            for name,view in [("expense_category",expense_views.expense_category),("income_category",income_views.income_category)]:
+                for path,params in [("summaries",{}),("raw rows",RAW_ROWS)]:
+                    result=harness.measure(lambda:harness.call_view(view,user,**params))
+                    rows.append([name,path,categories,transactions,result["queries"],f"{result['ms']:.2f}"])
+    harness.print_table(["endpoint","path","categories","rows","queries","median ms"],rows)
+
+
+if __name__=="__main__":
+    main()
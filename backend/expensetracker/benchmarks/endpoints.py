@@ -0,0 +1,286 @@
+"""Latency, query count and peak memory of every route in user_urls,
+expense_urls and income_urls, compared against a stored baseline.
+
+Run from backend/expensetracker:
+
+    python -m benchmarks.endpoints --save benchmarks/baseline.json
+    ... change something ...
+    python -m benchmarks.endpoints --baseline benchmarks/baseline.json
+
+Requests go through the full middleware stack with the test client, on a
+throwaway test database seeded with seeding.seed_user. Each route is called
+once under CaptureQueriesContext, once under tracemalloc, then --repeat times
+for timing, so neither instrument skews the latency numbers. Mutating routes
+get fresh rows from their setup step, which is not timed. Throttling is
+switched off, every request comes from the same address.
+"""
+import argparse
+import io
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks import harness
+
+PASSWORD="bench-password"
+
+
+class Context:
+    # the seeded user plus a counter for unique names across iterations
+    def __init__(self,user,admin):
+        from rest_framework_simplejwt.tokens import AccessToken
+        self.user=user
+        self.admin=admin
+        self.tokens={user.id:str(AccessToken.for_user(user)),admin.id:str(AccessToken.for_user(admin))}
+        self.counter=itertools.count()
+
+    def client(self,user=None):
+        # a fresh client per request: login/logout and pinning set cookies
+        from rest_framework.test import APIClient
+        client=APIClient()
+        if user is not None:
+            client.cookies["access_token"]=self.tokens[user.id]
+        return client
+
+    def unique(self,stem):
+        return f"{stem}{next(self.counter)}"
+
+
+def item(ctx,kind,**extra):
+    name="source" if kind=="income" else "title"
+    return {name:ctx.unique("bench "),"amount":"12.50","category":"bench","date":"2025-01-15","notes":"",**extra}
+
+
+def create(ctx,kind,count=1):
+    response=ctx.client(ctx.user).post(f"/{kind}/bulk/",[item(ctx,kind) for _ in range(count)],format="json")
+    return [row["id"] for row in response.data["created"]]
+
+
+def first_id(ctx,kind):
+    from expenses.models import Expense,Income
+    model=Income if kind=="income" else Expense
+    return model.objects.filter(user=ctx.user).order_by("id").values_list("id",flat=True).first()
+
+
+def pending_user(ctx):
+    from django.contrib.auth.models import User
+    from django.utils.encoding import force_bytes
+    from django.utils.http import urlsafe_base64_encode
+    from expenses.views.user_views import token_generator
+    user=User.objects.create_user(username=ctx.unique("pending")+"@example.com",password=PASSWORD,is_active=False)
+    return urlsafe_base64_encode(force_bytes(user.pk)),token_generator.make_token(user)
+
+
+def statement(ctx):
+    rows=[f"{ctx.unique('import ')},-{n+1}.25,bench,2025-02-0{n+1},,expense" for n in range(5)]
+    upload=io.BytesIO(("title,amount,category,date,notes,kind\n"+"\n".join(rows)+"\n").encode())
+    upload.name="statement.csv"
+    return upload
+
+
+def reports(prefix,paths):
+    return {f"GET /{prefix}/{path}":lambda ctx,path=path:("get",f"/{prefix}/{path}",{"from":"2024-01-01","to":"2025-12-31"},ctx.user) for path in paths}
+
+
+def transaction_specs(kind):
+    # the routes expense_urls and income_urls have in common
+    def edit(ctx):
+        row_id=first_id(ctx,kind)
+        return "put",f"/{kind}/",item(ctx,kind,id=row_id,categoryName="bench"),ctx.user
+
+    def bulk_update(ctx):
+        ids=create(ctx,kind,50)
+        return "put",f"/{kind}/bulk/",[item(ctx,kind,id=row_id) for row_id in ids],ctx.user
+
+    return {
+        f"GET /{kind}/":lambda ctx:("get",f"/{kind}/",{"from":"2024-01-01","to":"2025-12-31"},ctx.user),
+        f"POST /{kind}/":lambda ctx:("post",f"/{kind}/",item(ctx,kind),ctx.user),
+        f"PUT /{kind}/":edit,
+        f"POST /{kind}/bulk/":lambda ctx:("post",f"/{kind}/bulk/",[item(ctx,kind) for _ in range(50)],ctx.user),
+        f"PUT /{kind}/bulk/":bulk_update,
+        f"DELETE /{kind}/bulk/":lambda ctx:("delete",f"/{kind}/bulk/",create(ctx,kind,50),ctx.user),
+        f"GET /{kind}/<int:id>":lambda ctx:("get",f"/{kind}/{first_id(ctx,kind)}",None,ctx.user),
+        f"DELETE /{kind}/<int:id>":lambda ctx:("delete",f"/{kind}/{create(ctx,kind)[0]}",None,ctx.user),
+    }
+
+
+# "METHOD route" -> setup(ctx) returning (method, path, data, user)
+SPECS={
+    "POST /users/login/":lambda ctx:("post","/users/login/",{"username":ctx.user.username,"password":PASSWORD},None),
+    "POST /users/register/":lambda ctx:("post","/users/register/",{
+        "name":"Bench","email":ctx.unique("register")+"@example.com","password":"a-Long-bench-pass-42"
+    },None),
+    "POST /users/logout/":lambda ctx:("post","/users/logout/",None,ctx.user),
+    "POST /users/import/":lambda ctx:("multipart","/users/import/",{"file":statement(ctx)},ctx.user),
+    "HEAD /users/health/":lambda ctx:("head","/users/health/",None,None),
+    "GET /users/fetch/":lambda ctx:("get","/users/fetch/",None,ctx.user),
+    "POST /users/forgot-password/":lambda ctx:("post","/users/forgot-password/",{"email":ctx.user.email},None),
+    "POST /users/reset-password/":lambda ctx:("post","/users/reset-password/",dict(zip(("uid","token"),pending_user(ctx)),password="a-Long-bench-pass-42"),None),
+    "POST /users/verify-email/":lambda ctx:("post","/users/verify-email/",dict(zip(("uid","token"),pending_user(ctx))),None),
+    "GET /users/cache-stats/":lambda ctx:("get","/users/cache-stats/",None,ctx.admin),
+    "GET /users/trend/":lambda ctx:("get","/users/trend/",{"window":30,"from":"2024-01-01","to":"2025-12-31"},ctx.user),
+    "GET /users/categories/":lambda ctx:("get","/users/categories/",None,ctx.user),
+    "GET /users/search/":lambda ctx:("get","/users/search/",{"q":"groceries","limit":20},ctx.user),
+    "GET /users/rollup/":lambda ctx:("get","/users/rollup/",{"granularity":"month","from":"2024-01-01","to":"2025-12-31"},ctx.user),
+    **reports("users",["transactions/","total/","recent-total/","transactions-total/","transactions/csv/","dashboard/"]),
+    **reports("expense",["expenseCategory/","transactions/","transactions/csv/"]),
+    **reports("income",["categoryIncome/","transactions/","transactions/csv/"]),
+    **transaction_specs("expense"),
+    **transaction_specs("income"),
+}
+
+
+def routes():
+    # every route the three url modules define, as "/prefix/pattern"
+    from importlib import import_module
+    found=[]
+    for prefix,module in (("users","user_urls"),("expense","expense_urls"),("income","income_urls")):
+        for pattern in import_module(f"expenses.urls.{module}").urlpatterns:
+            found.append(f"/{prefix}/{pattern.pattern}")
+    return found
+
+
+def uncovered():
+    covered={key.split(" ")[-1] for key in SPECS}
+    return [route for route in routes() if route not in covered]
+
+
+def call(ctx,spec):
+    method,path,data,user=spec(ctx)
+    client=ctx.client(user)
+    if method=="get":
+        response=client.get(path,data)
+    elif method=="head":
+        response=client.head(path)
+    elif method=="multipart":
+        response=client.post(path,data,format="multipart")
+    else:
+        response=getattr(client,method)(path,data,format="json")
+    # streaming bodies do their work while being read
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def timed(ctx,spec):
+    # setup runs before the clock starts
+    prepared=spec(ctx)
+    started=time.perf_counter()
+    call(ctx,lambda ctx:prepared)
+    return time.perf_counter()-started
+
+
+def measure(ctx,spec,repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    prepared=spec(ctx)
+    with CaptureQueriesContext(connection) as captured:
+        status=call(ctx,lambda ctx:prepared)
+    # read now, the next request_started clears the connection's query log
+    queries=len(captured)
+    prepared=spec(ctx)
+    tracemalloc.start()
+    try:
+        call(ctx,lambda ctx:prepared)
+        peak=tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    timings=sorted(timed(ctx,spec) for _ in range(repeat))
+    return {
+        "status":status,
+        "queries":queries,
+        "peak_kib":round(peak/1024,1),
+        "p50_ms":round(timings[len(timings)//2]*1000,2),
+        "p95_ms":round(timings[min(len(timings)-1,int(len(timings)*0.95))]*1000,2),
+    }
+
+
+def change(new,old,percent=True):
+    if old is None:
+        return "new"
+    if percent:
+        return f"{(new-old)/old*100:+.0f}%" if old else "-"
+    return f"{new-old:+d}"
+
+
+def regressions(results,baseline,tolerance):
+    # routes whose query count grew, or whose p50 grew past tolerance percent
+    slower=[]
+    for key,result in results.items():
+        old=baseline.get(key)
+        if old is None:
+            continue
+        if result["queries"]>old["queries"] or (old["p50_ms"] and result["p50_ms"]>old["p50_ms"]*(1+tolerance/100)):
+            slower.append(key)
+    return slower
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses",type=int,default=2000)
+    parser.add_argument("--incomes",type=int,default=500)
+    parser.add_argument("--categories",type=int,default=20)
+    parser.add_argument("--repeat",type=int,default=20)
+    parser.add_argument("--only",help="substring of the routes to run")
+    parser.add_argument("--save",help="write the results to this JSON file")
+    parser.add_argument("--baseline",help="compare against a JSON file written by --save")
+    parser.add_argument("--tolerance",type=float,help="exit 1 when a route's p50 grows by more than this percent, or its query count grows")
+    args=parser.parse_args()
+
+    harness.setup()
+    missing=uncovered()
+    if missing:
+        sys.exit(f"no benchmark for: {', '.join(missing)}")
+    baseline={}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline=json.load(f)["endpoints"]
+
+    from django.test import override_settings
+    from expenses import seeding
+    results={}
+    with harness.test_database(),override_settings(THROTTLING={"ENABLED":False}):
+        user=seeding.seed_user(
+            "bench@example.com",
+            categories=args.categories,
+            expenses=args.expenses,
+            incomes=args.incomes,
+            days=730
+        )
+        from django.contrib.auth.models import User
+        admin=User.objects.create_superuser("admin@example.com","admin@example.com",PASSWORD)
+        ctx=Context(user,admin)
+        for key,spec in SPECS.items():
+            if args.only and args.only not in key:
+                continue
+            results[key]=measure(ctx,spec,args.repeat)
+
+    rows=[]
+    for name,result in results.items():
+        old=baseline.get(name)
+        rows.append([
+            name,result["status"],
+            result["p50_ms"],change(result["p50_ms"],old and old["p50_ms"]),
+            result["p95_ms"],
+            result["queries"],change(result["queries"],old and old["queries"],percent=False),
+            result["peak_kib"],change(result["peak_kib"],old and old["peak_kib"]),
+        ])
+    harness.print_table(["endpoint","status","p50 ms","Δ","p95 ms","queries","Δ","peak KiB","Δ"],rows)
+
+    if args.save:
+        with open(args.save,"w") as f:
+            json.dump({
+                "rows":{"expenses":args.expenses,"incomes":args.incomes,"categories":args.categories},
+                "endpoints":results
+            },f,indent=2,sort_keys=True)
+    if baseline and args.tolerance is not None:
+        slower=regressions(results,baseline,args.tolerance)
+        if slower:
+            sys.exit(f"regressed: {', '.join(slower)}")
+
+
+if __name__=="__main__":
+    main()
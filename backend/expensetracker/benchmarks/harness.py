@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+
+PROJECT_DIR=Path(__file__).resolve().parent.parent
+
+
+def setup():
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0,str(PROJECT_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE","expensetracker.settings")
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    # benchmarks never touch the configured database, only a throwaway test copy
+    from django.db import connection
+    from django.test.utils import setup_test_environment,teardown_test_environment
+    setup_test_environment(debug=False)
+    old_name=connection.creation.create_test_db(verbosity=0,autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name,verbosity=0)
+        teardown_test_environment()
+
+
+def seed_user(username,categories=10,expenses=100,incomes=100,days=365,seed=0):
+    from expenses.seeding import seed_user
+    return seed_user(username,categories,expenses,incomes,days,seed)
+
+
+def call_view(view,user,path="/",**params):
+    from rest_framework.test import APIRequestFactory,force_authenticate
+    request=APIRequestFactory().get(path,params)
+    force_authenticate(request,user=user)
+    return view(request)
+
+
+def measure(fn,repeat=5):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as ctx:
+        fn()
+    queries=len(ctx.captured_queries)
+    timings=[]
+    for _ in range(repeat):
+        started=time.perf_counter()
+        fn()
+        timings.append(time.perf_counter()-started)
+    timings.sort()
+    return {"queries":queries,"ms":timings[len(timings)//2]*1000}
+
+
+def print_table(headers,rows):
+    widths=[max(len(str(h)),*(len(str(r[i])) for r in rows)) for i,h in enumerate(headers)]
+    line="  ".join(str(h).ljust(w) for h,w in zip(headers,widths))
+    print(line)
+    print("-"*len(line))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c,w in zip(row,widths)))
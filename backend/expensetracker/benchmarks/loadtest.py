@@ -0,0 +1,124 @@
+"""p50/p99 latency and throughput of the reporting endpoints under concurrent load.
+
+Start the two deployment profiles against the same database, e.g.
+
+    gunicorn expensetracker.wsgi:application --workers 2 -b 127.0.0.1:8000
+    uvicorn expensetracker.asgi:application --workers 2 --port 8001
+
+then run from backend/expensetracker:
+
+    python -m benchmarks.loadtest --user someone@example.com \\
+        --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001/async
+
+The async routes mirror the sync paths under /async/, so one path list serves
+both targets. --user mints an access token from the configured database;
+pass --token instead when the servers use a database this shell cannot reach.
+Start the servers with THROTTLE_ENABLED=false, or the run measures 429s.
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import harness
+
+PATHS=[
+    "/users/total/",
+    "/users/recent-total/",
+    "/users/transactions/",
+    "/users/transactions-total/",
+    "/expense/expenseCategory/",
+    "/income/categoryIncome/",
+    "/users/transactions/csv/",
+]
+
+
+def access_token(username):
+    harness.setup()
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+    return str(AccessToken.for_user(User.objects.get(username=username)))
+
+
+def fetch(url,token):
+    request=urllib.request.Request(url,headers={"Cookie":f"access_token={token}"})
+    started=time.perf_counter()
+    try:
+        with urllib.request.urlopen(request,timeout=60) as response:
+            while response.read(64*1024):
+                pass
+            ok=response.status==200
+    except (urllib.error.URLError,OSError):
+        ok=False
+    return time.perf_counter()-started,ok
+
+
+def run(url,token,concurrency,duration):
+    # every worker loops on the same URL until the deadline
+    timings=[]
+    errors=0
+    lock=threading.Lock()
+    deadline=time.perf_counter()+duration
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter()<deadline:
+            elapsed,ok=fetch(url,token)
+            with lock:
+                timings.append(elapsed)
+                errors+=not ok
+
+    started=time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall=time.perf_counter()-started
+    timings.sort()
+    return {
+        "requests":len(timings),
+        "errors":errors,
+        "p50":percentile(timings,50)*1000,
+        "p99":percentile(timings,99)*1000,
+        "rps":len(timings)/wall,
+    }
+
+
+def percentile(timings,p):
+    if not timings:
+        return 0
+    return timings[min(len(timings)-1,int(len(timings)*p/100))]
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target",action="append",required=True,help="NAME=BASE_URL, repeatable")
+    parser.add_argument("--user",help="username to mint an access token for")
+    parser.add_argument("--token",help="access token cookie value")
+    parser.add_argument("--path",action="append",help="endpoint path, repeatable (default: reporting endpoints)")
+    parser.add_argument("--concurrency",type=int,default=20)
+    parser.add_argument("--duration",type=float,default=10)
+    args=parser.parse_args()
+    if not args.token and not args.user:
+        parser.error("pass --user or --token")
+    token=args.token or access_token(args.user)
+    targets=[target.split("=",1) for target in args.target]
+    rows=[]
+    for path in args.path or PATHS:
+        for name,base in targets:
+            result=run(base.rstrip("/")+path,token,args.concurrency,args.duration)
+            rows.append([
+                path,
+                name,
+                result["requests"],
+                result["errors"],
+                f"{result['p50']:.1f}",
+                f"{result['p99']:.1f}",
+                f"{result['rps']:.1f}",
+            ])
+    harness.print_table(["endpoint","target","requests","errors","p50 ms","p99 ms","req/s"],rows)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Decimal amounts against integer cents on the paths money goes through.
+
+Run from backend/expensetracker:  python -m benchmarks.money [rows ...]
+
+Per history size: the expense list serialized with DRF's DecimalField and with
+serializers.MoneyField, the expense CSV export reading Decimals and reading
+cents, and a running balance added up in Decimals and in ints.
+"""
+import sys
+from itertools import accumulate
+
+from benchmarks import harness
+
+SIZES=[1000,10000,50000]
+
+
+def main(sizes):
+    harness.setup()
+    from rest_framework import serializers
+    from expenses import exports,money
+    from expenses.models import Expense
+    from expenses.serializers import ExpenseSerializer
+
+    class DecimalExpenseSerializer(ExpenseSerializer):
+        # what the list used before MoneyField
+        amount=serializers.DecimalField(max_digits=20,decimal_places=2)
+
+    def decimal_csv(user):
+        rows=Expense.objects.filter(user=user).order_by("-date","-id").values_list("title","amount","category__name","date","notes")
+        # the csv writer str()s every field, done here so both sides yield text amounts
+        return [(title,str(-amount),category,day,notes) for title,amount,category,day,notes in rows.iterator(chunk_size=2000)]
+
+    rows=[]
+    with harness.test_database():
+        for n,size in enumerate(sizes):
+            user=harness.seed_user(f"money{n}@example.com",expenses=size,incomes=0,days=1500,seed=n)
+            listed=list(Expense.objects.filter(user=user).select_related("category"))
+            amounts=[row.amount for row in listed]
+            cents=[money.to_cents(amount) for amount in amounts]
+            ways=[
+                ("serialize list",lambda:DecimalExpenseSerializer(listed,many=True).data,lambda:ExpenseSerializer(listed,many=True).data),
+                ("csv rows",lambda:decimal_csv(user),lambda:list(exports.expense_rows(user))),
+                ("running balance",lambda:list(accumulate(amounts)),lambda:list(accumulate(cents))),
+            ]
+            for label,decimal,integer in ways:
+                before=harness.measure(decimal)
+                after=harness.measure(integer)
+                rows.append([size,label,f"{before['ms']:.2f}",f"{after['ms']:.2f}",f"{before['ms']/after['ms']:.1f}x"])
+    harness.print_table(["rows","path","decimal ms","cents ms","speedup"],rows)
+
+
+if __name__=="__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
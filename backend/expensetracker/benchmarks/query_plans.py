@@ -0,0 +1,99 @@
+"""EXPLAIN (ANALYZE on Postgres) of the hot report queries with and without
+the (user, date, id) and (user, category, date) indexes.
+
+Run from backend/expensetracker:  python -m benchmarks.query_plans [--users N] [--rows N] [--plans]
+"""
+import argparse
+import time
+from datetime import date,timedelta
+
+from benchmarks import harness
+
+
+def hot_queries(user,category_id):
+    from django.db.models import Count,Sum
+    from expenses import feed,filters
+    from expenses.models import Category,Expense,Income
+    start=date.today()-timedelta(days=90)
+    end=date.today()
+    # what GET /expense/ and /income/ build through expenses.filters
+    days=filters.Filters(start,end)
+    names=Category.objects.filter(expense__user=user).values_list("name",flat=True).distinct()[:2]
+    narrow=filters.Filters(start,None,names,amount_min=10,amount_max=200,sort=["-amount"])
+    def listed(model,spec):
+        return filters.order(filters.apply(model.objects.filter(user=user),spec),spec)
+    return [
+        ("expense list, 90 days",listed(Expense,days)),
+        ("income list, 90 days",listed(Income,days)),
+        ("expense list, two categories and amounts",listed(Expense,narrow)),
+        ("expense list, one category",Expense.objects.filter(user=user,category_id=category_id,date__gte=start,date__lte=end)),
+        ("recent expenses",Expense.objects.filter(user=user).order_by("-date","-id")[:10]),
+        ("category breakdown",Expense.objects.filter(user=user,date__gte=start,date__lte=end)
+            .values("category_id").annotate(total=Sum("amount"),count=Count("id")).order_by("category_id")),
+        ("feed page",feed.transactions(user)[:10]),
+    ]
+
+
+def run(queries,plans,repeat=5):
+    from django.db import connection
+    results={}
+    for name,queryset in queries:
+        if connection.vendor=="postgresql":
+            plan=queryset.explain(analyze=True,buffers=True)
+        else:
+            plan=queryset.explain()
+        timings=[]
+        for _ in range(repeat):
+            started=time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter()-started)
+        timings.sort()
+        results[name]=timings[len(timings)//2]*1000
+        if plans:
+            print(f"--- {name}\n{plan}\n")
+    return results
+
+
+def drop_indexes():
+    from django.db import connection
+    from expenses.models import Expense,Income
+    with connection.schema_editor() as editor:
+        for model in [Expense,Income]:
+            for index in model._meta.indexes:
+                editor.remove_index(model,index)
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--users",type=int,default=20)
+    parser.add_argument("--rows",type=int,default=5000,help="expense and income rows per user")
+    parser.add_argument("--plans",action="store_true",help="print every query plan")
+    args=parser.parse_args()
+    harness.setup()
+    with harness.test_database():
+        users=[
+            harness.seed_user(f"plan{n:04d}@x",categories=10,expenses=args.rows,incomes=args.rows,days=1500,seed=n)
+            for n in range(args.users)
+        ]
+        from django.db import connection
+        from expenses.models import Expense
+        user=users[len(users)//2]
+        category_id=Expense.objects.filter(user=user).values_list("category_id",flat=True).first()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        if args.plans:
+            print("=== with indexes")
+        indexed=run(hot_queries(user,category_id),args.plans)
+        drop_indexes()
+        if args.plans:
+            print("=== without indexes")
+        plain=run(hot_queries(user,category_id),args.plans)
+    rows=[
+        [name,f"{plain[name]:.2f}",f"{indexed[name]:.2f}",f"{plain[name]/max(indexed[name],1e-6):.1f}x"]
+        for name in indexed
+    ]
+    harness.print_table(["query","no index ms","indexed ms","speedup"],rows)
+
+
+if __name__=="__main__":
+    main()
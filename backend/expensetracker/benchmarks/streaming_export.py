@@ -0,0 +1,46 @@
+"""Peak Python memory of the streaming CSV exports as history grows.
+
+Run from backend/expensetracker:  python -m benchmarks.streaming_export [rows ...]
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks import harness
+
+SIZES=[1000,10000,100000]
+
+
+def consume(response):
+    size=0
+    for chunk in response.streaming_content:
+        size+=len(chunk)
+    return size
+
+
+def main(sizes):
+    harness.setup()
+    from expenses.views import expense_views,income_views,user_views
+    views=[
+        ("users/transactions/csv",user_views.export_csv,{}),
+        ("users/transactions/csv?gzip=1",user_views.export_csv,{"gzip":"1"}),
+        ("expense/transactions/csv",expense_views.export_csv,{}),
+        ("income/transactions/csv",income_views.export_csv,{}),
+    ]
+    rows=[]
+    with harness.test_database():
+        for n,size in enumerate(sizes):
+            user=harness.seed_user(f"export{n}@example.com",expenses=size//2,incomes=size//2,days=3650,seed=n)
+            for name,view,params in views:
+                tracemalloc.start()
+                started=time.perf_counter()
+                written=consume(harness.call_view(view,user,**params))
+                elapsed=time.perf_counter()-started
+                peak=tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append([name,size,f"{written/1024:.0f}",f"{peak/1024:.0f}",f"{elapsed*1000:.0f}"])
+    harness.print_table(["endpoint","rows","output KiB","peak KiB","ms"],rows)
+
+
+if __name__=="__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
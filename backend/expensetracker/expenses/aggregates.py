@@ -0,0 +1,62 @@
+from django.db.models import Sum,Count
+
+from expenses import filters,money
+from expenses.models import Expense,Income
+
+
+def category_rows(model,user,spec=filters.EMPTY):
+    rows=filters.apply(model.objects.filter(user=user),spec)
+    return rows.values("category_id","category__name").annotate(
+        total=Sum("amount"),
+        count=Count("id")
+    ).order_by("category_id")
+
+
+def _category_total(row):
+    return {
+        "id":row["category_id"],
+        "name":row["category__name"],
+        "total":row["total"],
+        "count":row["count"]
+    }
+
+
+def category_totals(model,user,spec=filters.EMPTY):
+    # one grouped query per user and filter spec, SUM over the stored cents
+    return [_category_total(row) for row in category_rows(model,user,spec)]
+
+
+def category_breakdown(model,user,spec=filters.EMPTY):
+    return breakdown(category_totals(model,user,spec))
+
+
+def breakdown(totals):
+    return {
+        "category_name":[i["name"] for i in totals],
+        "category_frequency":[i["total"] for i in totals],
+        "category_count":[i["count"] for i in totals]
+    }
+
+
+def _user_rows(model,user,spec):
+    return filters.apply(model.objects.filter(user=user),spec)
+
+
+def _totals(income,expense):
+    income=income["total"] or money.ZERO
+    expense=expense["total"] or money.ZERO
+    return {"total amount":income-expense,"total income":income,"total expense":expense}
+
+
+def totals(user,spec=filters.EMPTY):
+    return _totals(
+        _user_rows(Income,user,spec).aggregate(total=Sum("amount")),
+        _user_rows(Expense,user,spec).aggregate(total=Sum("amount"))
+    )
+
+
+def totals_from_categories(income_totals,expense_totals):
+    # the same numbers as totals(), derived from category rows already fetched
+    income=sum((i["total"] for i in income_totals),money.ZERO)
+    expense=sum((i["total"] for i in expense_totals),money.ZERO)
+    return {"total amount":income-expense,"total income":income,"total expense":expense}
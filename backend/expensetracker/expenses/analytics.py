@@ -0,0 +1,257 @@
+import threading
+from array import array
+from bisect import bisect_left,bisect_right
+from collections import Counter,OrderedDict,defaultdict
+from datetime import date
+from itertools import accumulate,compress
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from expenses import filters,money,versions
+from expenses.models import Category,Expense,Income
+
+# The history behind /users/trend/: a user's rows as typed columns, one set
+# per kind, sorted by date (int32 day ordinals, int64 cents and int32 category
+# ids, about 16 bytes a row against the ~1 KB of a model instance), cached per
+# user until DataVersion moves. The trend's moving average needs every day's
+# net, which SQL would hand over row by row anyway.
+#
+# This is not a vectorized engine. Date ranges are two bisects and plain sums
+# run over array slices in C, but category and amount filters and group-bys
+# are Python loops over the rows. The other reports stay on SQL, DailyBalance
+# and MonthlySummary. With ENABLED, totals and category breakdowns only reuse
+# a history the trend has already cached for the request's version; they
+# never load one, since a cold load loses to the grouped SQL. Specs with text
+# always go to SQL.
+
+DEFAULTS={
+    "ENABLED":False,
+    "MAX_USERS":256,
+    "MAX_ROWS":2000000,
+}
+
+
+def config():
+    return {**DEFAULTS,**getattr(settings,"ANALYTICS",{})}
+
+
+def applies(spec):
+    return config()["ENABLED"] and not spec.text
+
+
+class Columns:
+    __slots__=("days","cents","categories")
+
+    def __init__(self,rows):
+        # rows: (date, cents, category id) ordered by date
+        self.days=array("i",[row[0].toordinal() for row in rows])
+        self.cents=array("q",[row[1] for row in rows])
+        self.categories=array("i",[row[2] for row in rows])
+
+    def __len__(self):
+        return len(self.days)
+
+    def bounds(self,fromDate=None,toDate=None):
+        lo=bisect_left(self.days,fromDate.toordinal()) if fromDate else 0
+        hi=bisect_right(self.days,toDate.toordinal()) if toDate else len(self.days)
+        return lo,hi
+
+    def select(self,spec,category_ids):
+        # (days, cents, categories) of the rows spec keeps
+        lo,hi=self.bounds(spec.fromDate,spec.toDate)
+        days,cents,categories=self.days[lo:hi],self.cents[lo:hi],self.categories[lo:hi]
+        keep=None
+        if category_ids is not None:
+            keep=[category in category_ids for category in categories]
+        if spec.amount_min is not None or spec.amount_max is not None:
+            low=money.to_cents(spec.amount_min) if spec.amount_min is not None else None
+            high=money.to_cents(spec.amount_max) if spec.amount_max is not None else None
+            amounts=[(low is None or c>=low) and (high is None or c<=high) for c in cents]
+            keep=amounts if keep is None else [a and b for a,b in zip(keep,amounts)]
+        if keep is None:
+            return days,cents,categories
+        return (
+            array("i",compress(days,keep)),
+            array("q",compress(cents,keep)),
+            array("i",compress(categories,keep)),
+        )
+
+
+class History:
+    __slots__=("income","expense","names","keys")
+
+    def __init__(self,income,expense,names):
+        self.income=income
+        self.expense=expense
+        # category id -> (name, key)
+        self.names=names
+        self.keys={key:category_id for category_id,(name,key) in names.items()}
+
+    def __len__(self):
+        return len(self.income)+len(self.expense)
+
+    def kind(self,kind):
+        return self.income if kind=="income" else self.expense
+
+    def category_ids(self,spec):
+        if not spec.categories:
+            return None
+        return {self.keys[key] for key in spec.categories if key in self.keys}
+
+
+def load(user):
+    columns={}
+    for kind,model in (("income",Income),("expense",Expense)):
+        rows=model.objects.filter(user=user).order_by("date","id").values_list(
+            "date",money.cents("amount"),"category_id"
+        )
+        columns[kind]=Columns(list(rows))
+    ids=set(columns["income"].categories)|set(columns["expense"].categories)
+    names={
+        category_id:(name,key)
+        for category_id,name,key in Category.objects.filter(id__in=ids).values_list("id","name","key")
+    }
+    return History(columns["income"],columns["expense"],names)
+
+
+class HistoryCache:
+    # user id -> (version, History), least recently used first; bounded by users
+    # and by rows in total so one huge account cannot pin the worker's memory
+    def __init__(self,max_users=256,max_rows=2000000):
+        self.max_users=max_users
+        self.max_rows=max_rows
+        self.entries=OrderedDict()
+        self.rows=0
+        self.lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+
+    def get(self,user_id,version):
+        with self.lock:
+            entry=self.entries.get(user_id)
+            if entry and entry[0]==version:
+                self.entries.move_to_end(user_id)
+                self.hits+=1
+                return entry[1]
+            self.misses+=1
+        return None
+
+    def store(self,user_id,version,history):
+        if len(history)>self.max_rows:
+            return
+        with self.lock:
+            old=self.entries.pop(user_id,None)
+            if old:
+                self.rows-=len(old[1])
+            self.entries[user_id]=(version,history)
+            self.rows+=len(history)
+            while len(self.entries)>self.max_users or self.rows>self.max_rows:
+                _,(_,evicted)=self.entries.popitem(last=False)
+                self.rows-=len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.rows=0
+
+    def stats(self):
+        with self.lock:
+            return {"users":len(self.entries),"rows":self.rows,"hits":self.hits,"misses":self.misses}
+
+
+_history_cache=None
+
+
+def get_history_cache():
+    global _history_cache
+    if _history_cache is None:
+        conf=config()
+        _history_cache=HistoryCache(conf["MAX_USERS"],conf["MAX_ROWS"])
+    return _history_cache
+
+
+@receiver(setting_changed)
+def reset_history_cache(setting,**kwargs):
+    global _history_cache
+    if setting=="ANALYTICS":
+        _history_cache=None
+
+
+def history(user,version=None):
+    # a conditional view has already read the version for its ETag
+    if version is None:
+        version=versions.current(user.id)
+    cache=get_history_cache()
+    found=cache.get(user.id,version)
+    if found is None:
+        found=load(user)
+        cache.store(user.id,version,found)
+    return found
+
+
+def cached(user,spec,version):
+    # the history the reports may use, or None for the SQL path: never loads,
+    # and without the view's version checking would cost a DataVersion query
+    if version is None or not applies(spec):
+        return None
+    return get_history_cache().get(user.id,version)
+
+
+# reports, in the shapes summaries and ledger return
+
+def category_totals_by_kind(history,kinds,spec=filters.EMPTY):
+    ids=history.category_ids(spec)
+    result={}
+    for kind in kinds:
+        _,cents,categories=history.kind(kind).select(spec,ids)
+        totals=defaultdict(int)
+        for category,amount in zip(categories,cents):
+            totals[category]+=amount
+        counts=Counter(categories)
+        result[kind]=[
+            {"id":category,"name":history.names[category][0],"total":money.from_cents(totals[category]),"count":counts[category]}
+            for category in sorted(totals)
+        ]
+    return result
+
+
+def totals(history,spec=filters.EMPTY):
+    ids=history.category_ids(spec)
+    income=sum(history.income.select(spec,ids)[1])
+    expense=sum(history.expense.select(spec,ids)[1])
+    return {
+        "total amount":money.from_cents(income-expense),
+        "total income":money.from_cents(income),
+        "total expense":money.from_cents(expense)
+    }
+
+
+def daily_net(history,fromDate=None,toDate=None):
+    # (day ordinals, net cents) for every day with a row, oldest first
+    nets=defaultdict(int)
+    for columns,sign in ((history.income,1),(history.expense,-1)):
+        lo,hi=columns.bounds(fromDate,toDate)
+        for day,amount in zip(columns.days[lo:hi],columns.cents[lo:hi]):
+            nets[day]+=sign*amount
+    days=array("i",sorted(nets))
+    return days,array("q",[nets[day] for day in days])
+
+
+def moving_average(history,spec=filters.EMPTY,window=7):
+    # for every day with a row, the mean daily net over the `window` calendar
+    # days ending there; days without rows count as zero
+    fromDate=date.fromordinal(spec.fromDate.toordinal()-window+1) if spec.fromDate else None
+    days,nets=daily_net(history,fromDate,spec.toDate)
+    prefix=[0,*accumulate(nets)]
+    first=bisect_left(days,spec.fromDate.toordinal()) if spec.fromDate else 0
+    points=[]
+    for i in range(first,len(days)):
+        j=bisect_left(days,days[i]-window+1)
+        points.append({
+            "date":date.fromordinal(days[i]),
+            "net":money.from_cents(nets[i]),
+            "average":(money.from_cents(prefix[i+1]-prefix[j])/window).quantize(money.CENTS),
+        })
+    return points
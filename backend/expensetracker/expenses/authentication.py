@@ -1,10 +1,88 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+
+class UserCache:
+    # validated token id -> user snapshot, so repeat calls skip the auth_user lookup;
+    # an entry never outlives its token and is dropped when the user is saved
+    def __init__(self,max_entries=10000,ttl=60):
+        self.max_entries=max_entries
+        self.ttl=ttl
+        self.entries=OrderedDict()
+        self.by_user={}
+        self.lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.invalidations=0
+
+    def get_user(self,validated_token,loader):
+        jti=validated_token.get(settings.SIMPLE_JWT.get("JTI_CLAIM","jti"))
+        now=time.time()
+        with self.lock:
+            entry=self.entries.get(jti) if jti else None
+            if entry and entry[0]>now:
+                self.entries.move_to_end(jti)
+                self.hits+=1
+                return copy.copy(entry[2])
+            self.misses+=1
+        user=loader(validated_token)
+        if jti:
+            expires=min(now+self.ttl,validated_token.get("exp",now))
+            self.store(jti,expires,user)
+        return user
+
+    def store(self,jti,expires,user):
+        with self.lock:
+            self.entries[jti]=(expires,user.pk,copy.copy(user))
+            self.entries.move_to_end(jti)
+            self.by_user.setdefault(user.pk,set()).add(jti)
+            while len(self.entries)>self.max_entries:
+                old_jti,(_,user_id,_)=self.entries.popitem(last=False)
+                self._forget(user_id,old_jti)
+
+    def _forget(self,user_id,jti):
+        tokens=self.by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(jti)
+            if not tokens:
+                del self.by_user[user_id]
+
+    def invalidate_user(self,user_id):
+        with self.lock:
+            for jti in self.by_user.pop(user_id,()):
+                self.entries.pop(jti,None)
+                self.invalidations+=1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries":len(self.entries),
+                "hits":self.hits,
+                "db_lookups_saved":self.hits,
+                "misses":self.misses,
+                "invalidations":self.invalidations
+            }
+
+
+auth_settings=getattr(settings,"AUTH_USER_CACHE",{})
+user_cache=UserCache(auth_settings.get("MAX_ENTRIES",10000),auth_settings.get("TTL",60))
+
+
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         raw_token=request.COOKIES.get("access_token")
         if raw_token is None:
             return None
         validated_token=self.get_validated_token(raw_token)
-        user=self.get_user(validated_token)
-        return user,validated_token
\ No newline at end of file
+        user=user_cache.get_user(validated_token,self.get_user)
+        return user,validated_token
@@ -0,0 +1,20 @@
+from expenses import ledger,summaries
+
+# Every write path (single-row views, bulk endpoints, the importer) keeps the
+# derived tables in step through here: the daily balance ledger and the
+# monthly summaries.
+
+
+def snapshot(row):
+    # what the derived tables need to know about a row, taken before it changes
+    return ledger.entry(row),summaries.entry(row)
+
+
+def record(user_id,added=(),removed=()):
+    ledger.record(user_id,[s[0] for s in added],[s[0] for s in removed])
+    summaries.record(user_id,[s[1] for s in added],[s[1] for s in removed])
+
+
+def rebuild(user_id):
+    ledger.rebuild(user_id)
+    summaries.rebuild(user_id)
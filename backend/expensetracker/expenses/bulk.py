@@ -0,0 +1,151 @@
+from datetime import datetime
+
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework.status import HTTP_400_BAD_REQUEST
+
+from expenses import bookkeeping,categories,money,versions
+from expenses.fingerprints import row_fingerprint
+from expenses.models import Income
+
+MAX_ITEMS=5000
+MAX_TITLE=100
+FIELDS=["amount","category","date","notes"]
+
+
+def title_field(model):
+    return "source" if model is Income else "title"
+
+
+def _is_id(value):
+    # JSON true/false are ints to Python
+    return isinstance(value,int) and not isinstance(value,bool)
+
+
+def parse_item(model,item,update=False):
+    # validated field values for one item, or a dict of per-field errors
+    errors={}
+    values={}
+    if not isinstance(item,dict):
+        return None,{"item":"expected an object"}
+    if update:
+        # as strict as the DELETE ids: no 3.7 read as 3, no "3"
+        if _is_id(item.get("id")):
+            values["id"]=item["id"]
+        else:
+            errors["id"]="a numeric id is required"
+    name=title_field(model)
+    if not str(item.get(name) or "").strip():
+        errors[name]="this field is required"
+    elif len(str(item[name]))>MAX_TITLE:
+        errors[name]=f"at most {MAX_TITLE} characters"
+    else:
+        values[name]=str(item[name])
+    try:
+        cents=money.to_cents(item["amount"])
+        if abs(cents)>=money.MAX_CENTS:
+            raise ValueError
+        values["amount"]=money.from_cents(cents)
+    except (KeyError,ValueError):
+        errors["amount"]="a decimal amount is required"
+    category=item.get("category") or item.get("categoryName")
+    if not category or len(str(category))>20:
+        errors["category"]="a category name of at most 20 characters is required"
+    else:
+        values["category"]=str(category)
+    try:
+        values["date"]=datetime.strptime(str(item["date"]),"%Y-%m-%d").date()
+    except (KeyError,ValueError):
+        errors["date"]="a date formatted YYYY-MM-DD is required"
+    values["notes"]=str(item.get("notes") or "")
+    return values,errors
+
+
+def parse_items(model,items,update=False):
+    if not isinstance(items,list) or not items:
+        return None,[{"index":None,"errors":{"items":"expected a non-empty list"}}]
+    if len(items)>MAX_ITEMS:
+        return None,[{"index":None,"errors":{"items":f"at most {MAX_ITEMS} items per request"}}]
+    parsed=[]
+    errors=[]
+    for index,item in enumerate(items):
+        values,item_errors=parse_item(model,item,update)
+        if item_errors:
+            errors.append({"index":index,"errors":item_errors})
+        parsed.append(values)
+    return parsed,errors
+
+
+def create(model,user,parsed):
+    found=categories.resolve(values["category"] for values in parsed)
+    rows=[
+        model(user=user,**{**values,"category":found[values["category"]]})
+        for values in parsed
+    ]
+    for row in rows:
+        row.fingerprint=row_fingerprint(row)
+    with versions.deferred():
+        rows=model.objects.bulk_create(rows,batch_size=500)
+        bookkeeping.record(user.id,added=[bookkeeping.snapshot(row) for row in rows])
+        versions.bump(user.id)
+    return rows
+
+
+def update(model,user,parsed):
+    by_id={values["id"]:values for values in parsed}
+    rows=list(model.objects.filter(user=user,id__in=by_id))
+    missing=set(by_id)-{row.id for row in rows}
+    if missing:
+        return None,[
+            {"index":index,"errors":{"id":"not found"}}
+            for index,values in enumerate(parsed) if values["id"] in missing
+        ]
+    found=categories.resolve(values["category"] for values in parsed)
+    removed=[bookkeeping.snapshot(row) for row in rows]
+    for row in rows:
+        values=by_id[row.id]
+        setattr(row,title_field(model),values[title_field(model)])
+        row.amount=values["amount"]
+        row.category=found[values["category"]]
+        row.date=values["date"]
+        row.notes=values["notes"]
+        row.fingerprint=row_fingerprint(row)
+    model.objects.bulk_update(rows,[title_field(model)]+FIELDS+["fingerprint"],batch_size=500)
+    bookkeeping.record(user.id,added=[bookkeeping.snapshot(row) for row in rows],removed=removed)
+    versions.bump(user.id)
+    return rows,[]
+
+
+def delete(model,user,ids):
+    rows=model.objects.filter(user=user,id__in=ids)
+    with versions.deferred():
+        removed=[bookkeeping.snapshot(row) for row in rows.only("id","date","amount","category_id")]
+        count,_=rows.delete()
+        bookkeeping.record(user.id,removed=removed)
+    return count
+
+
+def handle(request,model,serializer_class):
+    data=request.data
+    items=data.get("items") if isinstance(data,dict) else data
+    if request.method=='DELETE':
+        ids=data.get("ids") if isinstance(data,dict) else data
+        if not isinstance(ids,list) or not ids or len(ids)>MAX_ITEMS or not all(_is_id(i) for i in ids):
+            return Response({"detail":f"expected a list of at most {MAX_ITEMS} ids"},status=HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            count=delete(model,request.user,ids)
+        return Response({"deleted":count})
+
+    parsed,errors=parse_items(model,items,update=request.method=='PUT')
+    if errors:
+        return Response({"errors":errors},status=HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        if request.method=='POST':
+            rows=create(model,request.user,parsed)
+            key="created"
+        else:
+            rows,errors=update(model,request.user,parsed)
+            if errors:
+                return Response({"errors":errors},status=HTTP_400_BAD_REQUEST)
+            key="updated"
+    return Response({key:serializer_class(rows,many=True).data})
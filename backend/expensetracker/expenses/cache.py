@@ -0,0 +1,193 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from expenses import versions
+
+MISSING=object()
+
+
+class LocMemLRU:
+    def __init__(self,max_entries=2048,timeout=300):
+        self.max_entries=max_entries
+        self.timeout=timeout
+        self.entries=OrderedDict()
+        self.lock=threading.Lock()
+
+    def get(self,key):
+        with self.lock:
+            item=self.entries.get(key)
+            if item is None:
+                return MISSING
+            expires,value=item
+            if expires<time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self,key,value):
+        with self.lock:
+            self.entries[key]=(time.monotonic()+self.timeout,value)
+            self.entries.move_to_end(key)
+            while len(self.entries)>self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class LocalRedis:
+    # in-process stand-in for the few redis-py calls the backends use
+    def __init__(self):
+        self.data={}
+        self.lock=threading.Lock()
+
+    def get(self,key):
+        with self.lock:
+            item=self.data.get(key)
+            if item is None:
+                return None
+            value,expires=item
+            if expires is not None and expires<time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self,key,value,ex=None):
+        with self.lock:
+            self.data[key]=(value,time.monotonic()+ex if ex else None)
+        return True
+
+    def delete(self,*keys):
+        with self.lock:
+            return sum(self.data.pop(key,None) is not None for key in keys)
+
+    def flushdb(self):
+        with self.lock:
+            self.data.clear()
+
+
+class RedisBackend:
+    def __init__(self,url=None,client=None,timeout=300):
+        if client is None:
+            import redis
+            client=redis.Redis.from_url(url)
+        self.client=client
+        self.timeout=timeout
+
+    def get(self,key):
+        raw=self.client.get(key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self,key,value):
+        self.client.set(key,pickle.dumps(value),ex=self.timeout)
+
+
+class DummyBackend:
+    def get(self,key):
+        return MISSING
+
+    def set(self,key,value):
+        pass
+
+
+class SummaryCache:
+    # entries are keyed by the user's data version, so a write makes every older
+    # entry unreachable and the backend simply ages it out
+    def __init__(self,backend):
+        self.backend=backend
+        self.hits=0
+        self.misses=0
+        self.lock=threading.Lock()
+
+    def key(self,user_id,version,name,params):
+        digest=hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+        return f"summary:{user_id}:{version}:{name}:{digest}"
+
+    def count(self,value):
+        with self.lock:
+            if value is MISSING:
+                self.misses+=1
+            else:
+                self.hits+=1
+
+    def get_or_compute(self,user_id,name,params,compute,version=None):
+        if version is None:
+            version=versions.current(user_id)
+        key=self.key(user_id,version,name,params)
+        value=self.backend.get(key)
+        self.count(value)
+        if value is MISSING:
+            value=compute()
+            self.backend.set(key,value)
+        return value
+
+    async def aget_or_compute(self,user_id,name,params,compute,version=None):
+        # compute is a coroutine function; backend calls may block (redis) so
+        # they run in the thread pool
+        if version is None:
+            version=await versions.acurrent(user_id)
+        key=self.key(user_id,version,name,params)
+        value=await sync_to_async(self.backend.get)(key)
+        self.count(value)
+        if value is MISSING:
+            value=await compute()
+            await sync_to_async(self.backend.set)(key,value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            hits,misses=self.hits,self.misses
+        return {
+            "backend":type(self.backend).__name__,
+            "hits":hits,
+            "misses":misses,
+            "hit_rate":hits/(hits+misses) if hits+misses else 0
+        }
+
+
+def build_backend(config):
+    name=config.get("BACKEND","locmem")
+    timeout=config.get("TIMEOUT",300)
+    if name=="locmem":
+        return LocMemLRU(config.get("MAX_ENTRIES",2048),timeout)
+    if name=="redis":
+        client=import_string(config["CLIENT"])() if config.get("CLIENT") else None
+        return RedisBackend(config.get("URL"),client,timeout)
+    if name=="dummy":
+        return DummyBackend()
+    raise ValueError(f"unknown summary cache backend {name!r}")
+
+
+_summary_cache=None
+
+
+def get_summary_cache():
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache=SummaryCache(build_backend(getattr(settings,"SUMMARY_CACHE",{})))
+    return _summary_cache
+
+
+@receiver(setting_changed)
+def reset_summary_cache(setting,**kwargs):
+    global _summary_cache
+    if setting=="SUMMARY_CACHE":
+        _summary_cache=None
+
+
+def cached(request,name,params,compute):
+    # a conditional view has already read the version for its ETag
+    version=getattr(request,"data_version",None)
+    return get_summary_cache().get_or_compute(request.user.id,name,params,compute,version)
+
+
+async def acached(request,name,params,compute):
+    version=getattr(request,"data_version",None)
+    return await get_summary_cache().aget_or_compute(request.user.id,name,params,compute,version)
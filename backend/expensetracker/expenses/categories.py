@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from expenses.models import Category,MonthlySummary,category_key
+
+
+class CategoryCache:
+    # category key -> (id, name), so writes skip the Category lookup; categories
+    # are shared and only ever added, a save or delete in this process drops the
+    # entry and other workers age it out within CATEGORY_CACHE["TTL"]
+    def __init__(self,max_entries=10000,ttl=300):
+        self.max_entries=max_entries
+        self.ttl=ttl
+        self.entries=OrderedDict()
+        self.lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.invalidations=0
+
+    def get_many(self,keys):
+        now=time.time()
+        found={}
+        with self.lock:
+            for key in keys:
+                entry=self.entries.get(key)
+                if entry and entry[0]>now:
+                    self.entries.move_to_end(key)
+                    found[key]=entry[1:]
+            self.hits+=len(found)
+            self.misses+=len(set(keys))-len(found)
+        return found
+
+    def store(self,key,category_id,name):
+        with self.lock:
+            self.entries[key]=(time.time()+self.ttl,category_id,name)
+            self.entries.move_to_end(key)
+            while len(self.entries)>self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self,key):
+        with self.lock:
+            if self.entries.pop(key,None) is not None:
+                self.invalidations+=1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries":len(self.entries),
+                "hits":self.hits,
+                "db_lookups_saved":self.hits,
+                "misses":self.misses,
+                "invalidations":self.invalidations
+            }
+
+
+cache_settings=getattr(settings,"CATEGORY_CACHE",{})
+category_cache=CategoryCache(cache_settings.get("MAX_ENTRIES",10000),cache_settings.get("TTL",300))
+
+
+def resolve(names):
+    # name -> Category for every name, "Food" and " food" share one row; the
+    # instances are built from the cache, so reading .name costs no query
+    keys={name:category_key(name) for name in set(names)}
+    found=category_cache.get_many(set(keys.values()))
+    missing={key for key in keys.values() if key not in found}
+    if missing:
+        rows=list(Category.objects.filter(key__in=missing).values_list("key","id","name"))
+        new={key:Category(name=" ".join(name.split()),key=key) for name,key in keys.items() if key in missing}
+        for key,_,_ in rows:
+            new.pop(key,None)
+        if new:
+            Category.objects.bulk_create(new.values(),ignore_conflicts=True)
+            rows=list(Category.objects.filter(key__in=missing).values_list("key","id","name"))
+
+        def remember():
+            for row in rows:
+                category_cache.store(*row)
+        # a category created in a transaction that rolls back must not stay cached
+        transaction.on_commit(remember)
+        found.update({key:(category_id,name) for key,category_id,name in rows})
+    return {name:Category(id=found[key][0],name=found[key][1],key=key) for name,key in keys.items()}
+
+
+def get(name):
+    return resolve([name])[name]
+
+
+def for_user(user):
+    # the categories this user has rows in, with counts per kind; never the
+    # names other users created
+    rows=MonthlySummary.objects.filter(user=user).values("category_id","category__name","kind").annotate(
+        count=Sum("count")
+    ).order_by("category__key","kind")
+    listing={}
+    for row in rows:
+        item=listing.setdefault(row["category_id"],{
+            "id":row["category_id"],"name":row["category__name"],"expense":0,"income":0
+        })
+        item[row["kind"]]+=row["count"]
+    return list(listing.values())
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control,patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED
+
+from expenses import versions
+
+# A user's data only changes when DataVersion is bumped, so the version plus
+# the request path is enough for a strong ETag, and a matching If-None-Match
+# can be answered before any report query runs.
+
+
+def etag(user_id,version,request):
+    digest=hashlib.sha1(request.get_full_path().encode()).hexdigest()[:16]
+    return f'"{user_id}-{version}-{digest}"'
+
+
+def not_modified(request,tag):
+    # weak comparison: compression middleware turns our strong tags into W/"..."
+    header=request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    tags={t.removeprefix("W/") for t in parse_etags(header)}
+    return tag in tags or "*" in tags
+
+
+def finish(response,tag):
+    response["ETag"]=tag
+    # private: per-user payloads; no-cache: always revalidate, which is now cheap
+    patch_cache_control(response,private=True,no_cache=True)
+    patch_vary_headers(response,("Cookie",))
+    return response
+
+
+def versioned(view):
+    # for @api_view function views; only GET/HEAD are conditional
+    @wraps(view)
+    def wrapper(request,*args,**kwargs):
+        if request.method not in ('GET','HEAD'):
+            return view(request,*args,**kwargs)
+        user_id=request.user.id
+        request.data_version=versions.current(user_id)
+        tag=etag(user_id,request.data_version,request)
+        if not_modified(request,tag):
+            return finish(Response(status=HTTP_304_NOT_MODIFIED),tag)
+        response=view(request,*args,**kwargs)
+        if response.status_code==200:
+            finish(response,tag)
+        return response
+    return wrapper
@@ -0,0 +1,38 @@
+from expenses import aggregates,feed,filters,ledger,summaries
+from expenses.serializers import RecentTotalSerializer,RecentTransactionsSerializer
+
+WIDGETS=("total","recentTotal","transactions","expenseCategory","incomeCategory")
+
+
+def parse_fields(value):
+    if not value:
+        return set(WIDGETS)
+    fields={field.strip() for field in value.split(",") if field.strip()}
+    unknown=fields-set(WIDGETS)
+    if unknown:
+        raise ValueError(f"unknown dashboard fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def build(user,fields,spec=filters.EMPTY,limit=10,version=None):
+    data={}
+    # total and both breakdowns share the same grouped category queries
+    kinds=[]
+    if fields&{"total","incomeCategory"}:
+        kinds.append("income")
+    if fields&{"total","expenseCategory"}:
+        kinds.append("expense")
+    by_kind=summaries.category_totals_by_kind(user,kinds,spec,version) if kinds else {}
+    if "total" in fields:
+        data["total"]=aggregates.totals_from_categories(by_kind["income"],by_kind["expense"])
+    if "incomeCategory" in fields:
+        data["incomeCategory"]=aggregates.breakdown(by_kind["income"])
+    if "expenseCategory" in fields:
+        data["expenseCategory"]=aggregates.breakdown(by_kind["expense"])
+    if "recentTotal" in fields:
+        points=ledger.recent_points(user,spec,limit)
+        data["recentTotal"]=RecentTotalSerializer(points,many=True).data
+    if "transactions" in fields:
+        transactions,_=feed.page(user,spec,limit=limit)
+        data["transactions"]=RecentTransactionsSerializer(transactions,many=True).data
+    return data
@@ -0,0 +1,186 @@
+import csv
+import heapq
+import json
+import zlib
+from django.http import StreamingHttpResponse
+
+from expenses import feed,filters,money
+from expenses.renderers import MoneyEncoder
+from expenses.models import Expense,Income
+
+HEADER=['title','amount','category','date','notes']
+CHUNK_SIZE=2000
+# rows serialized per JSON chunk
+JSON_BATCH=500
+BUFFER_BYTES=64*1024
+
+
+class Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self,value):
+        return value
+
+
+def _rows(model,user,spec):
+    # always newest first, merged_rows relies on it
+    return filters.apply(model.objects.filter(user=user),spec).order_by(*filters.DEFAULT_SORT)
+
+
+# amounts are read as stored cents and printed by money.format_cents, no
+# Decimal is built per row
+
+def income_rows(user,spec=filters.EMPTY,chunk_size=CHUNK_SIZE):
+    rows=_rows(Income,user,spec).values_list("source",money.cents("amount"),"category__name","date","notes")
+    for source,cents,category,day,notes in rows.iterator(chunk_size=chunk_size):
+        yield source,money.format_cents(cents),category,day,notes
+
+
+def expense_rows(user,spec=filters.EMPTY,chunk_size=CHUNK_SIZE):
+    rows=_rows(Expense,user,spec).values_list("title",money.cents("amount"),"category__name","date","notes")
+    for title,cents,category,day,notes in rows.iterator(chunk_size=chunk_size):
+        yield title,money.format_cents(-cents),category,day,notes
+
+
+# values() rather than values_list(): ValuesListIterable runs its query before
+# aiterator() can move it off the event loop
+async def aincome_rows(user,spec=filters.EMPTY,chunk_size=CHUNK_SIZE):
+    rows=_rows(Income,user,spec).values("source","category__name","date","notes",cents=money.cents("amount"))
+    async for row in rows.aiterator(chunk_size=chunk_size):
+        yield row["source"],money.format_cents(row["cents"]),row["category__name"],row["date"],row["notes"]
+
+
+async def aexpense_rows(user,spec=filters.EMPTY,chunk_size=CHUNK_SIZE):
+    rows=_rows(Expense,user,spec).values("title","category__name","date","notes",cents=money.cents("amount"))
+    async for row in rows.aiterator(chunk_size=chunk_size):
+        yield row["title"],money.format_cents(-row["cents"]),row["category__name"],row["date"],row["notes"]
+
+
+async def atransaction_rows(user,spec=filters.EMPTY,chunk_size=CHUNK_SIZE):
+    # the async export lets the database merge both tables instead of heapq
+    async for row in feed.aiterate(user,spec,chunk_size=chunk_size):
+        yield row["title"],money.format_amount(row["amount"]),row["category"],row["date"],row["notes"]
+
+
+def merged_rows(*cursors):
+    # every cursor is already newest first, so a lazy k-way merge keeps that order
+    return heapq.merge(*cursors,key=lambda row:row[3],reverse=True)
+
+
+class ChunkBuffer:
+    # collects formatted lines until roughly BUFFER_BYTES are ready to send
+    def __init__(self):
+        self.writer=csv.writer(Echo())
+        self.lines=[self.writer.writerow(HEADER)]
+        self.size=0
+
+    def add(self,row):
+        line=self.writer.writerow(row)
+        self.lines.append(line)
+        self.size+=len(line)
+        if self.size>=BUFFER_BYTES:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk="".join(self.lines)
+        self.lines=[]
+        self.size=0
+        return chunk
+
+
+def csv_chunks(rows):
+    buffer=ChunkBuffer()
+    for row in rows:
+        chunk=buffer.add(row)
+        if chunk:
+            yield chunk
+    chunk=buffer.flush()
+    if chunk:
+        yield chunk
+
+
+async def acsv_chunks(rows):
+    buffer=ChunkBuffer()
+    async for row in rows:
+        chunk=buffer.add(row)
+        if chunk:
+            yield chunk
+    chunk=buffer.flush()
+    if chunk:
+        yield chunk
+
+
+def gzipped(chunks):
+    compressor=zlib.compressobj(6,zlib.DEFLATED,zlib.MAX_WBITS|16)
+    for chunk in chunks:
+        data=compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzipped(chunks):
+    compressor=zlib.compressobj(6,zlib.DEFLATED,zlib.MAX_WBITS|16)
+    async for chunk in chunks:
+        data=compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _json_items(batch,serializer_class):
+    # the rows of one batch as they sit inside the rendered array, byte for
+    # byte what expenses.renderers.JSONRenderer gives for the whole list
+    data=serializer_class(batch,many=True).data
+    return json.dumps(data,cls=MoneyEncoder,ensure_ascii=False,allow_nan=False,separators=(",",":"))[1:-1]
+
+
+def json_chunks(rows,serializer_class):
+    yield "["
+    batch=[]
+    first=True
+    for row in rows:
+        batch.append(row)
+        if len(batch)>=JSON_BATCH:
+            yield ("" if first else ",")+_json_items(batch,serializer_class)
+            batch,first=[],False
+    if batch:
+        yield ("" if first else ",")+_json_items(batch,serializer_class)
+    yield "]"
+
+
+async def ajson_chunks(rows,serializer_class):
+    yield "["
+    batch=[]
+    first=True
+    async for row in rows:
+        batch.append(row)
+        if len(batch)>=JSON_BATCH:
+            yield ("" if first else ",")+_json_items(batch,serializer_class)
+            batch,first=[],False
+    if batch:
+        yield ("" if first else ",")+_json_items(batch,serializer_class)
+    yield "]"
+
+
+def json_response(rows,serializer_class):
+    # a JSON array streamed JSON_BATCH rows at a time; rows may be async
+    if hasattr(rows,"__aiter__"):
+        chunks=ajson_chunks(rows,serializer_class)
+    else:
+        chunks=json_chunks(rows,serializer_class)
+    return StreamingHttpResponse(chunks,content_type="application/json")
+
+
+def csv_response(request,filename,rows):
+    # rows may be a plain or an async iterator; the latter streams under ASGI
+    asynchronous=hasattr(rows,"__aiter__")
+    chunks=acsv_chunks(rows) if asynchronous else csv_chunks(rows)
+    if request.GET.get("gzip") in ("1","true"):
+        chunks=agzipped(chunks) if asynchronous else gzipped(chunks)
+        response=StreamingHttpResponse(chunks,content_type="application/gzip")
+        filename+=".gz"
+    else:
+        response=StreamingHttpResponse(chunks,content_type="text/csv")
+    response['Content-Disposition']=f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,93 @@
+import base64
+from datetime import date
+
+from django.db.models import CharField,ExpressionWrapper,F,Q,Value
+
+from expenses import filters
+from expenses.money import MoneyField
+from expenses.models import Expense,Income
+
+# largest page a view hands out
+MAX_LIMIT=1000
+
+# (kind, model, title field, sign); kind doubles as the last ordering key so
+# rows sharing a date and id across the two tables still have a total order
+SOURCES=[
+    ("income",Income,"source",1),
+    ("expense",Expense,"title",-1),
+]
+
+
+def encode_cursor(row):
+    raw=f"{row['date'].isoformat()}|{row['id']}|{row['kind']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    day,row_id,kind=base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    if kind not in {source[0] for source in SOURCES}:
+        raise ValueError("unknown cursor kind")
+    return date.fromisoformat(day),int(row_id),kind
+
+
+def _branch(kind,model,title_field,sign,user,spec,after):
+    rows=filters.apply(model.objects.filter(user=user),spec)
+    if after:
+        day,row_id,after_kind=after
+        keyset=Q(date__lt=day)|Q(date=day,id__lt=row_id)
+        if kind<after_kind:
+            keyset|=Q(date=day,id=row_id)
+        rows=rows.filter(keyset)
+    return rows.values(
+        "id",
+        "date",
+        entry_kind=Value(kind,output_field=CharField()),
+        entry_title=F(title_field),
+        entry_amount=ExpressionWrapper(
+            F("amount")*sign,
+            output_field=MoneyField()
+        ),
+        entry_category=F("category__name"),
+        entry_notes=F("notes"),
+    ).order_by()
+
+
+def transactions(user,spec=filters.EMPTY,after=None):
+    # income and expense merged by the database, newest first; the keyset
+    # cursor depends on that order, so spec.sort does not apply here
+    branches=[_branch(*source,user,spec,after) for source in SOURCES]
+    return branches[0].union(*branches[1:],all=True).order_by("-date","-id","-entry_kind")
+
+
+def _row(row):
+    return {
+        "id":row["id"],
+        "kind":row["entry_kind"],
+        "title":row["entry_title"],
+        "amount":row["entry_amount"],
+        "category":row["entry_category"],
+        "date":row["date"],
+        "notes":row["entry_notes"],
+    }
+
+
+def page(user,spec=filters.EMPTY,after=None,limit=10):
+    rows=[_row(row) for row in transactions(user,spec,after)[:limit+1]]
+    next_cursor=encode_cursor(rows[limit-1]) if len(rows)>limit else None
+    return rows[:limit],next_cursor
+
+
+async def apage(user,spec=filters.EMPTY,after=None,limit=10):
+    rows=[_row(row) async for row in transactions(user,spec,after)[:limit+1]]
+    next_cursor=encode_cursor(rows[limit-1]) if len(rows)>limit else None
+    return rows[:limit],next_cursor
+
+
+def iterate(user,spec=filters.EMPTY,chunk_size=2000):
+    for row in transactions(user,spec).iterator(chunk_size=chunk_size):
+        yield _row(row)
+
+
+async def aiterate(user,spec=filters.EMPTY,chunk_size=2000):
+    async for row in transactions(user,spec).aiterator(chunk_size=chunk_size):
+        yield _row(row)
@@ -0,0 +1,220 @@
+import re
+from datetime import date
+from decimal import Decimal,InvalidOperation
+from functools import wraps
+
+from django.db import connections
+from django.db.models import F,Q,TextField,Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+from rest_framework.response import Response
+from rest_framework.status import HTTP_400_BAD_REQUEST
+
+from expenses import money
+from expenses.models import Income,category_key
+
+# One filter spec for every list, export, aggregate and dashboard view:
+#
+#   from, to            inclusive dates, either end may be left open
+#   category            repeatable and/or comma separated names, any case
+#   amount_min/max      inclusive, on the stored (unsigned) amount
+#   q                   words matched through the search index, see match()
+#   sort                comma separated keys, "-" for descending
+#
+# apply() turns a spec into one WHERE clause over a user's rows, laid out for
+# the (user, -date, -id) and (user, category, date) indexes.
+
+MAX_CATEGORIES=50
+MAX_TERMS=10
+SORT_KEYS={"date":"date","amount":"amount","title":None,"category":"category__name","id":"id"}
+DEFAULT_SORT=("-date","-id")
+TERM=re.compile(r"\w+")
+
+
+def title_field(model):
+    return "source" if model is Income else "title"
+
+
+def terms(text):
+    return TERM.findall(text or "")[:MAX_TERMS]
+
+
+def _date(value,name):
+    if value is None or value=="" or isinstance(value,date):
+        return value or None
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{name} must be a date formatted YYYY-MM-DD")
+
+
+def _amount(value,name):
+    if value is None or value=="":
+        return None
+    try:
+        amount=Decimal(str(value))
+        exact=amount.is_finite() and amount==amount.quantize(money.CENTS)
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a decimal amount")
+    if not amount.is_finite():
+        raise ValueError(f"{name} must be a decimal amount")
+    # amounts are whole cents, a bound between two of them would round
+    if not exact:
+        raise ValueError(f"{name} must have at most two decimal places")
+    return amount
+
+
+class Filters:
+    def __init__(self,fromDate=None,toDate=None,categories=(),amount_min=None,amount_max=None,text="",sort=()):
+        self.fromDate=_date(fromDate,"from")
+        self.toDate=_date(toDate,"to")
+        self.categories=tuple(sorted({category_key(name) for name in categories if category_key(name)}))
+        self.amount_min=_amount(amount_min,"amount_min")
+        self.amount_max=_amount(amount_max,"amount_max")
+        self.text=" ".join(terms(text))
+        self.sort=tuple(sort)
+        if self.fromDate and self.toDate and self.fromDate>self.toDate:
+            raise ValueError("from must not be after to")
+        if self.amount_min is not None and self.amount_max is not None and self.amount_min>self.amount_max:
+            raise ValueError("amount_min must not be above amount_max")
+        if len(self.categories)>MAX_CATEGORIES:
+            raise ValueError(f"at most {MAX_CATEGORIES} categories")
+        for key in self.sort:
+            if key.removeprefix("-") not in SORT_KEYS:
+                raise ValueError(f"sort keys must be among {', '.join(SORT_KEYS)}")
+
+    @property
+    def summarizable(self):
+        # MonthlySummary keeps totals per month and category, so it can answer
+        # date and category filters but not amount or text ones
+        return self.amount_min is None and self.amount_max is None and not self.text
+
+    def key(self):
+        # for cache keys
+        return (self.fromDate,self.toDate,self.categories,self.amount_min,self.amount_max,self.text,self.sort)
+
+    def without_dates(self):
+        return Filters(None,None,self.categories,self.amount_min,self.amount_max,self.text,self.sort)
+
+    def __eq__(self,other):
+        return isinstance(other,Filters) and self.key()==other.key()
+
+    def __repr__(self):
+        return f"Filters{self.key()!r}"
+
+
+EMPTY=Filters()
+
+
+def parse(params):
+    # Filters from request.query_params / request.GET; ValueError on bad input
+    categories=[name.strip() for value in params.getlist("category") for name in value.split(",")]
+    sort=[key.strip() for key in (params.get("sort") or "").split(",") if key.strip()]
+    return Filters(
+        params.get("from"),
+        params.get("to"),
+        categories,
+        params.get("amount_min"),
+        params.get("amount_max"),
+        params.get("q") or "",
+        sort,
+    )
+
+
+def parsed(view):
+    # for @api_view function views: request.filters, or a 400 naming the problem
+    @wraps(view)
+    def wrapper(request,*args,**kwargs):
+        request.filters=EMPTY
+        if request.method in ('GET','HEAD'):
+            try:
+                request.filters=parse(request.query_params)
+            except ValueError as e:
+                return Response({"detail":str(e)},status=HTTP_400_BAD_REQUEST)
+        return view(request,*args,**kwargs)
+    return wrapper
+
+
+def condition(spec,dates=True):
+    # the WHERE clause for everything but text; dates first so it reads like
+    # the index it is meant to use
+    q=Q()
+    if dates and spec.fromDate:
+        q&=Q(date__gte=spec.fromDate)
+    if dates and spec.toDate:
+        q&=Q(date__lte=spec.toDate)
+    if spec.categories:
+        q&=Q(category__key__in=spec.categories) if len(spec.categories)>1 else Q(category__key=spec.categories[0])
+    if spec.amount_min is not None:
+        q&=Q(amount__gte=spec.amount_min)
+    if spec.amount_max is not None:
+        q&=Q(amount__lte=spec.amount_max)
+    return q
+
+
+def apply(rows,spec=EMPTY,dates=True):
+    rows=rows.filter(condition(spec,dates))
+    if spec.text:
+        rows=match(rows,spec.text)
+    return rows
+
+
+def order(rows,spec=EMPTY):
+    # a sort always ends on id, so pages and exports are stable
+    if not spec.sort:
+        return rows.order_by(*DEFAULT_SORT)
+    fields=[]
+    for key in spec.sort:
+        descending=key.startswith("-")
+        field=SORT_KEYS[key.removeprefix("-")] or title_field(rows.model)
+        fields.append(f"-{field}" if descending else field)
+    if not any(field.removeprefix("-")=="id" for field in fields):
+        fields.append("-id")
+    return rows.order_by(*fields)
+
+
+# text matching through the indexes of migration 0021: on Postgres a tsvector
+# GIN index for whole words and a pg_trgm GIN index for typos and fragments,
+# on SQLite an FTS5 table per model, elsewhere an unindexed icontains. The
+# expressions must stay identical to the indexed ones or the planner falls
+# back to scanning the user's rows.
+
+def document(title):
+    return Concat(F(title),Value(" "),F("notes"),output_field=TextField())
+
+
+def vector(title):
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector(title,"notes",config="simple")
+
+
+def search_query(text):
+    from django.contrib.postgres.search import SearchQuery
+    return SearchQuery(text,config="simple",search_type="websearch")
+
+
+def fts_match(text):
+    # every term as a prefix and all of them required: "amaz char" finds
+    # "Amazon charge"
+    return " ".join(f'"{term}"*' for term in terms(text))
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def match(rows,text):
+    vendor=connections[rows.db].vendor
+    title=title_field(rows.model)
+    if vendor=="postgresql":
+        from django.contrib.postgres.lookups import TrigramSimilar
+        return rows.annotate(document_vector=vector(title)).filter(
+            Q(document_vector=search_query(text))|TrigramSimilar(document(title),Value(text))
+        )
+    if vendor=="sqlite":
+        fts=fts_table(rows.model)
+        return rows.filter(id__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s",[fts_match(text)]))
+    # no index on other vendors: every term somewhere in the title or notes
+    for term in terms(text):
+        rows=rows.filter(Q(**{f"{title}__icontains":term})|Q(notes__icontains=term))
+    return rows
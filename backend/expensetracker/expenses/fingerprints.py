@@ -0,0 +1,21 @@
+import hashlib
+from datetime import date
+
+from expenses import money
+from expenses.models import Income
+
+
+def fingerprint(kind,day,amount,title,occurrence=0):
+    day=day if isinstance(day,date) else date.fromisoformat(str(day))
+    raw=f"{kind}|{day.isoformat()}|{money.format_cents(abs(money.to_cents(amount)))}|{str(title).strip().lower()}|{occurrence}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def reference_fingerprint(kind,reference):
+    return hashlib.sha256(f"ref|{kind}|{reference}".encode()).hexdigest()
+
+
+def row_fingerprint(row):
+    if isinstance(row,Income):
+        return fingerprint("income",row.date,row.amount,row.source)
+    return fingerprint("expense",row.date,row.amount,row.title)
@@ -0,0 +1,246 @@
+import codecs
+import csv
+import io
+import re
+from datetime import datetime
+
+from django.db import transaction
+
+from expenses import bookkeeping,bulk,categories,money,versions
+from expenses.fingerprints import fingerprint,reference_fingerprint
+from expenses.models import Expense,Income
+
+BATCH_SIZE=1000
+MAX_ERRORS=100
+DEFAULT_COLUMNS={"title":"title","amount":"amount","category":"category","date":"date","notes":"notes","kind":"kind"}
+DEFAULT_CATEGORY="Imported"
+
+
+def parse_amount(value):
+    cleaned=re.sub(r"[\s,$€£₹]","",str(value or ""))
+    if cleaned.startswith("(") and cleaned.endswith(")"):
+        cleaned="-"+cleaned[1:-1]
+    cents=money.to_cents(cleaned)
+    if abs(cents)>=money.MAX_CENTS:
+        raise ValueError(f"{value!r} is out of range")
+    return money.from_cents(cents)
+
+
+def record(kind,title,amount,category,day,notes="",reference=None):
+    # one normalised statement line; kind is "income" or "expense", amount positive
+    return {
+        "kind":kind,
+        "title":str(title).strip()[:100] or "(no description)",
+        "amount":abs(amount),
+        "category":(str(category).strip() or DEFAULT_CATEGORY)[:20],
+        "date":day,
+        "notes":str(notes or ""),
+        "reference":reference,
+    }
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary,encoding="utf-8-sig",newline="",errors="replace")
+
+
+def read_csv(binary,columns=None,date_format="%Y-%m-%d"):
+    # yields (line number, record or error message) without loading the file
+    columns={**DEFAULT_COLUMNS,**(columns or {})}
+    reader=csv.DictReader(text_stream(binary))
+    for row in reader:
+        line=reader.line_num
+        try:
+            amount=parse_amount(row.get(columns["amount"]))
+            day=datetime.strptime((row.get(columns["date"]) or "").strip(),date_format).date()
+        except ValueError:
+            yield line,"unreadable amount or date"
+            continue
+        kind=(row.get(columns["kind"]) or "").strip().lower()
+        if kind not in ("income","expense"):
+            # same convention as the CSV export: expenses are negative
+            kind="expense" if amount<0 else "income"
+        yield line,record(
+            kind,
+            row.get(columns["title"]) or "",
+            amount,
+            row.get(columns["category"]) or "",
+            day,
+            row.get(columns["notes"]) or "",
+        )
+
+
+OFX_TOKEN=re.compile(r"<(/?)(\w+)>([^<]*)")
+OFX_FIELDS={"TRNAMT","DTPOSTED","NAME","MEMO","FITID"}
+OFX_CHUNK=64*1024
+# longest text kept between two tags, a real OFX value is far shorter
+MAX_OFX_VALUE=4096
+
+
+def ofx_tokens(binary,chunk_size=OFX_CHUNK):
+    # (line number, closing, tag, text up to the next tag), read in chunks and
+    # split on tags rather than lines: OFX 2.x files often are a single line
+    decoder=codecs.getincrementaldecoder("latin-1")()
+    pending=""
+    line=1
+    while True:
+        chunk=binary.read(chunk_size)
+        text=pending+decoder.decode(chunk,final=not chunk)
+        # the last tag's text may go on in the next chunk
+        cut=text.rfind("<") if chunk else len(text)
+        if cut<=0:
+            if len(text)>MAX_OFX_VALUE:
+                line+=text.count("\n",MAX_OFX_VALUE)
+                text=text[:MAX_OFX_VALUE]
+            pending=text
+            continue
+        done,pending=text[:cut],text[cut:]
+        position=0
+        for match in OFX_TOKEN.finditer(done):
+            line+=done.count("\n",position,match.start())
+            position=match.start()
+            yield line,bool(match.group(1)),match.group(2).upper(),match.group(3).strip()[:MAX_OFX_VALUE]
+        line+=done.count("\n",position)
+        if not chunk:
+            return
+
+
+def read_ofx(binary,category=DEFAULT_CATEGORY):
+    # SGML (OFX 1.x) and XML (OFX 2.x) statements, one <STMTTRN> block at a time
+    block=None
+    for line,closing,tag,value in ofx_tokens(binary):
+        if tag=="STMTTRN":
+            if not closing:
+                block={}
+                continue
+            if block is None:
+                continue
+            try:
+                amount=parse_amount(block.get("TRNAMT"))
+                day=datetime.strptime(block.get("DTPOSTED","")[:8],"%Y%m%d").date()
+            except ValueError:
+                yield line,"unreadable TRNAMT or DTPOSTED"
+            else:
+                yield line,record(
+                    "expense" if amount<0 else "income",
+                    block.get("NAME") or block.get("MEMO") or "",
+                    amount,
+                    category,
+                    day,
+                    block.get("MEMO",""),
+                    reference=block.get("FITID"),
+                )
+            block=None
+        elif block is not None and not closing and tag in OFX_FIELDS:
+            block[tag]=value
+
+
+def reader(binary,format="csv",columns=None,date_format="%Y-%m-%d",category=DEFAULT_CATEGORY):
+    if format=="csv":
+        return read_csv(binary,columns,date_format)
+    if format=="ofx":
+        return read_ofx(binary,category)
+    raise ValueError(f"unsupported import format {format!r}")
+
+
+class ImportProgress:
+    def __init__(self):
+        self.done=False
+        self.processed=0
+        self.created=0
+        self.skipped=0
+        self.failed=0
+        self.errors=[]
+
+    def error(self,line,message):
+        self.failed+=1
+        if len(self.errors)<MAX_ERRORS:
+            self.errors.append({"line":line,"error":message})
+
+    def as_dict(self):
+        return {
+            "done":self.done,
+            "processed":self.processed,
+            "created":self.created,
+            "skipped":self.skipped,
+            "failed":self.failed,
+            "errors":self.errors,
+        }
+
+
+def _fingerprints(batch,seen):
+    # the batch's items not already met in this file: a repeated line or FITID
+    # is one transaction; seen is shared by every batch of one import
+    unique=[]
+    for item in batch:
+        if item["reference"]:
+            item["fingerprint"]=reference_fingerprint(item["kind"],item["reference"])
+        else:
+            item["fingerprint"]=fingerprint(item["kind"],item["date"],item["amount"],item["title"])
+        if item["fingerprint"] not in seen:
+            seen.add(item["fingerprint"])
+            unique.append(item)
+    return unique
+
+
+def _write_batch(user,batch,progress,seen):
+    unique=_fingerprints(batch,seen)
+    progress.skipped+=len(batch)-len(unique)
+    if not unique:
+        return
+    batch=unique
+    with transaction.atomic(),versions.deferred():
+        found=categories.resolve(item["category"] for item in batch)
+        for kind,model in [("income",Income),("expense",Expense)]:
+            items=[item for item in batch if item["kind"]==kind]
+            if not items:
+                continue
+            existing=set(model.objects.filter(
+                user=user,
+                fingerprint__in=[item["fingerprint"] for item in items]
+            ).values_list("fingerprint",flat=True))
+            rows=[
+                model(
+                    user=user,
+                    **{bulk.title_field(model):item["title"]},
+                    amount=item["amount"],
+                    category=found[item["category"]],
+                    date=item["date"],
+                    notes=item["notes"],
+                    fingerprint=item["fingerprint"],
+                )
+                for item in items if item["fingerprint"] not in existing
+            ]
+            model.objects.bulk_create(rows,batch_size=500)
+            progress.created+=len(rows)
+            progress.skipped+=len(items)-len(rows)
+        versions.bump(user.id)
+
+
+def run(user,records,batch_size=BATCH_SIZE):
+    # generator: consumes parsed records and yields progress after every batch
+    progress=ImportProgress()
+    batch=[]
+    seen=set()
+    try:
+        for line,item in records:
+            progress.processed+=1
+            if isinstance(item,str):
+                progress.error(line,item)
+                continue
+            batch.append(item)
+            if len(batch)>=batch_size:
+                _write_batch(user,batch,progress,seen)
+                batch=[]
+                yield progress
+        if batch:
+            _write_batch(user,batch,progress,seen)
+    finally:
+        # batches commit on their own, so the derived tables are rebuilt once at
+        # the end; reports read in between are cached under the last batch's
+        # version, the bump after the rebuild retires them
+        if progress.created:
+            with transaction.atomic():
+                bookkeeping.rebuild(user.id)
+                versions.bump(user.id)
+    progress.done=True
+    yield progress
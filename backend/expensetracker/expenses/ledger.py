@@ -0,0 +1,136 @@
+from collections import defaultdict
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F,Sum
+
+from expenses import filters,money
+from expenses.models import DailyBalance,Expense,Income
+
+
+def entry(row):
+    # (date, signed cents) of an Income/Expense, incomes count up and expenses down
+    cents=money.to_cents(row.amount)
+    day=row.date if isinstance(row.date,date) else date.fromisoformat(str(row.date))
+    return day,(cents if isinstance(row,Income) else -cents)
+
+
+def record(user_id,added=(),removed=()):
+    deltas=defaultdict(int)
+    for day,cents in added:
+        deltas[day]+=cents
+    for day,cents in removed:
+        deltas[day]-=cents
+    apply_deltas(user_id,deltas)
+
+
+# past this many touched days a full rebuild is cheaper than per-day updates
+REBUILD_THRESHOLD=30
+
+
+def apply_deltas(user_id,deltas):
+    deltas={day:delta for day,delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(deltas)>REBUILD_THRESHOLD:
+        rebuild(user_id)
+        return
+    with transaction.atomic():
+        # serialise ledger writes per user so concurrent requests cannot interleave
+        list(User.objects.select_for_update().filter(id=user_id).values_list("id"))
+        rows=DailyBalance.objects.filter(user_id=user_id)
+        # deltas are cents, as the columns they are added to
+        for day,delta in sorted(deltas.items()):
+            if not rows.filter(date=day).update(net=F("net")+delta):
+                opening=rows.filter(date__lt=day).order_by("-date").values_list("balance",flat=True).first()
+                DailyBalance.objects.create(user_id=user_id,date=day,net=money.from_cents(delta),balance=opening or 0)
+            rows.filter(date__gte=day).update(balance=F("balance")+delta)
+            if rows.filter(date=day,net=0).exists() and not _has_rows(user_id,day):
+                rows.filter(date=day).delete()
+
+
+def _has_rows(user_id,day):
+    return (
+        Income.objects.filter(user_id=user_id,date=day).exists()
+        or Expense.objects.filter(user_id=user_id,date=day).exists()
+    )
+
+
+def net_by_day(user_id):
+    # date -> net cents
+    totals=defaultdict(int)
+    for model,sign in [(Income,1),(Expense,-1)]:
+        rows=model.objects.filter(user_id=user_id).values("date").annotate(total=Sum(money.cents("amount"))).order_by()
+        for row in rows:
+            # postgres sums a bigint into a numeric
+            totals[row["date"]]+=sign*int(row["total"])
+    return totals
+
+
+def expected_rows(user_id):
+    balance=0
+    rows=[]
+    for day,net in sorted(net_by_day(user_id).items()):
+        balance+=net
+        rows.append(DailyBalance(
+            user_id=user_id,date=day,net=money.from_cents(net),balance=money.from_cents(balance)
+        ))
+    return rows
+
+
+def rebuild(user_id):
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id=user_id).values_list("id"))
+        rows=expected_rows(user_id)
+        DailyBalance.objects.filter(user_id=user_id).delete()
+        DailyBalance.objects.bulk_create(rows,batch_size=1000)
+    return len(rows)
+
+
+def check(user_id):
+    # mismatches between the ledger and the raw Income/Expense rows
+    expected={row.date:(row.net,row.balance) for row in expected_rows(user_id)}
+    stored={
+        row["date"]:(row["net"],row["balance"])
+        for row in DailyBalance.objects.filter(user_id=user_id).values("date","net","balance")
+    }
+    problems=[]
+    for day in sorted(set(expected)|set(stored)):
+        if expected.get(day)!=stored.get(day):
+            problems.append({"date":day,"expected":expected.get(day),"stored":stored.get(day)})
+    return problems
+
+
+def _points(rows,opening):
+    rows.reverse()
+    return [
+        {"amount":row["net"],"date":row["date"],"total":row["balance"]-opening}
+        for row in rows
+    ]
+
+
+def _range(rows,spec):
+    # daily balances only know dates; the other filters do not apply here
+    if spec.fromDate:
+        rows=rows.filter(date__gte=spec.fromDate)
+    if spec.toDate:
+        rows=rows.filter(date__lte=spec.toDate)
+    return rows
+
+
+def recent_points(user,spec=filters.EMPTY,limit=10):
+    rows=DailyBalance.objects.filter(user=user)
+    opening=0
+    if spec.fromDate:
+        # totals restart at the beginning of the requested range
+        opening=rows.filter(date__lt=spec.fromDate).order_by("-date").values_list("balance",flat=True).first() or 0
+    return _points(list(_range(rows,spec).order_by("-date").values("date","net","balance")[:limit]),opening)
+
+
+async def arecent_points(user,spec=filters.EMPTY,limit=10):
+    rows=DailyBalance.objects.filter(user=user)
+    opening=0
+    if spec.fromDate:
+        opening=await rows.filter(date__lt=spec.fromDate).order_by("-date").values_list("balance",flat=True).afirst() or 0
+    return _points([row async for row in _range(rows,spec).order_by("-date").values("date","net","balance")[:limit]],opening)
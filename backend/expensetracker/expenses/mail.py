@@ -0,0 +1,158 @@
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives,get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from expenses.models import OutboxEmail
+
+DEFAULTS={
+    "TRANSPORT":"sendgrid",
+    "BATCH_SIZE":50,
+    "MAX_ATTEMPTS":6,
+    "BACKOFF_SECONDS":30,
+    "LEASE_SECONDS":300,
+    "FILE_PATH":None,
+    # sent and failed emails carry reset and verification links in html
+    "RETENTION_DAYS":7,
+}
+
+
+def config():
+    return {**DEFAULTS,**getattr(settings,"EMAIL_OUTBOX",{})}
+
+
+def enqueue(to,subject,html):
+    # the request only pays for one insert, the worker does the provider round trip
+    return OutboxEmail.objects.create(to=to,subject=subject,html=html)
+
+
+class SendGridTransport:
+    def __init__(self,**options):
+        from sendgrid import SendGridAPIClient
+        self.client=SendGridAPIClient(settings.SENDGRID_API_KEY)
+
+    def send(self,email):
+        from sendgrid.helpers.mail import Mail
+        message=Mail(
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to_emails=email.to,
+            subject=email.subject,
+            html_content=email.html
+        )
+        response=self.client.send(message)
+        if response.status_code>=400:
+            raise RuntimeError(f"sendgrid returned {response.status_code}")
+
+
+class SMTPTransport:
+    # any Django email backend; EMAIL_BACKEND/EMAIL_HOST/EMAIL_TIMEOUT as usual
+    def __init__(self,**options):
+        self.connection=get_connection()
+
+    def send(self,email):
+        message=EmailMultiAlternatives(
+            email.subject,
+            "",
+            settings.DEFAULT_FROM_EMAIL,
+            [email.to],
+            connection=self.connection
+        )
+        message.attach_alternative(email.html,"text/html")
+        message.send()
+
+
+class FileTransport:
+    # writes each message to FILE_PATH/<id>.eml, a local stand-in for the provider
+    def __init__(self,path=None,**options):
+        self.path=Path(path or Path(settings.BASE_DIR)/"sent_emails")
+        self.path.mkdir(parents=True,exist_ok=True)
+
+    def send(self,email):
+        message=EmailMultiAlternatives(email.subject,"",settings.DEFAULT_FROM_EMAIL,[email.to])
+        message.attach_alternative(email.html,"text/html")
+        (self.path/f"{email.id}.eml").write_bytes(message.message().as_bytes())
+
+
+class LocMemTransport:
+    sent=[]
+    lock=threading.Lock()
+
+    def __init__(self,**options):
+        pass
+
+    def send(self,email):
+        with self.lock:
+            self.sent.append((email.to,email.subject,email.html))
+
+
+TRANSPORTS={
+    "sendgrid":SendGridTransport,
+    "smtp":SMTPTransport,
+    "file":FileTransport,
+    "locmem":LocMemTransport,
+}
+
+
+def get_transport():
+    options=config()
+    name=options["TRANSPORT"]
+    transport_class=TRANSPORTS[name] if name in TRANSPORTS else import_string(name)
+    return transport_class(path=options["FILE_PATH"])
+
+
+def claim(batch_size,lease_seconds):
+    # lease due rows so parallel workers never send the same email twice
+    now=timezone.now()
+    with transaction.atomic():
+        due=OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+            status="pending",
+            next_attempt__lte=now
+        ).order_by("next_attempt")[:batch_size]
+        emails=list(due)
+        OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            next_attempt=now+timedelta(seconds=lease_seconds),
+            attempts=F("attempts")+1
+        )
+    for email in emails:
+        email.attempts+=1
+        email.next_attempt=now+timedelta(seconds=lease_seconds)
+    return emails
+
+
+def deliver(transport=None,batch_size=None):
+    options=config()
+    transport=transport or get_transport()
+    sent=failed=0
+    for email in claim(batch_size or options["BATCH_SIZE"],options["LEASE_SECONDS"]):
+        try:
+            transport.send(email)
+        except Exception as e:
+            failed+=1
+            email.last_error=str(e)[:2000]
+            if email.attempts>=options["MAX_ATTEMPTS"]:
+                email.status="failed"
+                email.finished=timezone.now()
+            else:
+                delay=options["BACKOFF_SECONDS"]*2**(email.attempts-1)
+                email.next_attempt=timezone.now()+timedelta(seconds=delay)
+            email.save(update_fields=["status","last_error","next_attempt","finished"])
+        else:
+            sent+=1
+            email.status="sent"
+            email.sent=email.finished=timezone.now()
+            email.save(update_fields=["status","sent","finished"])
+    return sent,failed
+
+
+def purge(retention_days=None):
+    # drop sent and failed emails finished longer ago than the retention
+    days=config()["RETENTION_DAYS"] if retention_days is None else retention_days
+    cutoff=timezone.now()-timedelta(days=days)
+    deleted,_=OutboxEmail.objects.filter(status__in=["sent","failed"],finished__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand,CommandError
+
+from expenses import ledger
+
+
+class Command(BaseCommand):
+    help="Compare the daily balance ledger with the raw Income/Expense rows"
+
+    def add_arguments(self,parser):
+        parser.add_argument("--user",type=int,action="append",help="only check these user ids")
+        parser.add_argument("--fix",action="store_true",help="rebuild users whose ledger is out of date")
+
+    def handle(self,*args,**options):
+        users=User.objects.order_by("id")
+        if options["user"]:
+            users=users.filter(id__in=options["user"])
+        broken=[]
+        for user_id in users.values_list("id",flat=True).iterator():
+            problems=ledger.check(user_id)
+            if not problems:
+                continue
+            broken.append(user_id)
+            for problem in problems:
+                self.stdout.write(
+                    f"user {user_id} {problem['date']}: expected {problem['expected']} stored {problem['stored']}"
+                )
+            if options["fix"]:
+                ledger.rebuild(user_id)
+        if broken and not options["fix"]:
+            raise CommandError(f"{len(broken)} user(s) with an inconsistent ledger")
+        self.stdout.write(self.style.SUCCESS("ledger consistent" if not broken else f"rebuilt {len(broken)} user(s)"))
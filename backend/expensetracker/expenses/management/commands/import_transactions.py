@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand,CommandError
+
+from expenses import importers
+
+
+class Command(BaseCommand):
+    help="Import a CSV or OFX bank statement for one user, in batches, skipping rows already imported"
+
+    def add_arguments(self,parser):
+        parser.add_argument("user",help="user id or username")
+        parser.add_argument("path")
+        parser.add_argument("--format",choices=["csv","ofx"])
+        parser.add_argument("--column",action="append",default=[],metavar="FIELD=HEADER",
+            help="map a field (title, amount, category, date, notes, kind) to a CSV header")
+        parser.add_argument("--date-format",default="%Y-%m-%d")
+        parser.add_argument("--category",default=importers.DEFAULT_CATEGORY,help="category for OFX lines")
+        parser.add_argument("--batch-size",type=int,default=importers.BATCH_SIZE)
+
+    def handle(self,*args,**options):
+        lookup=options["user"]
+        user=User.objects.filter(id=lookup).first() if lookup.isdigit() else User.objects.filter(username=lookup).first()
+        if user is None:
+            raise CommandError(f"no user {lookup!r}")
+        columns={}
+        for mapping in options["column"]:
+            field,_,header=mapping.partition("=")
+            if field not in importers.DEFAULT_COLUMNS or not header:
+                raise CommandError(f"bad --column {mapping!r}")
+            columns[field]=header
+        format=options["format"] or ("ofx" if options["path"].lower().endswith((".ofx",".qfx")) else "csv")
+        with open(options["path"],"rb") as binary:
+            records=importers.reader(binary,format,columns,options["date_format"],options["category"])
+            for progress in importers.run(user,records,options["batch_size"]):
+                self.stdout.write(
+                    f"processed {progress.processed} created {progress.created} "
+                    f"skipped {progress.skipped} failed {progress.failed}"
+                )
+        for error in progress.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from expenses import ledger
+
+
+class Command(BaseCommand):
+    help="Rebuild the per-user daily balance ledger from the raw Income/Expense rows"
+
+    def add_arguments(self,parser):
+        parser.add_argument("--user",type=int,action="append",help="only rebuild these user ids")
+
+    def handle(self,*args,**options):
+        users=User.objects.order_by("id")
+        if options["user"]:
+            users=users.filter(id__in=options["user"])
+        for user_id in users.values_list("id",flat=True).iterator():
+            count=ledger.rebuild(user_id)
+            self.stdout.write(f"user {user_id}: {count} days")
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand,CommandError
+from django.db import connections
+
+from expenses import summaries
+
+
+def rebuild(user_id):
+    try:
+        return user_id,summaries.rebuild(user_id),[]
+    finally:
+        connections.close_all()
+
+
+def reconcile(user_id,fix):
+    try:
+        problems=summaries.check(user_id)
+        if problems and fix:
+            summaries.rebuild(user_id)
+        return user_id,None,problems
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help="Rebuild or reconcile the monthly summary table from the raw Income/Expense rows"
+
+    def add_arguments(self,parser):
+        parser.add_argument("--user",type=int,action="append",help="only these user ids")
+        parser.add_argument("--check",action="store_true",help="report mismatches instead of rebuilding")
+        parser.add_argument("--fix",action="store_true",help="with --check, rebuild users that do not match")
+        parser.add_argument("--workers",type=int,default=4,help="users processed in parallel, one connection each")
+
+    def handle(self,*args,**options):
+        users=User.objects.order_by("id")
+        if options["user"]:
+            users=users.filter(id__in=options["user"])
+        user_ids=list(users.values_list("id",flat=True))
+        # every user is locked and rebuilt in its own transaction, so users are
+        # independent and can be spread over threads
+        if options["check"]:
+            work=lambda user_id:reconcile(user_id,options["fix"])
+        else:
+            work=rebuild
+        broken=0
+        with ThreadPoolExecutor(max(1,options["workers"])) as pool:
+            for user_id,count,problems in pool.map(work,user_ids):
+                if count is not None:
+                    self.stdout.write(f"user {user_id}: {count} rows")
+                for problem in problems:
+                    month,category_id,kind=problem["key"]
+                    self.stdout.write(
+                        f"user {user_id} {month:%Y-%m} {kind} category {category_id}: "
+                        f"expected {problem['expected']} stored {problem['stored']}"
+                    )
+                broken+=bool(problems)
+        if broken and not options["fix"]:
+            raise CommandError(f"{broken} user(s) with inconsistent monthly summaries")
+        if options["check"]:
+            self.stdout.write(self.style.SUCCESS("summaries consistent" if not broken else f"rebuilt {broken} user(s)"))
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand,CommandError
+
+from expenses.models import Expense,Income
+from expenses.seeding import seed_user
+
+
+class Command(BaseCommand):
+    help="Create users with synthetic expenses, incomes and categories for load tests and benchmarks"
+
+    def add_arguments(self,parser):
+        parser.add_argument("--users",type=int,default=1)
+        parser.add_argument("--expenses",type=int,default=1000,help="expenses per user")
+        parser.add_argument("--incomes",type=int,default=200,help="incomes per user")
+        parser.add_argument("--categories",type=int,default=10,help="categories per user")
+        parser.add_argument("--days",type=int,default=730,help="spread rows over this many past days")
+        parser.add_argument("--prefix",default="seed",help="usernames are <prefix><n>@example.com")
+        parser.add_argument("--password",default="bench-password")
+        parser.add_argument("--seed",type=int,default=0,help="random seed, user n uses seed+n")
+        parser.add_argument("--replace",action="store_true",help="delete existing users with these names first")
+
+    def handle(self,*args,**options):
+        usernames=[f"{options['prefix']}{n}@example.com" for n in range(options["users"])]
+        existing=User.objects.filter(username__in=usernames)
+        if existing.exists():
+            if not options["replace"]:
+                raise CommandError(f"{existing.count()} of these users already exist, pass --replace to recreate them")
+            # rows only SET_NULL their user, so drop them explicitly
+            Expense.objects.filter(user__in=existing).delete()
+            Income.objects.filter(user__in=existing).delete()
+            existing.delete()
+        for n,username in enumerate(usernames):
+            seed_user(
+                username,
+                categories=options["categories"],
+                expenses=options["expenses"],
+                incomes=options["incomes"],
+                days=options["days"],
+                seed=options["seed"]+n,
+                password=options["password"],
+            )
+            self.stdout.write(f"{username}: {options['expenses']} expenses, {options['incomes']} incomes")
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from expenses import mail
+
+# seconds between retention purges of a long running worker
+PURGE_INTERVAL=3600
+
+
+class Command(BaseCommand):
+    help="Send pending outbox emails in batches, retrying failures with exponential backoff, and purge old sent and failed ones"
+
+    def add_arguments(self,parser):
+        parser.add_argument("--once",action="store_true",help="send one batch and exit")
+        parser.add_argument("--batch-size",type=int)
+        parser.add_argument("--interval",type=float,default=2.0,help="seconds to sleep when the outbox is empty")
+        parser.add_argument("--retention-days",type=float,help="keep sent and failed emails this long (EMAIL_OUTBOX RETENTION_DAYS)")
+
+    def handle(self,*args,**options):
+        transport=mail.get_transport()
+        purge_at=0
+        while True:
+            close_old_connections()
+            if time.monotonic()>=purge_at:
+                purged=mail.purge(options["retention_days"])
+                if purged:
+                    self.stdout.write(f"purged {purged}")
+                purge_at=time.monotonic()+PURGE_INTERVAL
+            sent,failed=mail.deliver(transport,options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"sent {sent} failed {failed}")
+            if options["once"]:
+                return
+            if not sent and not failed:
+                time.sleep(options["interval"])
@@ -0,0 +1,114 @@
+import re
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from expenses import profiling,routers
+
+try:
+    import brotli
+except ImportError:
+    brotli=None
+
+re_accepts_br=re.compile(r"\bbr\b")
+
+# bodies that are already compressed archives, e.g. the ?gzip=1 CSV export
+PRECOMPRESSED=("application/gzip","application/zip")
+
+# BREACH: a compressed body that carries a secret next to reflected input
+# leaks the secret through its length. Tokens go out from these views and with
+# auth cookies, so those responses are never compressed, gzip or brotli
+UNCOMPRESSED_VIEWS={"login_user","register_user","logout_user","forgot-password","reset-password","verify-email"}
+
+
+def carries_secrets(request,response):
+    match=getattr(request,"resolver_match",None)
+    return bool(response.cookies) or (match is not None and match.url_name in UNCOMPRESSED_VIEWS)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    # brotli when the client accepts it and the module is installed, gzip
+    # otherwise; streaming responses are compressed chunk by chunk
+    def process_response(self,request,response):
+        if response.get("Content-Type","").startswith(PRECOMPRESSED) or carries_secrets(request,response):
+            return response
+        accepts_br=re_accepts_br.search(request.META.get("HTTP_ACCEPT_ENCODING",""))
+        if brotli is None or not accepts_br:
+            return super().process_response(request,response)
+        if not response.streaming and len(response.content)<200:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response,("Accept-Encoding",))
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content=abrotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content=brotli_sequence(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            compressed=brotli.compress(response.content,quality=5)
+            if len(compressed)>=len(response.content):
+                return response
+            response.content=compressed
+            response.headers["Content-Length"]=str(len(compressed))
+        etag=response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"]="W/"+etag
+        response.headers["Content-Encoding"]="br"
+        return response
+
+
+def brotli_sequence(sequence):
+    compressor=brotli.Compressor(quality=5)
+    for chunk in sequence:
+        data=compressor.process(chunk)+compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_sequence(sequence):
+    compressor=brotli.Compressor(quality=5)
+    async for chunk in sequence:
+        data=compressor.process(chunk)+compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    # after a successful write the client reads from the primary for a few
+    # seconds, so replication lag never hides its own changes
+    def process_response(self,request,response):
+        if request.method not in ('GET','HEAD','OPTIONS') and response.status_code<400 and routers.replica_configured():
+            routers.pin(response)
+        return response
+
+
+class ProfilingMiddleware:
+    # opt-in with PROFILING["ENABLED"]; when off Django drops it at startup.
+    # Wall, SQL and serializer time go out as Server-Timing and into the
+    # /metrics histograms, a SAMPLE_RATE share of requests is profiled
+    def __init__(self,get_response):
+        if not profiling.config()["ENABLED"]:
+            raise MiddlewareNotUsed
+        profiling.instrument_serializers()
+        self.get_response=get_response
+
+    def __call__(self,request):
+        stats=profiling.RequestStats()
+        profiler=profiling.start_profiler() if profiling.sampled() else None
+        try:
+            with profiling.recording(stats):
+                response=self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiling.save_profile(profiler,profiling.view_labels(request)[0][1])
+        response["Server-Timing"]=stats.server_timing(profiling.config()["DUPLICATE_THRESHOLD"])
+        if response.streaming:
+            return profiling.follow_stream(response,stats,lambda:profiling.observe(request,response,stats))
+        profiling.observe(request,response,stats)
+        return response
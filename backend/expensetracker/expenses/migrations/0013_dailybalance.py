@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_ledger(apps, schema_editor):
+    DailyBalance = apps.get_model('expenses', 'DailyBalance')
+    Expense = apps.get_model('expenses', 'Expense')
+    Income = apps.get_model('expenses', 'Income')
+    net = defaultdict(Decimal)
+    for model, sign in [(Income, 1), (Expense, -1)]:
+        rows = model.objects.exclude(user=None).values('user_id', 'date').annotate(total=Sum('amount')).order_by()
+        for row in rows:
+            net[(row['user_id'], row['date'])] += sign * row['total']
+    balances = defaultdict(Decimal)
+    rows = []
+    for (user_id, day), amount in sorted(net.items()):
+        balances[user_id] += amount
+        rows.append(DailyBalance(user_id=user_id, date=day, net=amount, balance=balances[user_id]))
+    DailyBalance.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_auto_20260626_1137'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_user_daily_balance')],
+            },
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
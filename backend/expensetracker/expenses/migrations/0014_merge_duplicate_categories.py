@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:42
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    Category = apps.get_model('expenses', 'Category')
+    Expense = apps.get_model('expenses', 'Expense')
+    Income = apps.get_model('expenses', 'Income')
+    duplicates = Category.objects.values('name').annotate(keep=Min('id'), copies=Count('id')).filter(copies__gt=1)
+    for row in duplicates:
+        extra = Category.objects.filter(name=row['name']).exclude(id=row['keep'])
+        Expense.objects.filter(category__in=extra).update(category_id=row['keep'])
+        Income.objects.filter(category__in=extra).update(category_id=row['keep'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_dailybalance'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:05
+
+import hashlib
+
+from django.db import migrations
+
+
+def fingerprint(kind, day, amount, title):
+    raw = f"{kind}|{day.isoformat()}|{abs(amount):.2f}|{str(title).strip().lower()}|0"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    for name, kind, title in [('Expense', 'expense', 'title'), ('Income', 'income', 'source')]:
+        model = apps.get_model('expenses', name)
+        batch = []
+        for row in model.objects.filter(fingerprint='').only('id', 'date', 'amount', title).iterator(chunk_size=2000):
+            row.fingerprint = fingerprint(kind, row.date, row.amount, getattr(row, title))
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['fingerprint'])
+                batch = []
+        model.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0017_import_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
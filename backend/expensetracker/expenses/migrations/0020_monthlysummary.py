@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_summaries(apps, schema_editor):
+    MonthlySummary = apps.get_model('expenses', 'MonthlySummary')
+    rows = []
+    for kind, name in [('income', 'Income'), ('expense', 'Expense')]:
+        model = apps.get_model('expenses', name)
+        totals = model.objects.exclude(user=None).values(
+            'user_id', 'category_id', month=TruncMonth('date')
+        ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+        rows += [
+            MonthlySummary(
+                user_id=row['user_id'], category_id=row['category_id'], month=row['month'],
+                kind=kind, total=row['total'], count=row['count'],
+            )
+            for row in totals
+        ]
+    MonthlySummary.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0019_email_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('kind', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=7)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='expenses.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category', 'kind'), name='unique_user_monthly_summary')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Search indexes for the text filter in expenses/filters.py. They depend on the
+# database vendor, so they are created here with SQL instead of being declared
+# on the models: Postgres gets a tsvector GIN index and a pg_trgm GIN index
+# per table, SQLite an external-content FTS5 table per table kept in step by
+# triggers. Other vendors get nothing and search scans with icontains there.
+
+from django.db import migrations
+
+TABLES = [
+    ('expenses_expense', 'title'),
+    ('expenses_income', 'source'),
+]
+
+
+def postgres_indexes(title):
+    # the same expressions expenses.filters queries with, see filters.document
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import F, TextField, Value
+    from django.db.models.functions import Concat
+    table = 'expense' if title == 'title' else 'income'
+    document = Concat(F(title), Value(' '), F('notes'), output_field=TextField())
+    return [
+        GinIndex(SearchVector(title, 'notes', config='simple'), name=f'{table}_search_idx'),
+        GinIndex(OpClass(document, name='gin_trgm_ops'), name=f'{table}_trigram_idx'),
+    ]
+
+
+def sqlite_statements(table, title):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({title}, notes, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {title}, notes) VALUES (new.id, new.{title}, new.notes); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, notes) VALUES ('delete', old.id, old.{title}, old.notes); END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {title}, notes) VALUES ('delete', old.id, old.{title}, old.notes); "
+        f"INSERT INTO {fts}(rowid, {title}, notes) VALUES (new.id, new.{title}, new.notes); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def create(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, title in [('Expense', 'title'), ('Income', 'source')]:
+            model = apps.get_model('expenses', name)
+            for index in postgres_indexes(title):
+                schema_editor.add_index(model, index)
+    elif vendor == 'sqlite':
+        for table, title in TABLES:
+            for statement in sqlite_statements(table, title):
+                schema_editor.execute(statement)
+
+
+def drop(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, title in [('Expense', 'title'), ('Income', 'source')]:
+            model = apps.get_model('expenses', name)
+            for index in postgres_indexes(title):
+                schema_editor.remove_index(model, index)
+    elif vendor == 'sqlite':
+        for table, title in TABLES:
+            fts = f'{table}_fts'
+            for trigger in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0020_monthlysummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+# the key is filled in by 0023 and made unique by 0024; on postgres the merge
+# leaves deferred FK trigger events that an ALTER TABLE in the same
+# transaction refuses, so each step is its own migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0021_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='key',
+            field=models.CharField(max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:22
+
+from django.db import migrations
+from django.db.models import F
+
+
+def category_key(name):
+    # a copy of expenses.models.category_key as of this migration
+    return ' '.join(str(name).split()).casefold()
+
+
+def merge_case_duplicates(apps, schema_editor):
+    # "Food", "food" and "Food " become one category, the oldest one
+    Category = apps.get_model('expenses', 'Category')
+    Expense = apps.get_model('expenses', 'Expense')
+    Income = apps.get_model('expenses', 'Income')
+    MonthlySummary = apps.get_model('expenses', 'MonthlySummary')
+    keep = {}
+    for category in Category.objects.order_by('id'):
+        key = category_key(category.name)
+        if key not in keep:
+            keep[key] = category.id
+            category.key = key
+            category.save(update_fields=['key'])
+            continue
+        kept = keep[key]
+        Expense.objects.filter(category_id=category.id).update(category_id=kept)
+        Income.objects.filter(category_id=category.id).update(category_id=kept)
+        for summary in MonthlySummary.objects.filter(category_id=category.id):
+            same = MonthlySummary.objects.filter(
+                user_id=summary.user_id, month=summary.month, kind=summary.kind, category_id=kept
+            )
+            if same.update(total=F('total') + summary.total, count=F('count') + summary.count):
+                summary.delete()
+            else:
+                summary.category_id = kept
+                summary.save(update_fields=['category'])
+        category.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0022_category_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0023_merge_category_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='key',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
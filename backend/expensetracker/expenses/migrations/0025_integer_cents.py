@@ -0,0 +1,86 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:05
+
+import expenses.money
+from importlib import import_module
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+# every amount column becomes BIGINT cents: scale the stored values while the
+# columns are still decimal, then change their type
+COLUMNS = [
+    ('Expense', 'amount'),
+    ('Income', 'amount'),
+    ('DailyBalance', 'net'),
+    ('DailyBalance', 'balance'),
+    ('MonthlySummary', 'total'),
+]
+
+search_indexes = import_module('expenses.migrations.0021_search_indexes')
+
+
+def to_cents(apps, schema_editor):
+    for model_name, field in COLUMNS:
+        model = apps.get_model('expenses', model_name)
+        # rounded, sqlite holds the decimals as REAL and 0.29 * 100 is 28.999...
+        model.objects.update(**{field: Round(F(field) * 100)})
+
+
+def to_units(apps, schema_editor):
+    for model_name, field in COLUMNS:
+        model = apps.get_model('expenses', model_name)
+        model.objects.update(**{field: F(field) / 100.0})
+
+
+def restore_search_triggers(apps, schema_editor):
+    # sqlite rebuilds a table to change a column type, which drops the FTS
+    # triggers of 0021 with it
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, title in search_indexes.TABLES:
+        fts = f'{table}_fts'
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+        # everything but the CREATE VIRTUAL TABLE
+        for statement in search_indexes.sqlite_statements(table, title)[1:]:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0024_category_key_unique'),
+    ]
+
+    operations = [
+        # the triggers go again when this is reversed, hence both ends
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.RunPython(to_cents, to_units),
+        migrations.AlterField(
+            model_name='expense',
+            name='amount',
+            field=expenses.money.MoneyField(),
+        ),
+        migrations.AlterField(
+            model_name='income',
+            name='amount',
+            field=expenses.money.MoneyField(),
+        ),
+        migrations.AlterField(
+            model_name='dailybalance',
+            name='net',
+            field=expenses.money.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailybalance',
+            name='balance',
+            field=expenses.money.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='total',
+            field=expenses.money.MoneyField(default=0),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:12
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def backfill_finished(apps, schema_editor):
+    OutboxEmail = apps.get_model('expenses', 'OutboxEmail')
+    OutboxEmail.objects.filter(status='sent').update(finished=F('sent'))
+    # the time of a failed row's last attempt was never kept; its retention
+    # starts now rather than early
+    OutboxEmail.objects.filter(status='failed').update(finished=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0025_integer_cents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='finished',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_finished, migrations.RunPython.noop),
+    ]
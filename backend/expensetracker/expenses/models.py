@@ -1,22 +1,39 @@
 from django.db import models
 from django.contrib.auth.models import User
-# from django.utils import timezone
+from django.utils import timezone
 from datetime import date
+from expenses.money import MoneyField
 # Create your models here.
 
+def category_key(name):
+    # categories are unique by this: whitespace collapsed, case folded
+    return " ".join(str(name).split()).casefold()
+
+
 class Category(models.Model):
-    name=models.CharField(max_length=20,null=False,blank=False)
+    name=models.CharField(max_length=20,null=False,blank=False,unique=True)
+    key=models.CharField(max_length=64,unique=True)
     # type=models.CharField(max_length=20,choices=[("income","income"),("expense","expense")],default="expense")
+    def save(self,*args,**kwargs):
+        self.key=category_key(self.name)
+        super().save(*args,**kwargs)
     def __str__(self):
         return self.name
     
 class Expense(models.Model):
     user=models.ForeignKey(User,on_delete=models.SET_NULL,null=True)
     title=models.CharField(max_length=100,null=False,blank=False)
-    amount=models.DecimalField(max_digits=20,decimal_places=2)
+    amount=MoneyField()
     category=models.ForeignKey(Category,on_delete=models.CASCADE)
     date=models.DateField()
     notes=models.TextField(max_length=40)
+    fingerprint=models.CharField(max_length=64,blank=True,default="")
+    class Meta:
+        indexes=[
+            models.Index(fields=["user","-date","-id"],name="expense_user_date_id_idx"),
+            models.Index(fields=["user","category","date"],name="expense_user_cat_date_idx"),
+            models.Index(fields=["user","fingerprint"],name="expense_user_fingerprint_idx"),
+        ]
     def __str__(self):
         return self.title
 
@@ -24,8 +41,75 @@ class Income(models.Model):
     user=models.ForeignKey(User,on_delete=models.SET_NULL,null=True)
     source=models.CharField(max_length=100,null=False,blank=False)
     category=models.ForeignKey(Category,on_delete=models.CASCADE)
-    amount=models.DecimalField(max_digits=20,decimal_places=2)
+    amount=MoneyField()
     date=models.DateField()
     notes=models.TextField(max_length=40)
+    fingerprint=models.CharField(max_length=64,blank=True,default="")
+    class Meta:
+        indexes=[
+            models.Index(fields=["user","-date","-id"],name="income_user_date_id_idx"),
+            models.Index(fields=["user","category","date"],name="income_user_cat_date_idx"),
+            models.Index(fields=["user","fingerprint"],name="income_user_fingerprint_idx"),
+        ]
+    def __str__(self):
+        return self.source
+
+class DailyBalance(models.Model):
+    user=models.ForeignKey(User,on_delete=models.CASCADE)
+    date=models.DateField()
+    net=MoneyField(default=0)
+    balance=MoneyField(default=0)
+    class Meta:
+        constraints=[
+            models.UniqueConstraint(fields=["user","date"],name="unique_user_daily_balance")
+        ]
+    def __str__(self):
+        return f"{self.user_id} {self.date}"
+
+
+class DataVersion(models.Model):
+    # bumped on every Income/Expense write, anything derived from a user's rows
+    # is keyed by it
+    user=models.OneToOneField(User,on_delete=models.CASCADE,primary_key=True)
+    version=models.BigIntegerField(default=0)
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
+
+class MonthlySummary(models.Model):
+    # per user, month, category and kind totals, kept in step with the raw rows
+    # so long-range reports read one row per month instead of every transaction
+    KIND_CHOICES=[("income","Income"),("expense","Expense")]
+    user=models.ForeignKey(User,on_delete=models.CASCADE)
+    month=models.DateField()
+    category=models.ForeignKey(Category,on_delete=models.CASCADE)
+    kind=models.CharField(max_length=7,choices=KIND_CHOICES)
+    total=MoneyField(default=0)
+    count=models.IntegerField(default=0)
+    class Meta:
+        constraints=[
+            models.UniqueConstraint(fields=["user","month","category","kind"],name="unique_user_monthly_summary")
+        ]
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.kind} {self.category_id}"
+
+
+class OutboxEmail(models.Model):
+    STATUS_CHOICES=[("pending","pending"),("sent","sent"),("failed","failed")]
+    to=models.EmailField()
+    subject=models.CharField(max_length=200)
+    html=models.TextField()
+    status=models.CharField(max_length=10,choices=STATUS_CHOICES,default="pending")
+    attempts=models.PositiveIntegerField(default=0)
+    next_attempt=models.DateTimeField(default=timezone.now)
+    last_error=models.TextField(blank=True,default="")
+    created=models.DateTimeField(auto_now_add=True)
+    sent=models.DateTimeField(null=True,blank=True)
+    # when the row became sent or failed, the start of its retention
+    finished=models.DateTimeField(null=True,blank=True)
+    class Meta:
+        indexes=[
+            models.Index(fields=["status","next_attempt"],name="outbox_status_next_idx"),
+        ]
     def __str__(self):
-        return self.source
\ No newline at end of file
+        return f"{self.to}: {self.subject}"
@@ -0,0 +1,81 @@
+from decimal import Decimal,InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import ExpressionWrapper,F
+
+# Amounts are stored as integer cents, so SUM and running balances are exact
+# integer arithmetic on every backend (sqlite kept DecimalField as REAL). On the
+# Python side a MoneyField still reads as a two-place Decimal; paths that only
+# add or print amounts read the raw cents through cents() and skip Decimal.
+
+CENTS=Decimal("0.01")
+# bound on the cents of a single row, leaves BIGINT room for sums
+MAX_CENTS=10**18
+
+
+def to_cents(value):
+    # exact cents of an amount given as Decimal, str, int or float; ints are
+    # whole units, more than two places round half to even
+    if isinstance(value,bool):
+        raise ValueError("not an amount")
+    if isinstance(value,int):
+        return value*100
+    try:
+        amount=value if isinstance(value,Decimal) else Decimal(str(value).strip())
+        if not amount.is_finite():
+            raise InvalidOperation
+        if amount.as_tuple().exponent!=-2:
+            amount=amount.quantize(CENTS)
+    except InvalidOperation:
+        raise ValueError(f"{value!r} is not an amount")
+    return int(amount.scaleb(2))
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+ZERO=from_cents(0)
+
+
+def format_cents(cents):
+    # "12.50", "-0.05"; what str() of the Decimal would give, without building one
+    units,rest=divmod(abs(cents),100)
+    return f"-{units}.{rest:02d}" if cents<0 else f"{units}.{rest:02d}"
+
+
+def format_amount(value):
+    if isinstance(value,Decimal) and value.as_tuple().exponent==-2:
+        return str(value)
+    return format_cents(to_cents(value))
+
+
+def cents(field):
+    # the stored integer of a MoneyField, without the Decimal conversion
+    return ExpressionWrapper(F(field),output_field=models.BigIntegerField())
+
+
+class MoneyField(models.BigIntegerField):
+    description="Amount stored as integer cents"
+
+    def from_db_value(self,value,expression,connection):
+        # postgres hands SUM(bigint) back as a numeric
+        return None if value is None else from_cents(int(value))
+
+    def to_python(self,value):
+        if value is None:
+            return None
+        try:
+            return from_cents(to_cents(value))
+        except (ValueError,TypeError):
+            raise ValidationError("“%(value)s” must be an amount.",code="invalid",params={"value":value})
+
+    def get_prep_value(self,value):
+        value=models.Field.get_prep_value(self,value)
+        if value is None:
+            return None
+        try:
+            return to_cents(value)
+        except (ValueError,TypeError) as e:
+            raise e.__class__(f"Field '{self.name}' expected an amount but got {value!r}.") from e
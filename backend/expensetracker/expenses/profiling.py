@@ -0,0 +1,305 @@
+import contextvars
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack,contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger=logging.getLogger(__name__)
+
+DEFAULTS={
+    "ENABLED":False,
+    "SAMPLE_RATE":0.0,
+    "PROFILER":"cprofile",
+    "PROFILE_DIR":None,
+    "DUPLICATE_THRESHOLD":3,
+    "METRICS_TOKEN":None,
+}
+
+SECONDS_BUCKETS=(0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10)
+QUERY_BUCKETS=(0,1,2,5,10,20,50,100,200)
+
+METRICS={
+    "expense_tracker_request_duration_seconds":("histogram","Wall time of a request, streamed bodies included"),
+    "expense_tracker_db_duration_seconds":("histogram","Time spent executing SQL per request"),
+    "expense_tracker_db_queries":("histogram","SQL statements executed per request"),
+    "expense_tracker_serializer_duration_seconds":("histogram","Time spent in DRF serializers per request, SQL excluded"),
+    "expense_tracker_requests_total":("counter","Requests by view, method and status"),
+    "expense_tracker_duplicate_query_requests_total":("counter","Requests that repeated one SQL statement DUPLICATE_THRESHOLD times or more"),
+}
+
+
+def config():
+    return {**DEFAULTS,**getattr(settings,"PROFILING",{})}
+
+
+class Histogram:
+    def __init__(self,buckets):
+        self.buckets=buckets
+        # cumulative, as Prometheus exposes them
+        self.counts=[0]*len(buckets)
+        self.count=0
+        self.sum=0.0
+
+    def observe(self,value):
+        for i,bound in enumerate(self.buckets):
+            if value<=bound:
+                self.counts[i]+=1
+        self.count+=1
+        self.sum+=value
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace("\\","\\\\").replace('"','\\"').replace("\n","\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name,value in labels)
+
+
+class Registry:
+    # per process: with several gunicorn workers every scrape sees one
+    # worker's numbers, so scrape each worker or sum them in Prometheus
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.histograms={}
+        self.counters=Counter()
+
+    def observe(self,name,labels,value,buckets=SECONDS_BUCKETS):
+        with self.lock:
+            key=(name,tuple(labels))
+            if key not in self.histograms:
+                self.histograms[key]=Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    def inc(self,name,labels,amount=1):
+        with self.lock:
+            self.counters[(name,tuple(labels))]+=amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines=[]
+        with self.lock:
+            for name,(kind,help) in METRICS.items():
+                lines+=[f"# HELP {name} {help}",f"# TYPE {name} {kind}"]
+                if kind=="counter":
+                    for (metric,labels),value in sorted(self.counters.items()):
+                        if metric==name:
+                            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+                    continue
+                for (metric,labels),histogram in sorted(self.histograms.items(),key=lambda item:item[0]):
+                    if metric!=name:
+                        continue
+                    for bound,count in zip(histogram.buckets,histogram.counts):
+                        lines.append(f"{name}_bucket{{{_labels(labels+(('le',bound),))}}} {count}")
+                    lines.append(f"{name}_bucket{{{_labels(labels+(('le','+Inf'),))}}} {histogram.count}")
+                    lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+        return "\n".join(lines)+"\n"
+
+
+registry=Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started=time.perf_counter()
+        self.db=0.0
+        self.serializer=0.0
+        self.serializing=False
+        # statement text -> executions; the same text with different params
+        # over and over is the N+1 signature
+        self.statements=Counter()
+
+    def __call__(self,execute,sql,params,many,context):
+        # a connection.execute_wrapper
+        started=time.perf_counter()
+        try:
+            return execute(sql,params,many,context)
+        finally:
+            self.db+=time.perf_counter()-started
+            self.statements[sql]+=1
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    def elapsed(self):
+        return time.perf_counter()-self.started
+
+    def duplicates(self,threshold):
+        return {sql:count for sql,count in self.statements.items() if count>=threshold}
+
+    def server_timing(self,threshold):
+        # what the view did before the response left; streamed bodies are
+        # only in the histograms
+        timings=[
+            f"app;dur={(self.elapsed()-self.db)*1000:.1f}",
+            f'db;dur={self.db*1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serializer*1000:.1f}",
+        ]
+        duplicates=self.duplicates(threshold)
+        if duplicates:
+            timings.append(f'dupes;desc="{len(duplicates)} statements repeated"')
+        return ", ".join(timings)
+
+
+_current=contextvars.ContextVar("profiling_stats",default=None)
+
+
+@contextmanager
+def recording(stats):
+    token=_current.set(stats)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            yield stats
+    finally:
+        _current.reset(token)
+
+
+_instrumented=False
+
+
+def instrument_serializers():
+    # BaseSerializer.data is where both Serializer.data and ListSerializer.data
+    # end up; nested serializers only count once, lazy querysets evaluated
+    # while serializing count as db time
+    global _instrumented
+    if _instrumented:
+        return
+    from rest_framework.serializers import BaseSerializer
+    original=BaseSerializer.data.fget
+
+    def data(self):
+        stats=_current.get()
+        if stats is None or stats.serializing:
+            return original(self)
+        stats.serializing=True
+        started,db=time.perf_counter(),stats.db
+        try:
+            return original(self)
+        finally:
+            stats.serializer+=time.perf_counter()-started-(stats.db-db)
+            stats.serializing=False
+
+    BaseSerializer.data=property(data)
+    _instrumented=True
+
+
+def sampled():
+    rate=config()["SAMPLE_RATE"]
+    return rate>0 and random.random()<rate
+
+
+def start_profiler():
+    if config()["PROFILER"]=="pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            pass
+        else:
+            profiler=Profiler()
+            profiler.start()
+            return profiler
+    profiler=cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already active in this thread
+        return None
+    return profiler
+
+
+def save_profile(profiler,view):
+    # into PROFILE_DIR when set, otherwise the top of the report is logged
+    directory=config()["PROFILE_DIR"]
+    name=f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{random.randrange(1<<16):04x}"
+    if isinstance(profiler,cProfile.Profile):
+        profiler.disable()
+        if directory:
+            path=Path(directory)/f"{name}.prof"
+            profiler.dump_stats(path)
+            return path
+        out=io.StringIO()
+        pstats.Stats(profiler,stream=out).sort_stats("cumulative").print_stats(25)
+        logger.info("profile of %s\n%s",view,out.getvalue())
+        return None
+    profiler.stop()
+    if directory:
+        path=Path(directory)/f"{name}.html"
+        path.write_text(profiler.output_html())
+        return path
+    logger.info("profile of %s\n%s",view,profiler.output_text())
+    return None
+
+
+def view_labels(request):
+    match=getattr(request,"resolver_match",None)
+    if match is None:
+        return (("view","unmatched"),("route",""))
+    return (("view",match.url_name or match.view_name),("route",match.route))
+
+
+def observe(request,response,stats):
+    labels=view_labels(request)
+    threshold=config()["DUPLICATE_THRESHOLD"]
+    registry.observe("expense_tracker_request_duration_seconds",labels,stats.elapsed())
+    registry.observe("expense_tracker_db_duration_seconds",labels,stats.db)
+    registry.observe("expense_tracker_db_queries",labels,stats.queries,QUERY_BUCKETS)
+    registry.observe("expense_tracker_serializer_duration_seconds",labels,stats.serializer)
+    registry.inc("expense_tracker_requests_total",labels+(("method",request.method),("status",response.status_code)))
+    duplicates=stats.duplicates(threshold)
+    if duplicates:
+        registry.inc("expense_tracker_duplicate_query_requests_total",labels)
+        for sql,count in duplicates.items():
+            logger.warning("%s ran the same statement %d times: %s",labels[0][1],count,sql[:300])
+
+
+# streamed bodies run their queries after the view returned, so the wrapper
+# is re-entered around every chunk and the request is observed at the end
+
+def _stream(iterator,stats,done):
+    try:
+        while True:
+            with recording(stats):
+                try:
+                    chunk=next(iterator)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        done()
+
+
+async def _astream(iterator,stats,done):
+    try:
+        while True:
+            with recording(stats):
+                try:
+                    chunk=await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    finally:
+        done()
+
+
+def follow_stream(response,stats,done):
+    if response.is_async:
+        response.streaming_content=_astream(aiter(response.streaming_content),stats,done)
+    else:
+        response.streaming_content=_stream(iter(response.streaming_content),stats,done)
+    return response
@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from expenses import money
+
+
+class MoneyEncoder(encoders.JSONEncoder):
+    # a Decimal in a response is an amount; "12.50" as the serializers give it,
+    # where DRF's encoder would hand out a float
+    def default(self,obj):
+        if isinstance(obj,Decimal):
+            return money.format_amount(obj)
+        return super().default(obj)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    encoder_class=MoneyEncoder
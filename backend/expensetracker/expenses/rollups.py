@@ -0,0 +1,96 @@
+from django.db.models import CharField,Count,F,Sum,Value
+from django.db.models.functions import TruncMonth,TruncWeek,TruncYear
+
+from expenses import filters,money,summaries
+from expenses.models import MonthlySummary
+
+# weeks start on Monday (ISO), months and years on their first day
+GRANULARITIES={
+    "week":TruncWeek,
+    "month":TruncMonth,
+    "year":TruncYear,
+}
+
+
+def parse_granularity(value):
+    value=value or "month"
+    if value not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    return value
+
+
+def period_rows(rows,granularity):
+    # one row per (period, category), the database does the bucketing
+    return rows.annotate(period=GRANULARITIES[granularity]("date")).values(
+        "period","category__name"
+    ).annotate(
+        total=Sum("amount"),
+        count=Count("id")
+    ).order_by()
+
+
+def period_queries(user,granularity,spec=filters.EMPTY):
+    # kind/period/category__name/total/count rows. Whole months come from
+    # MonthlySummary; weeks cut across months, so they, the partial edge months
+    # and amount or text filters are read from the raw rows
+    if granularity=="week":
+        months,edges=None,None
+    else:
+        months,edges=summaries.summary_rows(spec)
+    queries=[]
+    if months is not None:
+        period=F("month") if granularity=="month" else TruncYear("month")
+        queries.append(months.filter(user=user).values(
+            "kind","category__name",period=period
+        ).annotate(
+            total=Sum("total"),
+            count=Sum("count")
+        ).order_by())
+    for kind,model in summaries.KINDS.items():
+        rows=model.objects.filter(user=user)
+        if months is None and edges is None:
+            rows=filters.apply(rows,spec)
+        elif edges is not None:
+            rows=filters.apply(rows,spec.without_dates()).filter(edges)
+        else:
+            continue
+        queries.append(period_rows(rows,granularity).annotate(kind=Value(kind,output_field=CharField())))
+    return queries
+
+
+def _bucket(period):
+    return {
+        "period":period,
+        "income":money.ZERO,
+        "expense":money.ZERO,
+        "net":money.ZERO,
+        "count":0,
+        "categories":{"income":[],"expense":[]},
+    }
+
+
+def build(results):
+    # results: lists of kind/period/category__name/total/count rows, the same
+    # (period, kind, category) may appear in more than one list and is summed
+    buckets={}
+    splits={}
+    for rows in results:
+        for row in rows:
+            kind=row["kind"]
+            bucket=buckets.setdefault(row["period"],_bucket(row["period"]))
+            bucket[kind]+=row["total"]
+            bucket["count"]+=row["count"]
+            split=splits.setdefault((row["period"],kind,row["category__name"]),{
+                "name":row["category__name"],"total":money.ZERO,"count":0
+            })
+            split["total"]+=row["total"]
+            split["count"]+=row["count"]
+    for (period,kind,name),split in sorted(splits.items()):
+        buckets[period]["categories"][kind].append(split)
+    for bucket in buckets.values():
+        bucket["net"]=bucket["income"]-bucket["expense"]
+    return [buckets[period] for period in sorted(buckets)]
+
+
+def rollup(user,granularity="month",spec=filters.EMPTY):
+    return build([list(query) for query in period_queries(user,granularity,spec)])
@@ -0,0 +1,116 @@
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS,connections
+
+REPLICA="replica"
+PIN_COOKIE="pin_primary"
+
+# set while a reporting view runs; a contextvar so it follows the request into
+# sync_to_async threads and async generators
+_use_replica=contextvars.ContextVar("use_replica",default=False)
+
+
+def replica_configured():
+    # a replica alias that is a different database from the primary; a test
+    # mirror, or both URLs naming the same sqlite file, reads the primary
+    if REPLICA not in connections.settings:
+        return False
+    replica=connections[REPLICA].settings_dict
+    primary=connections[DEFAULT_DB_ALIAS].settings_dict
+    return any(replica.get(key)!=primary.get(key) for key in ("ENGINE","NAME","HOST","PORT"))
+
+
+def replica_requested():
+    return _use_replica.get()
+
+
+class ReplicaRouter:
+    # reads inside replica_reads() go to the replica alias when one is
+    # configured, everything else (and every write) stays on the primary
+    def db_for_read(self,model,**hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self,model,**hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self,obj1,obj2,**hints):
+        return True
+
+    def allow_migrate(self,db,app_label,model_name=None,**hints):
+        # the replica receives its schema through replication
+        return db!=REPLICA
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token=_use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pinned(request):
+    # a client that wrote within REPLICA_PIN_SECONDS reads its own writes
+    return PIN_COOKIE in request.COOKIES
+
+
+def pin(response):
+    response.set_cookie(
+        PIN_COOKIE,
+        "1",
+        max_age=getattr(settings,"REPLICA_PIN_SECONDS",10),
+        httponly=True,
+        secure=True,
+        samesite='None',
+        path='/'
+    )
+
+
+# the context is re-entered around every chunk rather than held across yields,
+# so nothing leaks into the server's context between chunks
+
+def _stream(iterator,enabled):
+    while True:
+        with replica_reads(enabled):
+            try:
+                chunk=next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+async def _astream(iterator,enabled):
+    while True:
+        with replica_reads(enabled):
+            try:
+                chunk=await anext(iterator)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def follow_stream(response,enabled):
+    # streaming bodies are consumed after the view returns, outside its context
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content=_astream(aiter(response.streaming_content),enabled)
+        else:
+            response.streaming_content=_stream(iter(response.streaming_content),enabled)
+    return response
+
+
+def reporting(view):
+    # for read-only @api_view function views
+    @wraps(view)
+    def wrapper(request,*args,**kwargs):
+        enabled=not pinned(request)
+        with replica_reads(enabled):
+            response=view(request,*args,**kwargs)
+        return follow_stream(response,enabled)
+    return wrapper
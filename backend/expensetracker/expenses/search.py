@@ -0,0 +1,79 @@
+from django.db import connections
+from django.db.models import CharField,ExpressionWrapper,F,FloatField,Value
+from django.db.models.expressions import RawSQL
+
+from expenses import filters
+from expenses.money import MoneyField
+from expenses.feed import SOURCES
+
+# Ranked search over Expense.title / Income.source and notes. Matching goes
+# through filters.match and the indexes of migration 0021, so every other
+# filter in the spec narrows the same query; this module adds the ranking.
+
+MAX_LIMIT=100
+
+
+def _rank(rows,title_field,text):
+    vendor=connections[rows.db].vendor
+    if vendor=="postgresql":
+        from django.contrib.postgres.search import SearchRank,TrigramSimilarity
+        # word matches rank by ts_rank, near misses ("amazn") by similarity
+        return rows.annotate(rank=ExpressionWrapper(
+            SearchRank(filters.vector(title_field),filters.search_query(text))+
+            TrigramSimilarity(filters.document(title_field),Value(text)),
+            output_field=FloatField()
+        ))
+    if vendor=="sqlite":
+        table=rows.model._meta.db_table
+        fts=filters.fts_table(rows.model)
+        # bm25 is lower-is-better, negated so both backends sort rank descending
+        return rows.annotate(rank=RawSQL(
+            f'SELECT -rank FROM {fts} WHERE {fts} MATCH %s AND rowid="{table}"."id"',
+            [filters.fts_match(text)],
+            output_field=FloatField()
+        ))
+    # the icontains fallback has no score, matches come newest first
+    return rows.annotate(rank=Value(0.0,output_field=FloatField()))
+
+
+def _branch(kind,model,title_field,sign,user,spec):
+    rows=_rank(filters.apply(model.objects.filter(user=user),spec),title_field,spec.text)
+    return rows.values(
+        "id",
+        "date",
+        "rank",
+        entry_kind=Value(kind,output_field=CharField()),
+        entry_title=F(title_field),
+        entry_amount=ExpressionWrapper(
+            F("amount")*sign,
+            output_field=MoneyField()
+        ),
+        entry_category=F("category__name"),
+        entry_notes=F("notes"),
+    ).order_by()
+
+
+def search(user,spec,kinds=None,offset=0,limit=20):
+    # best match first, newest first among equals; (rows, next offset or None)
+    if not spec.text:
+        return [],None
+    branches=[
+        _branch(*source,user,spec)
+        for source in SOURCES if kinds is None or source[0] in kinds
+    ]
+    query=branches[0].union(*branches[1:],all=True) if len(branches)>1 else branches[0]
+    query=query.order_by("-rank","-date","-id")
+    rows=[
+        {
+            "id":row["id"],
+            "kind":row["entry_kind"],
+            "title":row["entry_title"],
+            "amount":row["entry_amount"],
+            "category":row["entry_category"],
+            "date":row["date"],
+            "notes":row["entry_notes"],
+            "rank":row["rank"],
+        }
+        for row in query[offset:offset+limit+1]
+    ]
+    return rows[:limit],offset+limit if len(rows)>limit else None
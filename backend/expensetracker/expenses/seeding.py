@@ -0,0 +1,40 @@
+import random
+from datetime import date,timedelta
+
+from django.contrib.auth.models import User
+
+from expenses import bookkeeping,categories as category_names,money
+from expenses.models import Expense,Income
+
+EXPENSE_TITLES=["groceries","rent","fuel","coffee","electricity","internet","dinner","books","gym","taxi"]
+INCOME_SOURCES=["salary","freelance","interest","dividend","refund","bonus"]
+
+
+def seed_user(username,categories=10,expenses=100,incomes=100,days=365,seed=0,password="bench-password"):
+    # one user with random rows spread over the last `days` days; the derived
+    # tables are rebuilt once at the end because bulk_create skips the hooks
+    rng=random.Random(seed)
+    user=User.objects.create_user(username=username,email=username,password=password)
+    names=[f"{username[:8]}-{i}"[:20] for i in range(categories)]
+    category_ids=[category.id for category in category_names.resolve(names).values()]
+    start=date.today()-timedelta(days=days)
+
+    def row_fields():
+        return {
+            "user":user,
+            "category_id":rng.choice(category_ids),
+            "amount":money.from_cents(rng.randint(100,100000)),
+            "date":start+timedelta(days=rng.randint(0,days)),
+            "notes":"seeded"
+        }
+
+    Expense.objects.bulk_create(
+        [Expense(title=f"{rng.choice(EXPENSE_TITLES)} {i}",**row_fields()) for i in range(expenses)],
+        batch_size=1000
+    )
+    Income.objects.bulk_create(
+        [Income(source=f"{rng.choice(INCOME_SOURCES)} {i}",**row_fields()) for i in range(incomes)],
+        batch_size=1000
+    )
+    bookkeeping.rebuild(user.id)
+    return user
@@ -1,5 +1,29 @@
 from expenses.models import *
+from expenses import money
 from rest_framework import serializers
+from django.db.models.query import QuerySet
+
+
+class MoneyField(serializers.Field):
+    # amounts as "12.50" strings, formatted from the stored cents without the
+    # Decimal context work of serializers.DecimalField
+    default_error_messages={"invalid":"A valid amount is required."}
+    def to_representation(self,value):
+        return money.format_amount(value)
+    def to_internal_value(self,data):
+        try:
+            return money.from_cents(money.to_cents(data))
+        except (ValueError,TypeError):
+            self.fail("invalid")
+
+
+class CategoryListSerializer(serializers.ListSerializer):
+    # list endpoints hand over plain querysets; join the category up front
+    # so categoryName does not cost one query per row
+    def to_representation(self,data):
+        if isinstance(data,QuerySet) and data._result_cache is None:
+            data=data.select_related("category")
+        return super().to_representation(data)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,30 +41,49 @@ class CategorySerializer(serializers.ModelSerializer):
         fields='__all__'
 
 class ExpenseSerializer(serializers.ModelSerializer):
+    amount=MoneyField()
     categoryName=serializers.SerializerMethodField(read_only=True)
     class Meta:
         model=Expense
         fields=['id','user','title','amount','categoryName','date','notes']
+        list_serializer_class=CategoryListSerializer
     def get_categoryName(self,obj):
         return obj.category.name
 
 
 class IncomeSerializer(serializers.ModelSerializer):
+    amount=MoneyField()
     categoryName=serializers.SerializerMethodField(read_only=True)
     class Meta:
         model=Income
         fields=['id','user','source','amount','categoryName','date','notes']
+        list_serializer_class=CategoryListSerializer
     def get_categoryName(self,obj):
         return obj.category.name
 
 class RecentTransactionsSerializer(serializers.Serializer):
     title=serializers.CharField(max_length=100,required=True)
-    amount=serializers.DecimalField(max_digits=20,decimal_places=2)
+    amount=MoneyField()
+    category=serializers.CharField()
+    date=serializers.DateField()
+    notes=serializers.CharField(max_length=500)
+
+class SearchResultSerializer(serializers.Serializer):
+    id=serializers.IntegerField()
+    kind=serializers.CharField()
+    title=serializers.CharField(max_length=100)
+    amount=MoneyField()
     category=serializers.CharField()
     date=serializers.DateField()
     notes=serializers.CharField(max_length=500)
+    rank=serializers.FloatField()
 
 class RecentTotalSerializer(serializers.Serializer):
-    amount=serializers.DecimalField(max_digits=20,decimal_places=2)
+    amount=MoneyField()
+    date=serializers.DateField()
+    total=MoneyField()
+
+class TrendSerializer(serializers.Serializer):
     date=serializers.DateField()
-    total=serializers.DecimalField(max_digits=20,decimal_places=2)
\ No newline at end of file
+    net=MoneyField()
+    average=MoneyField()
\ No newline at end of file
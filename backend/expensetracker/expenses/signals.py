@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete,post_save,pre_save
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+
+from expenses import versions
+from expenses.authentication import user_cache
+from expenses.categories import category_cache
+from expenses.fingerprints import row_fingerprint
+from expenses.models import Category,Expense,Income
+
+
+@receiver(post_save,sender=Expense)
+@receiver(post_save,sender=Income)
+@receiver(post_delete,sender=Expense)
+@receiver(post_delete,sender=Income)
+def bump_data_version(sender,instance,**kwargs):
+    versions.bump(instance.user_id)
+
+
+@receiver(pre_save,sender=Expense)
+@receiver(pre_save,sender=Income)
+def set_fingerprint(sender,instance,**kwargs):
+    instance.fingerprint=row_fingerprint(instance)
+
+
+@receiver(post_save,sender=User)
+@receiver(post_delete,sender=User)
+def drop_cached_user(sender,instance,**kwargs):
+    # covers deactivation, reset_password and verify_email in this process;
+    # other workers age the entry out within AUTH_USER_CACHE["TTL"]
+    user_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save,sender=Category)
+@receiver(post_delete,sender=Category)
+def drop_cached_category(sender,instance,**kwargs):
+    category_cache.invalidate(instance.key)
@@ -0,0 +1,226 @@
+import asyncio
+from collections import defaultdict
+from datetime import date,timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import CharField,Count,F,Q,Sum,Value
+from django.db.models.functions import TruncMonth
+
+from expenses import analytics,filters,money
+from expenses.aggregates import breakdown,category_rows,totals_from_categories
+from expenses.models import Expense,Income,MonthlySummary
+
+KINDS={"income":Income,"expense":Expense}
+
+# past this many touched (month, category, kind) keys a rebuild is cheaper
+REBUILD_THRESHOLD=50
+
+
+def kind_of(model_or_row):
+    return "income" if model_or_row is Income or isinstance(model_or_row,Income) else "expense"
+
+
+def entry(row):
+    # (month, category id, kind, cents) of an Income/Expense
+    day=row.date if isinstance(row.date,date) else date.fromisoformat(str(row.date))
+    return day.replace(day=1),row.category_id,kind_of(row),money.to_cents(row.amount)
+
+
+def record(user_id,added=(),removed=()):
+    deltas=defaultdict(lambda:[0,0])
+    for month,category_id,kind,cents in added:
+        deltas[(month,category_id,kind)][0]+=cents
+        deltas[(month,category_id,kind)][1]+=1
+    for month,category_id,kind,cents in removed:
+        deltas[(month,category_id,kind)][0]-=cents
+        deltas[(month,category_id,kind)][1]-=1
+    apply_deltas(user_id,deltas)
+
+
+def apply_deltas(user_id,deltas):
+    deltas={key:delta for key,delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    if len(deltas)>REBUILD_THRESHOLD:
+        rebuild(user_id)
+        return
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id=user_id).values_list("id"))
+        rows=MonthlySummary.objects.filter(user_id=user_id)
+        for (month,category_id,kind),(cents,count) in sorted(deltas.items()):
+            key=rows.filter(month=month,category_id=category_id,kind=kind)
+            # the column holds cents, a plain int is added as is
+            if not key.update(total=F("total")+cents,count=F("count")+count):
+                MonthlySummary.objects.create(
+                    user_id=user_id,month=month,category_id=category_id,kind=kind,
+                    total=money.from_cents(cents),count=count
+                )
+            elif count<0:
+                key.filter(count__lte=0).delete()
+
+
+def expected_rows(user_id):
+    rows=[]
+    for kind,model in KINDS.items():
+        totals=model.objects.filter(user_id=user_id).values(month=TruncMonth("date"),cat=F("category_id")).annotate(
+            total=Sum("amount"),
+            count=Count("id")
+        ).order_by()
+        rows+=[
+            MonthlySummary(
+                user_id=user_id,month=row["month"],category_id=row["cat"],kind=kind,
+                total=row["total"],count=row["count"]
+            )
+            for row in totals
+        ]
+    return rows
+
+
+def rebuild(user_id):
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id=user_id).values_list("id"))
+        rows=expected_rows(user_id)
+        MonthlySummary.objects.filter(user_id=user_id).delete()
+        MonthlySummary.objects.bulk_create(rows,batch_size=1000)
+    return len(rows)
+
+
+def check(user_id):
+    # mismatches between the summary table and the raw Income/Expense rows
+    def key(row):
+        return row.month,row.category_id,row.kind
+    expected={key(row):(row.total,row.count) for row in expected_rows(user_id)}
+    stored={key(row):(row.total,row.count) for row in MonthlySummary.objects.filter(user_id=user_id)}
+    return [
+        {"key":k,"expected":expected.get(k),"stored":stored.get(k)}
+        for k in sorted(set(expected)|set(stored),key=str)
+        if expected.get(k)!=stored.get(k)
+    ]
+
+
+# reads: whole months come from the summary table, the partial months at either
+# end of the range from the raw rows
+
+def _next_month(day):
+    return (day.replace(day=1)+timedelta(days=32)).replace(day=1)
+
+
+def split_range(fromDate,toDate):
+    # (Q over summary months or None, Q over raw rows or None) for dates from a
+    # filters.Filters; either end may be open
+    if not (fromDate or toDate):
+        return Q(),None
+    first=stop=None
+    if fromDate:
+        first=fromDate if fromDate.day==1 else _next_month(fromDate)
+    if toDate:
+        stop=_next_month(toDate) if _next_month(toDate)-timedelta(days=1)==toDate else toDate.replace(day=1)
+    if first and stop and first>=stop:
+        return None,Q(date__gte=fromDate,date__lte=toDate)
+    months=Q()
+    edges=None
+    if first:
+        months&=Q(month__gte=first)
+        if fromDate<first:
+            edges=Q(date__gte=fromDate,date__lt=first)
+    if stop:
+        months&=Q(month__lt=stop)
+        if stop<=toDate:
+            edge=Q(date__gte=stop,date__lte=toDate)
+            edges=edge if edges is None else edges|edge
+    return months,edges
+
+
+def summary_rows(spec):
+    # MonthlySummary rows for the whole months of spec; None when spec needs
+    # the raw rows (amount or text filters) or covers no whole month
+    if not spec.summarizable:
+        return None,None
+    months,edges=split_range(spec.fromDate,spec.toDate)
+    if months is None:
+        return None,edges
+    if spec.categories:
+        months&=Q(category__key__in=spec.categories)
+    return MonthlySummary.objects.filter(months),edges
+
+
+def category_queries(user,kinds,spec=filters.EMPTY):
+    # querysets of kind/category_id/category__name/total/count rows to be merged
+    months,edges=summary_rows(spec)
+    queries=[]
+    if months is not None:
+        queries.append(months.filter(user=user,kind__in=kinds).values(
+            "kind","category_id","category__name"
+        ).annotate(
+            total=Sum("total"),
+            count=Sum("count")
+        ).order_by())
+    for kind in kinds:
+        if not spec.summarizable:
+            rows=category_rows(KINDS[kind],user,spec)
+        elif edges is not None:
+            rows=category_rows(KINDS[kind],user,spec.without_dates()).filter(edges)
+        else:
+            continue
+        queries.append(rows.annotate(kind=Value(kind,output_field=CharField())))
+    return queries
+
+
+def merge_categories(kinds,results):
+    # kind -> category totals in the shape of aggregates.category_totals
+    merged={kind:{} for kind in kinds}
+    for rows in results:
+        for row in rows:
+            item=merged[row["kind"]].setdefault(row["category_id"],{
+                "id":row["category_id"],
+                "name":row["category__name"],
+                "total":money.ZERO,
+                "count":0
+            })
+            item["total"]+=row["total"]
+            item["count"]+=row["count"]
+    return {kind:[totals[key] for key in sorted(totals)] for kind,totals in merged.items()}
+
+
+def category_totals_by_kind(user,kinds,spec=filters.EMPTY,version=None):
+    history=analytics.cached(user,spec,version)
+    if history is not None:
+        return analytics.category_totals_by_kind(history,kinds,spec)
+    return merge_categories(kinds,[list(query) for query in category_queries(user,kinds,spec)])
+
+
+async def _alist(query):
+    return [row async for row in query]
+
+
+async def acategory_totals_by_kind(user,kinds,spec=filters.EMPTY,version=None):
+    history=analytics.cached(user,spec,version)
+    if history is not None:
+        return analytics.category_totals_by_kind(history,kinds,spec)
+    queries=category_queries(user,kinds,spec)
+    return merge_categories(kinds,await asyncio.gather(*[_alist(query) for query in queries]))
+
+
+def category_totals(model,user,spec=filters.EMPTY,version=None):
+    kind=kind_of(model)
+    return category_totals_by_kind(user,[kind],spec,version)[kind]
+
+
+def category_breakdown(model,user,spec=filters.EMPTY,version=None):
+    return breakdown(category_totals(model,user,spec,version))
+
+
+async def acategory_breakdown(model,user,spec=filters.EMPTY,version=None):
+    kind=kind_of(model)
+    return breakdown((await acategory_totals_by_kind(user,[kind],spec,version))[kind])
+
+
+def totals(user,spec=filters.EMPTY,version=None):
+    by_kind=category_totals_by_kind(user,list(KINDS),spec,version)
+    return totals_from_categories(by_kind["income"],by_kind["expense"])
+
+
+async def atotals(user,spec=filters.EMPTY,version=None):
+    by_kind=await acategory_totals_by_kind(user,list(KINDS),spec,version)
+    return totals_from_categories(by_kind["income"],by_kind["expense"])
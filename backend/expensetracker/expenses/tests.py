@@ -1,3 +1,1052 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from datetime import date,timedelta
+from decimal import Decimal
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError,call_command
+from django.db import connection,connections,transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.test import TestCase,override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from expenses import aggregates,analytics,bookkeeping,bulk,filters,importers,ledger,mail,money,profiling,rollups,routers,search,summaries,throttling,versions
+from expenses import categories as category_names
+from expenses.authentication import user_cache
+from expenses.cache import get_summary_cache
+from expenses.mail import LocMemTransport
+from expenses.models import Category,DailyBalance,Expense,Income,OutboxEmail
+
+
+# one client makes hundreds of requests here; ThrottlingTests turns it back on
+throttling_off=override_settings(THROTTLING={"ENABLED":False})
+
+
+def setUpModule():
+    throttling_off.enable()
+
+
+def tearDownModule():
+    throttling_off.disable()
+
+
+def seed(user,rows,categories=5):
+    names=[f"cat-{i}" for i in range(categories)]
+    found=category_names.resolve(names)
+    category_ids=[found[name].id for name in names]
+    start=date(2025,1,1)
+    Expense.objects.bulk_create([
+        Expense(user=user,title=f"expense {i}",amount=i+1,category_id=category_ids[i%categories],date=start+timedelta(days=i),notes="")
+        for i in range(rows)
+    ])
+    Income.objects.bulk_create([
+        Income(user=user,source=f"income {i}",amount=i+1,category_id=category_ids[i%categories],date=start+timedelta(days=i),notes="")
+        for i in range(rows)
+    ])
+    bookkeeping.rebuild(user.id)
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class QueryBudgetTests(TestCase):
+    # maximum number of queries per endpoint on a cold cache; an N+1 regression
+    # blows the budget because every endpoint is hit with a few dozen rows per table
+    BUDGETS={
+        "/expense/":2,
+        "/income/":2,
+        "/expense/transactions/":2,
+        "/income/transactions/":2,
+        "/expense/expenseCategory/":2,
+        "/income/categoryIncome/":2,
+        "/expense/transactions/csv/":2,
+        "/income/transactions/csv/":2,
+        "/users/transactions/":2,
+        "/users/transactions-total/":2,
+        "/users/total/":3,
+        "/users/recent-total/":3,
+        "/users/transactions/csv/":3,
+        "/users/dashboard/":6,
+        "/users/rollup/":3,
+        "/users/categories/":2,
+    }
+
+    def setUp(self):
+        self.user=User.objects.create_user(username="budget@example.com",password="budget-password")
+        seed(self.user,rows=40)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self,url,params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response=self.client.get(url,params or {})
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code,200,url)
+        return len(ctx.captured_queries)
+
+    def test_endpoint_budgets(self):
+        for url,budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url),budget)
+
+    def test_budgets_hold_with_date_range(self):
+        params={"from":"2025-01-10","to":"2025-02-10"}
+        for url,budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url,params),budget)
+
+    def test_breakdown_queries_do_not_grow(self):
+        # summaries, summaries plus raw month edges, and raw rows only
+        specs=[{},{"from":"2025-01-10","to":"2025-02-10"},{"amount_min":"2"}]
+        counts=[]
+        for n,(categories,rows) in enumerate([(2,10),(10,60),(30,200)]):
+            user=User.objects.create_user(username=f"breakdown{n}@example.com",password="breakdown-password")
+            seed(user,rows=rows,categories=categories)
+            self.client.force_authenticate(user)
+            counts.append([self.count_queries("/expense/expenseCategory/",params) for params in specs])
+            with self.assertNumQueries(1):
+                aggregates.category_breakdown(Expense,user)
+        self.assertEqual(counts,[counts[0]]*3)
+        self.assertLessEqual(max(counts[0]),self.BUDGETS["/expense/expenseCategory/"])
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"redis","CLIENT":"expenses.cache.LocalRedis"})
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="cache@example.com",password="cache-password")
+        seed(self.user,rows=10)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hit_until_write(self):
+        first=self.client.get("/users/total/").json()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get("/users/total/").json(),first)
+        self.assertEqual(len(ctx.captured_queries),1)
+        self.client.post("/income/",{"source":"bonus","amount":"10.00","category":"cat-0","notes":"","date":"2025-03-01"},format="json")
+        after=self.client.get("/users/total/").json()
+        self.assertEqual(float(after["total income"]),float(first["total income"])+10)
+        stats=get_summary_cache().stats()
+        self.assertEqual((stats["hits"],stats["misses"]),(1,2))
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="rollup@example.com",password="rollup-password")
+        seed(self.user,rows=70)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_buckets_add_up_to_totals(self):
+        params={"from":"2025-01-10","to":"2025-03-05"}
+        totals=self.client.get("/users/total/",params).json()
+        for granularity,periods in [("week",9),("month",3),("year",1)]:
+            with self.subTest(granularity=granularity):
+                buckets=self.client.get("/users/rollup/",{**params,"granularity":granularity}).json()["buckets"]
+                self.assertEqual(len(buckets),periods)
+                self.assertAlmostEqual(sum(float(b["income"]) for b in buckets),float(totals["total income"]))
+                self.assertAlmostEqual(sum(float(b["net"]) for b in buckets),float(totals["total amount"]))
+                for bucket in buckets:
+                    split=sum(float(c["total"]) for c in bucket["categories"]["expense"])
+                    self.assertAlmostEqual(split,float(bucket["expense"]))
+        self.assertEqual(buckets[0]["period"],"2025-01-01")
+        self.assertEqual(self.client.get("/users/rollup/",{"granularity":"day"}).status_code,400)
+
+
+class MonthlySummaryTests(TestCase):
+    SPECS=[
+        filters.Filters(),
+        filters.Filters("2025-01-01","2025-03-31"),
+        filters.Filters("2025-01-15","2025-03-10"),
+        filters.Filters("2025-02-03","2025-02-20"),
+        filters.Filters("2025-01-15",None),
+        filters.Filters(None,"2025-02-20"),
+        filters.Filters("2025-01-15","2025-03-10",categories=["cat-1","cat-2"]),
+        filters.Filters(None,"2025-03-10",amount_min="20",amount_max="60"),
+    ]
+
+    def setUp(self):
+        self.user=User.objects.create_user(username="summary@example.com",password="summary-password")
+        seed(self.user,rows=90)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_keep_summaries_in_step(self):
+        self.client.post("/income/",{"source":"bonus","amount":"10.00","category":"cat-0","notes":"","date":"2025-03-01"},format="json")
+        expense=Expense.objects.filter(user=self.user).order_by("id").first()
+        self.client.put("/expense/",{
+            "id":expense.id,"title":"moved","amount":"99.50","categoryName":"cat-3","date":"2025-05-02","notes":""
+        },format="json")
+        self.assertEqual(Expense.objects.get(id=expense.id).date,date(2025,5,2))
+        self.client.delete(f"/income/{Income.objects.filter(user=self.user).order_by('-id').last().id}")
+        created=self.client.post("/expense/bulk/",{"items":[
+            {"title":"a","amount":"1.00","category":"cat-1","date":"2025-02-10"},
+            {"title":"b","amount":"2.00","category":"new-cat","date":"2024-12-31"},
+        ]},format="json").json()["created"]
+        self.client.delete("/expense/bulk/",{"ids":[created[0]["id"]]},format="json")
+        self.assertEqual(summaries.check(self.user.id),[])
+
+    def test_reads_match_raw_rows(self):
+        for spec in self.SPECS:
+            with self.subTest(spec=spec):
+                self.assertEqual(summaries.totals(self.user,spec),aggregates.totals(self.user,spec))
+                for model in [Income,Expense]:
+                    self.assertEqual(
+                        summaries.category_totals(model,self.user,spec),
+                        aggregates.category_totals(model,self.user,spec)
+                    )
+                raw=filters.apply(Income.objects.filter(user=self.user),spec)
+                for granularity in ["week","month","year"]:
+                    buckets=rollups.rollup(self.user,granularity,spec)
+                    self.assertEqual(sum(b["income"] for b in buckets),sum(raw.values_list("amount",flat=True)))
+
+    def test_whole_months_skip_raw_rows(self):
+        with CaptureQueriesContext(connection) as ctx:
+            summaries.totals(self.user,filters.Filters("2025-01-01","2025-02-28"))
+        self.assertEqual(len(ctx.captured_queries),1)
+        self.assertIn("monthlysummary",ctx.captured_queries[0]["sql"])
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="etag@example.com",password="etag-password")
+        seed(self.user,rows=60)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        # the async views authenticate from the cookie themselves
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def test_not_modified_until_write(self):
+        for path in ["/users/total/","/expense/","/async/users/total/"]:
+            with self.subTest(path=path):
+                tag=self.client.get(path)["ETag"]
+                with CaptureQueriesContext(connection) as ctx:
+                    response=self.client.get(path,HTTP_IF_NONE_MATCH=f"W/{tag}")
+                self.assertEqual(response.status_code,304)
+                self.assertEqual(len(ctx.captured_queries),1)
+                self.assertNotEqual(self.client.get(path,{"from":"2025-01-01","to":"2025-01-31"})["ETag"],tag)
+        tag=self.client.get("/users/total/")["ETag"]
+        self.client.post("/income/",{"source":"bonus","amount":"10.00","category":"cat-0","notes":"","date":"2025-03-01"},format="json")
+        self.assertEqual(self.client.get("/users/total/",HTTP_IF_NONE_MATCH=tag).status_code,200)
+
+    def test_compression(self):
+        response=self.client.get("/users/transactions-total/",HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"],"gzip")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertEqual(self.client.get("/users/transactions-total/",HTTP_IF_NONE_MATCH=response["ETag"]).status_code,304)
+        export=self.client.get("/users/transactions/csv/",{"gzip":"1"},HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(export.has_header("Content-Encoding"))
+        # tokens sit next to the reflected username, see middleware.carries_secrets
+        login=APIClient().post("/users/login/",{"username":"etag@example.com","password":"etag-password"},
+            format="json",HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(login.status_code,200)
+        self.assertIn("access",login.json())
+        self.assertFalse(login.has_header("Content-Encoding"))
+
+
+class RecordingRouter(routers.ReplicaRouter):
+    # keeps every read on the test database but remembers where it was meant to go
+    reads=[]
+
+    def db_for_read(self,model,**hints):
+        self.reads.append(routers.replica_requested())
+        return None
+
+
+@override_settings(DATABASE_ROUTERS=["expenses.tests.RecordingRouter"],SUMMARY_CACHE={"BACKEND":"dummy"})
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="replica@example.com",password="replica-password")
+        seed(self.user,rows=10)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reads(self,path):
+        RecordingRouter.reads=[]
+        response=self.client.get(path)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code,200)
+        return set(RecordingRouter.reads)
+
+    def test_reports_read_from_replica_unless_pinned(self):
+        for path in ["/users/total/","/expense/expenseCategory/","/users/transactions/csv/"]:
+            with self.subTest(path=path):
+                self.assertEqual(self.reads(path),{True})
+        self.assertEqual(self.reads("/expense/"),{False})
+        # set by PrimaryPinMiddleware after a write when a replica is configured
+        self.client.cookies[routers.PIN_COOKIE]="1"
+        self.assertEqual(self.reads("/users/total/"),{False})
+        self.assertEqual(self.reads("/users/transactions/csv/"),{False})
+        self.assertFalse(routers.replica_requested())
+
+
+class FailingTransport:
+    def send(self,email):
+        raise RuntimeError("provider down")
+
+
+@override_settings(EMAIL_OUTBOX={"TRANSPORT":"locmem","BACKOFF_SECONDS":60,"MAX_ATTEMPTS":2},FRONTEND_URL="http://app")
+class OutboxTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="mail@example.com",email="mail@example.com",password="mail-password")
+        LocMemTransport.sent.clear()
+
+    def test_forgot_password_is_queued_then_delivered(self):
+        response=APIClient().post("/users/forgot-password/",{"email":"mail@example.com"},format="json")
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(LocMemTransport.sent,[])
+        self.assertEqual(mail.deliver(),(1,0))
+        self.assertEqual(LocMemTransport.sent[0][0],"mail@example.com")
+        self.assertEqual(OutboxEmail.objects.get().status,"sent")
+
+    def test_failures_back_off_then_give_up(self):
+        email=mail.enqueue("mail@example.com","subject","<p>body</p>")
+        self.assertEqual(mail.deliver(FailingTransport()),(0,1))
+        email.refresh_from_db()
+        self.assertEqual((email.status,email.attempts,email.last_error),("pending",1,"provider down"))
+        self.assertGreater(email.next_attempt,timezone.now()+timedelta(seconds=50))
+        self.assertEqual(mail.deliver(FailingTransport()),(0,0))
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        mail.deliver(FailingTransport())
+        email.refresh_from_db()
+        self.assertEqual((email.status,email.attempts),("failed",2))
+
+    def test_finished_emails_are_purged(self):
+        now=timezone.now()
+        old=now-timedelta(days=8)
+        sent,failed,recent,pending=[mail.enqueue("mail@example.com","subject","<p>token</p>") for _ in range(4)]
+        OutboxEmail.objects.filter(id=sent.id).update(status="sent",sent=old,finished=old)
+        OutboxEmail.objects.filter(id=failed.id).update(status="failed",finished=old)
+        OutboxEmail.objects.filter(id=recent.id).update(status="sent",sent=now,finished=now)
+        OutboxEmail.objects.filter(id=pending.id).update(created=old,next_attempt=old)
+        self.assertEqual(mail.purge(),2)
+        self.assertEqual(set(OutboxEmail.objects.values_list("id",flat=True)),{recent.id,pending.id})
+        # the worker purges on start; a zero retention takes the fresh one too
+        out=io.StringIO()
+        call_command("send_outbox","--once","--retention-days","0",stdout=out)
+        self.assertIn("purged 1",out.getvalue())
+        self.assertEqual(OutboxEmail.objects.get().status,"sent")
+
+    def test_failed_emails_are_kept_from_their_last_attempt(self):
+        # scheduled long ago, failing for good only now
+        email=mail.enqueue("mail@example.com","subject","<p>token</p>")
+        OutboxEmail.objects.update(next_attempt=timezone.now()-timedelta(days=30),attempts=1)
+        mail.deliver(FailingTransport())
+        email.refresh_from_db()
+        self.assertEqual(email.status,"failed")
+        self.assertGreater(email.next_attempt,timezone.now())
+        self.assertEqual(mail.purge(retention_days=1),0)
+        with patch("expenses.mail.timezone.now",return_value=email.finished+timedelta(days=1)):
+            self.assertEqual(mail.purge(retention_days=1),0)
+        with patch("expenses.mail.timezone.now",return_value=email.finished+timedelta(days=1,seconds=1)):
+            self.assertEqual(mail.purge(retention_days=1),1)
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="auth@example.com",password="auth-password")
+        self.client=APIClient()
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+        user_cache.clear()
+
+    def test_user_lookup_cached_until_user_changes(self):
+        self.assertEqual(self.client.get("/users/fetch/").status_code,200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get("/users/fetch/").json()["username"],"auth@example.com")
+        self.assertEqual(len(ctx.captured_queries),0)
+        self.user.is_active=False
+        self.user.save()
+        self.assertEqual(self.client.get("/users/fetch/").status_code,401)
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class AsyncViewTests(TestCase):
+    PATHS=[
+        "/users/total/",
+        "/users/recent-total/",
+        "/users/transactions/",
+        "/users/transactions-total/",
+        "/users/transactions/csv/",
+        "/expense/expenseCategory/",
+        "/expense/transactions/csv/",
+        "/income/categoryIncome/",
+        "/income/transactions/csv/",
+    ]
+
+    def setUp(self):
+        self.user=User.objects.create_user(username="async@example.com",password="async-password")
+        seed(self.user,rows=30)
+        self.client=APIClient()
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def body(self,response):
+        self.assertEqual(response.status_code,200)
+        if response.streaming and response.is_async:
+            async def read():
+                return b"".join([chunk async for chunk in response.streaming_content])
+            return async_to_sync(read)()
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_async_views_match_sync_views(self):
+        for params in [{},{"from":"2025-01-05","to":"2025-01-20"}]:
+            for path in self.PATHS:
+                with self.subTest(path=path,params=params):
+                    sync=self.client.get(path,params)
+                    asynchronous=self.client.get("/async"+path,params)
+                    if path.endswith("csv/"):
+                        # the async export merges in SQL, ties on a date may swap
+                        self.assertEqual(sorted(self.body(asynchronous).splitlines()),sorted(self.body(sync).splitlines()))
+                    else:
+                        self.assertEqual(self.body(asynchronous),self.body(sync))
+
+    def test_async_pagination_and_auth(self):
+        first=self.client.get("/async/users/transactions-total/",{"limit":7})
+        cursor=first["X-Next-Cursor"]
+        self.assertEqual(first.content,self.client.get("/users/transactions-total/",{"limit":7}).content)
+        second=self.client.get("/async/users/transactions-total/",{"limit":7,"after":cursor})
+        self.assertEqual(second.content,self.client.get("/users/transactions-total/",{"limit":7,"after":cursor}).content)
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get("/async/users/total/").status_code,401)
+
+
+@override_settings(PROFILING={"ENABLED":True})
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.registry.clear()
+        self.user=User.objects.create_user(username="profile@example.com",password="profile-password")
+        seed(self.user,rows=20)
+        self.client=APIClient()
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def test_server_timing_and_metrics(self):
+        timing=self.client.get("/users/transactions/")["Server-Timing"]
+        self.assertRegex(timing,r'db;dur=[0-9.]+;desc="\d+ queries"')
+        self.assertIn("serialize;dur=",timing)
+        b"".join(self.client.get("/users/transactions/csv/").streaming_content)
+        staff=User.objects.create_user(username="ops@example.com",password="ops-password",is_staff=True)
+        scraper=APIClient()
+        scraper.cookies["access_token"]=str(AccessToken.for_user(staff))
+        metrics=scraper.get("/metrics").content.decode()
+        self.assertIn('expense_tracker_request_duration_seconds_count{view="recent_transactions",route="users/transactions/"} 1',metrics)
+        self.assertIn('expense_tracker_requests_total{view="export-csv",route="users/transactions/csv/",method="GET",status="200"} 1',metrics)
+        # without a token only staff may scrape
+        self.assertEqual(APIClient().get("/metrics").status_code,401)
+        self.assertEqual(self.client.get("/metrics").status_code,401)
+        with override_settings(PROFILING={"ENABLED":True,"METRICS_TOKEN":"scrape"}):
+            self.assertEqual(APIClient().get("/metrics").status_code,401)
+            self.assertEqual(APIClient().get("/metrics",HTTP_AUTHORIZATION="Bearer scrap").status_code,401)
+            self.assertEqual(APIClient().get("/metrics",HTTP_AUTHORIZATION="Bearer scrape").status_code,200)
+            self.assertEqual(scraper.get("/metrics").status_code,200)
+        with override_settings(PROFILING={"ENABLED":False}):
+            self.assertEqual(APIClient().get("/metrics").status_code,404)
+
+    def test_repeated_statements_are_flagged(self):
+        stats=profiling.RequestStats()
+        with profiling.recording(stats):
+            for category in list(Category.objects.all()[:4]):
+                Category.objects.get(id=category.id)
+        self.assertEqual(stats.queries,5)
+        self.assertEqual(list(stats.duplicates(3).values()),[4])
+        self.assertIn("dupes;",stats.server_timing(3))
+
+    def test_sampled_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING={"ENABLED":True,"SAMPLE_RATE":1.0,"PROFILE_DIR":directory}):
+                APIClient().head("/users/health/")
+                self.client.get("/users/total/")
+            names=sorted(path.name for path in Path(directory).iterdir())
+        self.assertEqual(len(names),2)
+        self.assertTrue(all(name.endswith(".prof") for name in names))
+        self.assertTrue(any("-totalDetail-" in name for name in names))
+
+
+@override_settings(THROTTLING={
+    "RATES":{"ip":(30,1.0),"user":(25,1.0)},
+    "COSTS":{"export-csv":10,"async-export-csv":10,"login_user":10},
+})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        throttling.get_backend().clear()
+        self.user=User.objects.create_user(username="throttle@example.com",password="throttle-password")
+        seed(self.user,rows=5)
+        self.client=APIClient()
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def test_exports_cost_more_than_lists(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get("/users/transactions/csv/").status_code,200)
+        throttled=self.client.get("/expense/transactions/csv/")
+        self.assertEqual(throttled.status_code,429)
+        self.assertTrue(1<=int(throttled["Retry-After"])<=10)
+        self.assertEqual(self.client.get("/async/users/transactions/csv/").status_code,429)
+        # the remaining tokens still cover cheap requests
+        self.assertEqual(self.client.get("/users/total/").status_code,200)
+
+    def test_login_is_limited_per_ip(self):
+        credentials={"username":"throttle@example.com","password":"wrong"}
+        for _ in range(3):
+            self.assertEqual(APIClient().post("/users/login/",credentials,format="json").status_code,401)
+        self.assertEqual(APIClient().post("/users/login/",credentials,format="json").status_code,429)
+        self.assertEqual(APIClient(REMOTE_ADDR="10.0.0.2").post("/users/login/",credentials,format="json").status_code,401)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="search@example.com",password="search-password")
+        other=User.objects.create_user(username="other@example.com",password="other-password")
+        seed(self.user,rows=30)
+        shopping=Category.objects.create(name="shopping")
+        Expense.objects.create(user=self.user,title="Amazon order",amount=25,category=shopping,date=date(2025,3,2),notes="headphones")
+        Expense.objects.create(user=self.user,title="Groceries",amount=40,category_id=shopping.id,date=date(2025,3,5),notes="amazon fresh delivery")
+        Income.objects.create(user=self.user,source="Amazon refund",amount=25,category=shopping,date=date(2025,4,1),notes="")
+        Expense.objects.create(user=other,title="Amazon order",amount=99,category=shopping,date=date(2025,3,2),notes="")
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def results(self,**params):
+        response=self.client.get("/users/search/",params)
+        self.assertEqual(response.status_code,200)
+        return response.data
+
+    def test_prefix_search_across_kinds(self):
+        data=self.results(q="amaz")
+        self.assertEqual(sorted((row["kind"],row["title"]) for row in data["results"]),[
+            ("expense","Amazon order"),("expense","Groceries"),("income","Amazon refund")
+        ])
+        self.assertEqual(self.results(q="amazon headphones")["results"][0]["title"],"Amazon order")
+        self.assertEqual([row["title"] for row in self.results(q="amazon",kind="income")["results"]],["Amazon refund"])
+        self.assertEqual(len(self.results(q="amazon",**{"from":"2025-03-03","to":"2025-03-31"})["results"]),1)
+        self.assertEqual(self.results(q="amazon",category="cat-0")["results"],[])
+        self.assertEqual(self.results(q="  ")["results"],[])
+
+    def test_pagination_and_index_maintenance(self):
+        first=self.results(q="expense",limit=20)
+        self.assertEqual(len(first["results"]),20)
+        second=self.results(q="expense",limit=20,offset=first["next_offset"])
+        self.assertIsNone(second["next_offset"])
+        self.assertEqual(len({row["id"] for row in first["results"]+second["results"]}),30)
+        row=Expense.objects.get(title="Amazon order",user=self.user)
+        row.title="Bookshop"
+        row.save()
+        Income.objects.filter(source="Amazon refund").delete()
+        self.assertEqual([row["title"] for row in self.results(q="amazon")["results"]],["Groceries"])
+        self.assertEqual(len(self.results(q="bookshop")["results"]),1)
+
+    def test_other_vendors_scan_with_icontains(self):
+        with patch.object(connections["default"],"vendor","mysql"),CaptureQueriesContext(connection) as ctx:
+            self.assertEqual([row["title"] for row in self.results(q="AMAZON fresh")["results"]],["Groceries"])
+            data=self.results(q="amazon",**{"from":"2025-03-01","to":"2025-03-31"})
+        self.assertFalse(any("_fts" in query["sql"] for query in ctx.captured_queries))
+        # no score: newest first
+        self.assertEqual([row["title"] for row in data["results"]],["Groceries","Amazon order"])
+
+    @skipUnless(find_spec("psycopg"),"compiling for Postgres needs psycopg")
+    def test_postgres_queries_use_the_indexed_expressions(self):
+        # compiled only, no server: the WHERE clause must repeat the expressions
+        # of the GIN indexes in 0021 verbatim or Postgres will not use them
+        from django.db.backends.postgresql.base import DatabaseWrapper
+        postgres=DatabaseWrapper({**connection.settings_dict,"ENGINE":"django.db.backends.postgresql"},"default")
+        found={"default":postgres}
+        with patch("expenses.filters.connections",found),patch("expenses.search.connections",found):
+            rows=filters.match(Expense.objects.filter(user=self.user),"amazon order")
+            rows=search._rank(rows,"title","amazon order")
+        sql,params=rows.query.get_compiler(connection=postgres).as_sql()
+        search_indexes=import_module("expenses.migrations.0021_search_indexes")
+        with postgres.schema_editor(collect_sql=True,atomic=False) as editor:
+            query=(sql%tuple(editor.quote_value(param) for param in params)).replace('"expenses_expense".',"")
+            words,trigrams=[str(index.create_sql(Expense,editor)) for index in search_indexes.postgres_indexes("title")]
+        vector="""to_tsvector('simple'::regconfig, COALESCE("title", '') || ' ' || COALESCE("notes", ''))"""
+        document="""(COALESCE("title", '') || COALESCE((COALESCE(' ', '') || COALESCE("notes", '')), ''))"""
+        self.assertEqual(words,f'CREATE INDEX "expense_search_idx" ON "expenses_expense" USING gin (({vector}))')
+        self.assertEqual(trigrams,f'CREATE INDEX "expense_trigram_idx" ON "expenses_expense" USING gin (({document} gin_trgm_ops))')
+        self.assertIn(f"{vector} @@ (websearch_to_tsquery('simple'::regconfig, 'amazon order'))",query)
+        self.assertIn(f"{document} % 'amazon order'",query)
+        self.assertIn(f"SIMILARITY({document}, 'amazon order')",query)
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class FilterTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="filters@example.com",password="filters-password")
+        seed(self.user,rows=30)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def queryset(self,spec):
+        return filters.order(filters.apply(Expense.objects.filter(user=self.user),spec),spec)
+
+    def test_sql_is_pinned(self):
+        spec=filters.parse(QueryDict("from=2025-01-05&category=Cat-1,CAT-2&amount_min=3&amount_max=20&sort=-amount"))
+        sql=str(self.queryset(spec).query)
+        self.assertIn(
+            f'WHERE ("expenses_expense"."user_id" = {self.user.id} AND "expenses_expense"."date" >= 2025-01-05 '
+            'AND "expenses_category"."key" IN (cat-1, cat-2) '
+            'AND "expenses_expense"."amount" >= 300 AND "expenses_expense"."amount" <= 2000)',
+            sql
+        )
+        self.assertTrue(sql.endswith('ORDER BY "expenses_expense"."amount" DESC, "expenses_expense"."id" DESC'))
+        self.assertTrue(str(self.queryset(filters.EMPTY).query).endswith(
+            'ORDER BY "expenses_expense"."date" DESC, "expenses_expense"."id" DESC'
+        ))
+
+    @skipUnless(connection.vendor=="sqlite","plan text is SQLite's")
+    def test_plans_use_indexes(self):
+        plan=self.queryset(filters.Filters("2025-01-05",None)).explain()
+        self.assertIn("expense_user_date_id_idx (user_id=? AND date>?)",plan)
+        # the index already yields newest first
+        self.assertNotIn("TEMP B-TREE",plan)
+        self.assertIn("expense_user_cat_date_idx",self.queryset(filters.Filters(categories=["cat-1"])).explain())
+
+    def test_list_filters(self):
+        def titles(path="/expense/",**params):
+            response=self.client.get(path,params)
+            self.assertEqual(response.status_code,200)
+            return [row["title" if path=="/expense/" else "source"] for row in response.data]
+        # open ended on either side, where both ends used to be required
+        self.assertEqual(titles(**{"from":"2025-01-28"}),["expense 29","expense 28","expense 27"])
+        self.assertEqual(len(titles(to="2025-01-10")),10)
+        self.assertEqual(titles(category="cat-1,cat-2",amount_min="20",amount_max="23"),["expense 22","expense 21"])
+        self.assertEqual(
+            titles("/income/",category=["cat-0","cat-1"],amount_max="7",sort="amount"),
+            ["income 0","income 1","income 5","income 6"]
+        )
+        totals=self.client.get("/users/total/",{"category":"cat-0","amount_min":"10"}).data
+        self.assertEqual(totals["total expense"],sum(i+1 for i in range(30) if i%5==0 and i+1>=10))
+        csv=b"".join(self.client.get("/expense/transactions/csv/",{"from":"2025-01-29"}).streaming_content)
+        self.assertEqual(csv.decode().splitlines()[1:],["expense 29,-30.00,cat-4,2025-01-30,","expense 28,-29.00,cat-3,2025-01-29,"])
+
+    def test_invalid_filters_are_rejected(self):
+        for path in ["/expense/","/users/total/","/users/dashboard/","/async/users/total/"]:
+            for params in [{"from":"yesterday"},{"amount_min":"lots"},{"from":"2025-02-01","to":"2025-01-01"},{"sort":"password"}]:
+                with self.subTest(path=path,params=params):
+                    response=self.client.get(path,params)
+                    self.assertEqual(response.status_code,400)
+                    self.assertIn("detail",response.json())
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class CategoryTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="categories@example.com",password="categories-password")
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        # entries stored by on_commit would outlive the test's rollback
+        self.addCleanup(category_names.category_cache.clear)
+
+    def post(self,kind,category,**extra):
+        name="source" if kind=="income" else "title"
+        response=self.client.post(f"/{kind}/",{
+            name:"row","amount":"5.00","category":category,"date":"2025-03-01","notes":"",**extra
+        },format="json")
+        self.assertEqual(response.status_code,200)
+        return response.data
+
+    def test_names_are_case_folded(self):
+        self.post("expense","Eating Out")
+        self.post("income","eating  out ")
+        self.post("expense","EATING OUT")
+        self.assertEqual(list(Category.objects.values_list("name","key")),[("Eating Out","eating out")])
+        self.assertEqual(len(self.client.get("/expense/",{"category":"eating out"}).data),2)
+
+    def test_writes_use_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            row=self.post("expense","groceries")
+        with CaptureQueriesContext(connection) as ctx:
+            response=self.client.put("/expense/",{
+                "id":row["id"],"title":"row","amount":"6.00","categoryName":"Groceries","date":"2025-03-02","notes":""
+            },format="json")
+        self.assertEqual(response.data["expense"]["categoryName"],"groceries")
+        self.assertFalse([q for q in ctx.captured_queries if "expenses_category" in q["sql"]])
+
+    def test_rolled_back_categories_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    category_names.get("doomed")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(category_names.category_cache.stats()["entries"],0)
+        self.assertFalse(Category.objects.filter(key="doomed").exists())
+
+    def test_listing_is_per_user(self):
+        self.post("expense","rent")
+        self.post("expense","rent")
+        self.post("income","Salary")
+        other=User.objects.create_user(username="neighbour@example.com",password="neighbour-password")
+        Expense.objects.create(user=other,title="x",amount=1,category=category_names.get("secret"),date=date(2025,3,1),notes="")
+        self.assertEqual(self.client.get("/users/categories/").data,[
+            {"id":Category.objects.get(key="rent").id,"name":"rent","expense":2,"income":0},
+            {"id":Category.objects.get(key="salary").id,"name":"Salary","expense":0,"income":1},
+        ])
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class AnalyticsTests(TestCase):
+    SPECS=MonthlySummaryTests.SPECS
+
+    def setUp(self):
+        self.user=User.objects.create_user(username="columns@example.com",password="columns-password")
+        seed(self.user,rows=90)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(analytics.get_history_cache().clear)
+
+    def test_reports_match_sql(self):
+        history=analytics.load(self.user)
+        for spec in self.SPECS:
+            with self.subTest(spec=spec):
+                self.assertEqual(analytics.totals(history,spec),aggregates.totals(self.user,spec))
+                self.assertEqual(
+                    analytics.category_totals_by_kind(history,["income","expense"],spec),
+                    summaries.category_totals_by_kind(self.user,["income","expense"],spec)
+                )
+
+    def query_count(self,path,params):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(path,params)
+        return len(ctx)
+
+    def test_views_use_the_cached_history(self):
+        paths=["/users/total/","/users/recent-total/","/expense/expenseCategory/","/users/dashboard/"]
+        params={"from":"2025-01-15","category":"cat-1,cat-2"}
+        expected={path:self.client.get(path,params).json() for path in paths}
+        queries={path:self.query_count(path,params) for path in paths}
+        with override_settings(ANALYTICS={"ENABLED":True}):
+            # a cold cache goes to SQL: same queries, nothing loaded
+            for path in paths:
+                with self.assertNumQueries(queries[path]):
+                    self.assertEqual(self.client.get(path,params).json(),expected[path],path)
+            self.assertEqual(analytics.get_history_cache().stats()["users"],0)
+            # the trend loads the history, the reports then skip the grouped queries
+            self.client.get("/users/trend/")
+            for path in paths:
+                self.assertEqual(self.client.get(path,params).json(),expected[path],path)
+            self.assertLess(self.query_count("/users/total/",params),queries["/users/total/"])
+            stats=analytics.get_history_cache().stats()
+            self.assertEqual((stats["users"],stats["hits"]),(1,4))
+            # a write moves DataVersion, the stale history is not used
+            self.client.post("/income/",{"source":"late","amount":"1.25","category":"cat-1","notes":"","date":"2025-02-01"},format="json")
+            with self.assertNumQueries(queries["/users/total/"]):
+                total=self.client.get("/users/total/",params).json()
+            self.assertEqual(Decimal(total["total income"]),Decimal(expected["/users/total/"]["total income"])+Decimal("1.25"))
+
+    def test_cache_is_bounded(self):
+        cache=analytics.HistoryCache(max_users=2,max_rows=250)
+        history=analytics.load(self.user)
+        cache.store(1,1,history)
+        cache.store(2,1,history)
+        self.assertEqual(cache.stats()["users"],1)
+        self.assertIsNone(cache.get(1,1))
+        self.assertIsNone(cache.get(2,2))
+        self.assertIs(cache.get(2,1),history)
+
+    def test_trend(self):
+        response=self.client.get("/users/trend/",{"window":3,"from":"2025-01-03","to":"2025-01-05"})
+        # income and expense i+1 on day i cancel out
+        self.assertEqual(response.json(),[
+            {"date":f"2025-01-0{day}","net":"0.00","average":"0.00"} for day in (3,4,5)
+        ])
+        Income.objects.create(user=self.user,source="gift",amount=3,category=Category.objects.get(key="cat-0"),date=date(2025,1,2),notes="")
+        points=self.client.get("/users/trend/",{"window":3,"from":"2025-01-03","to":"2025-01-05"}).json()
+        self.assertEqual([point["average"] for point in points],["1.00","1.00","0.00"])
+        self.assertEqual(self.client.get("/users/trend/",{"window":0}).status_code,400)
+
+
+class MoneyTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="money@example.com",password="money-password")
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(category_names.category_cache.clear)
+
+    def test_conversions(self):
+        self.assertEqual(money.to_cents(Decimal("0.29")),29)
+        self.assertEqual(money.to_cents(0.29),29)
+        self.assertEqual(money.to_cents(" 12.345 "),1234)
+        self.assertEqual(money.to_cents(7),700)
+        self.assertEqual([money.format_cents(c) for c in (0,5,-5,123456)],["0.00","0.05","-0.05","1234.56"])
+        for bad in ["","abc","NaN","Infinity",True,None]:
+            with self.assertRaises(ValueError):
+                money.to_cents(bad)
+
+    def test_amounts_are_stored_as_cents_and_summed_exactly(self):
+        for amount in ["0.10"]*10+["0.20"]:
+            response=self.client.post("/expense/",{
+                "title":"coffee","amount":amount,"category":"food","date":"2025-03-01","notes":""
+            },format="json")
+            self.assertEqual(response.data["amount"],amount)
+        self.client.post("/income/",{"source":"pay","amount":"0.30","category":"pay","date":"2025-03-02","notes":""},format="json")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT amount FROM expenses_expense ORDER BY amount")
+            self.assertEqual([row[0] for row in cursor.fetchall()],[10,20])
+        totals=self.client.get("/users/total/",{"amount_min":"0.01"}).json()
+        self.assertEqual(totals,{"total amount":"-0.90","total income":"0.30","total expense":"1.20"})
+        self.assertEqual(self.client.get("/users/total/").json()["total expense"],"1.20")
+        self.assertEqual(ledger.check(self.user.id),[])
+        self.assertEqual(self.client.get("/users/recent-total/").json()[-1]["total"],"-0.90")
+        self.assertEqual(self.client.get("/expense/expenseCategory/").json()["category_frequency"],["1.20"])
+        export=b"".join(self.client.get("/users/transactions/csv/").streaming_content).decode()
+        self.assertIn("pay,0.30,pay,2025-03-02",export)
+        self.assertIn("coffee,-0.20,food,2025-03-01",export)
+
+    def test_filter_bounds_are_whole_cents(self):
+        self.assertEqual(self.client.get("/expense/",{"amount_min":"0.005"}).status_code,400)
+        self.assertEqual(self.client.get("/expense/",{"amount_min":"0.50"}).status_code,200)
+
+
+class ImportTests(TestCase):
+    CSV=(
+        "title,amount,category,date,notes\n"
+        "coffee,-3.50,food,2025-03-01,\n"
+        "coffee,-3.50,food,2025-03-01,\n"
+        "coffee,-3.50,food,2025-03-01,\n"
+        "salary,1000,pay,2025-03-02,\n"
+        "broken,lots,food,2025-03-03,\n"
+    )
+
+    def setUp(self):
+        self.user=User.objects.create_user(username="imports@example.com",password="imports-password")
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(category_names.category_cache.clear)
+
+    def upload(self,name,content):
+        response=self.client.post("/users/import/",{"file":SimpleUploadedFile(name,content.encode())},format="multipart")
+        self.assertEqual(response.status_code,200)
+        return json.loads(b"".join(response.streaming_content).decode().splitlines()[-1])
+
+    def run_import(self,content,batch_size):
+        records=importers.read_csv(io.BytesIO(content.encode()))
+        return list(importers.run(self.user,records,batch_size))[-1].as_dict()
+
+    def test_csv_import_and_reimport(self):
+        first=self.upload("statement.csv",self.CSV)
+        self.assertEqual((first["done"],first["created"],first["skipped"],first["failed"]),(True,2,2,1))
+        self.assertEqual(first["errors"],[{"line":6,"error":"unreadable amount or date"}])
+        self.assertEqual(Expense.objects.filter(user=self.user,title="coffee").count(),1)
+        self.assertEqual(ledger.check(self.user.id),[])
+        again=self.upload("statement.csv",self.CSV)
+        self.assertEqual((again["created"],again["skipped"]),(0,4))
+
+    def test_repeated_lines_in_one_file_are_skipped(self):
+        # the repeats straddle batches of two as well
+        self.assertEqual(self.run_import(self.CSV,batch_size=2)["created"],2)
+        self.assertEqual(self.run_import(self.CSV,batch_size=1000)["skipped"],4)
+        repeated="<OFX>"+"<STMTTRN><DTPOSTED>20250301</DTPOSTED><TRNAMT>-5.00</TRNAMT><FITID>R1</FITID><NAME>shop</NAME></STMTTRN>"*2+"</OFX>"
+        result=self.upload("statement.ofx",repeated)
+        self.assertEqual((result["created"],result["skipped"]),(1,1))
+
+    def test_version_moves_after_the_rebuild(self):
+        self.client.get("/users/total/")
+        self.run_import(self.CSV,batch_size=2)
+        # two batches and the rebuild
+        self.assertEqual(versions.current(self.user.id),3)
+        self.assertEqual(self.client.get("/users/total/").json()["total income"],"1000.00")
+
+    def test_ofx(self):
+        transactions="".join(
+            f"<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>2025030{i}120000</DTPOSTED>"
+            f"<TRNAMT>-{i}.00</TRNAMT><FITID>F{i}</FITID><NAME>shop {i}</NAME></STMTTRN>"
+            for i in range(1,4)
+        )
+        single_line=f'<?xml version="1.0"?><OFX><BANKTRANLIST>{transactions}</BANKTRANLIST></OFX>'
+        self.assertEqual(
+            list(importers.ofx_tokens(io.BytesIO(single_line.encode()),chunk_size=5)),
+            list(importers.ofx_tokens(io.BytesIO(single_line.encode())))
+        )
+        self.assertEqual(self.upload("statement.ofx",single_line)["created"],3)
+        # the bank's FITID decides, a renamed line is still the same transaction
+        renamed=self.upload("statement.ofx",single_line.replace("shop 1","Shop One"))
+        self.assertEqual((renamed["created"],renamed["skipped"]),(0,3))
+        sgml=(
+            "OFXHEADER:100\n<OFX>\n<STMTTRN>\n<DTPOSTED>20250305\n<TRNAMT>oops\n<FITID>F9\n</STMTTRN>\n"
+            "<STMTTRN>\n<DTPOSTED>20250306\n<TRNAMT>25.00\n<FITID>F10\n<NAME>refund\n</STMTTRN>\n</OFX>\n"
+        )
+        result=self.upload("statement.ofx",sgml)
+        self.assertEqual((result["created"],result["errors"]),(1,[{"line":7,"error":"unreadable TRNAMT or DTPOSTED"}]))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w",suffix=".csv",delete=False) as statement:
+            statement.write(self.CSV)
+        self.addCleanup(Path(statement.name).unlink)
+        out,err=io.StringIO(),io.StringIO()
+        call_command("import_transactions",self.user.username,statement.name,"--batch-size","2",stdout=out,stderr=err)
+        self.assertIn("processed 5 created 2 skipped 2 failed 1",out.getvalue())
+        self.assertIn("line 6: unreadable amount or date",err.getvalue())
+
+
+@override_settings(SUMMARY_CACHE={"BACKEND":"dummy"})
+class FeedTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="feed@example.com",password="feed-password")
+        seed(self.user,rows=25)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.cookies["access_token"]=str(AccessToken.for_user(self.user))
+
+    def walk(self,limit):
+        rows,params=[],{"limit":limit}
+        while True:
+            response=self.client.get("/users/transactions-total/",params)
+            self.assertEqual(response.status_code,200)
+            rows+=response.json()
+            if not response.has_header("X-Next-Cursor"):
+                return rows
+            params={"limit":limit,"after":response["X-Next-Cursor"]}
+
+    def test_pages_cover_everything_once(self):
+        everything=self.client.get("/users/transactions-total/")
+        self.assertTrue(everything.streaming)
+        full=json.loads(b"".join(everything.streaming_content))
+        self.assertEqual(len(full),50)
+        # expense i and income i share a date and, in separate tables, an id
+        ties=[(row["date"],row["title"].split()[1]) for row in full]
+        self.assertEqual(len(set(ties)),25)
+        for limit in (1,3,7,50):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk(limit),full)
+
+    def test_bad_limits_and_cursors(self):
+        for params in [{"limit":0},{"limit":-1},{"limit":1001},{"limit":"ten"},{"after":"not-a-cursor"},{"after":"eA=="}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/users/transactions-total/",params).status_code,400)
+                self.assertEqual(self.client.get("/users/transactions/",params).status_code,400)
+                self.assertEqual(self.client.get("/async/users/transactions-total/",params).status_code,400)
+        self.assertEqual(self.client.get("/users/recent-total/",{"limit":0}).status_code,400)
+        for limit in [0,-5,1001,"abc"]:
+            with self.subTest(dashboard=limit):
+                response=self.client.get("/users/dashboard/",{"limit":limit})
+                self.assertEqual((response.status_code,response.json()),(400,{"detail":"invalid limit"}))
+        self.assertEqual(len(self.client.get("/users/dashboard/",{"limit":1000}).json()["transactions"]),50)
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="bulk@example.com",password="bulk-password")
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(category_names.category_cache.clear)
+
+    def item(self,**extra):
+        return {"title":"row","amount":"4.00","category":"bulk","date":"2025-03-01","notes":"",**extra}
+
+    def test_per_item_errors(self):
+        response=self.client.post("/expense/bulk/",{"items":[
+            self.item(),
+            self.item(title="x"*101,amount="lots"),
+            self.item(date="01/03/2025",category="c"*21),
+        ]},format="json")
+        self.assertEqual(response.status_code,400)
+        self.assertEqual(response.data["errors"],[
+            {"index":1,"errors":{"title":"at most 100 characters","amount":"a decimal amount is required"}},
+            {"index":2,"errors":{
+                "category":"a category name of at most 20 characters is required",
+                "date":"a date formatted YYYY-MM-DD is required"
+            }},
+        ])
+        self.assertFalse(Expense.objects.exists())
+        self.assertEqual(self.client.post("/expense/bulk/",{"items":[self.item(title="x"*100)]},format="json").status_code,200)
+
+    def test_item_cap(self):
+        items=[self.item()]*(bulk.MAX_ITEMS+1)
+        self.assertEqual(self.client.post("/expense/bulk/",{"items":items},format="json").status_code,400)
+        self.assertEqual(self.client.delete("/expense/bulk/",{"ids":list(range(bulk.MAX_ITEMS+1))},format="json").status_code,400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_ids(self):
+        created=self.client.post("/expense/bulk/",{"items":[self.item(),self.item(title="other")]},format="json").data["created"]
+        other=User.objects.create_user(username="bulk-other@example.com",password="bulk-password")
+        theirs=Expense.objects.create(user=other,title="theirs",amount=1,category=category_names.get("bulk"),date=date(2025,3,1),notes="")
+        response=self.client.put("/expense/bulk/",{"items":[
+            self.item(id=created[0]["id"],title="changed"),self.item(id=theirs.id),
+        ]},format="json")
+        self.assertEqual(response.status_code,400)
+        self.assertEqual(response.data["errors"],[{"index":1,"errors":{"id":"not found"}}])
+        self.assertFalse(Expense.objects.filter(title="changed").exists())
+        for bad in [True,3.7,str(created[0]["id"]),None]:
+            with self.subTest(id=bad):
+                response=self.client.put("/expense/bulk/",{"items":[self.item(id=bad)]},format="json")
+                self.assertEqual(response.data["errors"],[{"index":0,"errors":{"id":"a numeric id is required"}}])
+        for ids in [[True],[created[0]["id"],False],["1"]]:
+            with self.subTest(ids=ids):
+                self.assertEqual(self.client.delete("/expense/bulk/",{"ids":ids},format="json").status_code,400)
+        self.assertEqual(self.client.delete("/expense/bulk/",{"ids":[created[0]["id"],theirs.id]},format="json").data,{"deleted":1})
+        self.assertTrue(Expense.objects.filter(id=theirs.id).exists())
+
+    def test_failure_rolls_back_the_batch(self):
+        with patch("expenses.bookkeeping.record",side_effect=RuntimeError("ledger down")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/expense/bulk/",{"items":[self.item(),self.item(title="second")]},format="json")
+        self.assertFalse(Expense.objects.exists())
+        self.assertEqual(versions.current(self.user.id),0)
+        self.assertEqual(ledger.check(self.user.id),[])
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user=User.objects.create_user(username="ledger@example.com",password="ledger-password")
+        seed(self.user,rows=10)
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(category_names.category_cache.clear)
+
+    def assertConsistent(self):
+        self.assertEqual(ledger.check(self.user.id),[])
+        last=DailyBalance.objects.filter(user=self.user).order_by("-date").first()
+        self.assertEqual(last.balance,aggregates.totals(self.user)["total amount"])
+
+    def test_writes_keep_the_ledger_in_step(self):
+        expense=self.client.post("/expense/",{
+            "title":"new day","amount":"12.34","category":"cat-1","date":"2025-02-20","notes":""
+        },format="json").data
+        self.client.post("/income/",{"source":"same day","amount":"5.00","category":"cat-1","date":"2025-01-03","notes":""},format="json")
+        self.assertConsistent()
+        moved=Expense.objects.get(user=self.user,title="expense 2")
+        for day,amount in [("2025-03-01","7.50"),("2024-12-01","7.50"),("2025-01-03","0.01")]:
+            with self.subTest(day=day):
+                self.client.put("/expense/",{
+                    "id":moved.id,"title":"moved","amount":amount,"categoryName":"cat-2","date":day,"notes":""
+                },format="json")
+                self.assertConsistent()
+        income=Income.objects.get(user=self.user,source="income 4")
+        self.client.put("/income/",{
+            "id":income.id,"source":"moved","amount":"100.00","categoryName":"cat-0","date":"2024-11-30","notes":""
+        },format="json")
+        self.assertConsistent()
+        self.assertEqual(self.client.delete(f"/expense/{expense['id']}").status_code,200)
+        self.assertEqual(self.client.delete(f"/income/{income.id}").status_code,200)
+        self.assertConsistent()
+        # the last row of a day gone, the day is gone from the ledger
+        self.assertFalse(DailyBalance.objects.filter(user=self.user,date__in=[date(2025,2,20),date(2024,11,30)]).exists())
+
+    def test_check_reports_and_fixes_drift(self):
+        DailyBalance.objects.filter(user=self.user,date=date(2025,1,5)).update(balance=F("balance")+100)
+        out=io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("check_ledger",stdout=out)
+        self.assertIn(f"user {self.user.id} 2025-01-05: expected",out.getvalue())
+        self.assertEqual(len(ledger.check(self.user.id)),1)
+        out=io.StringIO()
+        call_command("check_ledger","--fix","--user",str(self.user.id),stdout=out)
+        self.assertIn("rebuilt 1 user(s)",out.getvalue())
+        self.assertConsistent()
+        DailyBalance.objects.filter(user=self.user).delete()
+        out=io.StringIO()
+        call_command("rebuild_ledger","--user",str(self.user.id),stdout=out)
+        self.assertIn(f"user {self.user.id}: 10 days",out.getvalue())
+        self.assertConsistent()
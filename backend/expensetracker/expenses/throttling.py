@@ -0,0 +1,193 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Token buckets: every client starts with CAPACITY tokens, they refill at RATE
+# per second, and a request takes its endpoint's cost (COSTS by url name,
+# DEFAULT_COST otherwise). Logins hash a password and exports read the whole
+# history, so they cost many list requests' worth.
+
+DEFAULTS={
+    "ENABLED":True,
+    "BACKEND":"memory",
+    "URL":None,
+    "RATES":{"ip":(120,2.0),"user":(240,4.0)},
+    "COSTS":{},
+    "DEFAULT_COST":1,
+    "MAX_ENTRIES":10000,
+}
+
+
+def config():
+    return {**DEFAULTS,**getattr(settings,"THROTTLING",{})}
+
+
+class MemoryBuckets:
+    # one process only; a forgotten bucket is a full one, so LRU eviction can
+    # only ever be lenient
+    def __init__(self,max_entries=10000):
+        self.max_entries=max_entries
+        self.buckets=OrderedDict()
+        self.lock=threading.Lock()
+
+    def take(self,key,capacity,rate,cost):
+        # (allowed, seconds until cost tokens are available)
+        now=time.monotonic()
+        with self.lock:
+            tokens,stamp=self.buckets.get(key,(capacity,now))
+            tokens=min(capacity,tokens+(now-stamp)*rate)
+            allowed=tokens>=cost
+            if allowed:
+                # a negative cost is a refund
+                tokens=min(capacity,tokens-cost)
+            self.buckets[key]=(tokens,now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets)>self.max_entries:
+                self.buckets.popitem(last=False)
+        return allowed,0 if allowed else (cost-tokens)/rate
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+# refill and take in one step on the server, with the server's clock so every
+# node agrees; the token count goes back as a string because Redis truncates
+# Lua numbers to integers
+TAKE_SCRIPT="""
+local capacity=tonumber(ARGV[1])
+local rate=tonumber(ARGV[2])
+local cost=tonumber(ARGV[3])
+local time=redis.call('TIME')
+local now=tonumber(time[1])+tonumber(time[2])/1000000
+local bucket=redis.call('HMGET',KEYS[1],'tokens','stamp')
+local tokens=tonumber(bucket[1]) or capacity
+local stamp=tonumber(bucket[2]) or now
+tokens=math.min(capacity,tokens+math.max(0,now-stamp)*rate)
+local allowed=0
+if tokens>=cost then
+  tokens=math.min(capacity,tokens-cost)
+  allowed=1
+end
+redis.call('HSET',KEYS[1],'tokens',tostring(tokens),'stamp',tostring(now))
+redis.call('EXPIRE',KEYS[1],math.ceil(capacity/rate)+1)
+return {allowed,tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    # shared by every worker and node that points at the same Redis
+    def __init__(self,url=None,client=None):
+        if client is None:
+            import redis
+            client=redis.Redis.from_url(url)
+        self.script=client.register_script(TAKE_SCRIPT)
+
+    def take(self,key,capacity,rate,cost):
+        allowed,tokens=self.script(keys=[key],args=[capacity,rate,cost])
+        return bool(allowed),0 if allowed else (cost-float(tokens))/rate
+
+
+def build_backend(config):
+    name=config.get("BACKEND","memory")
+    if name=="memory":
+        return MemoryBuckets(config.get("MAX_ENTRIES",10000))
+    if name=="redis":
+        client=import_string(config["CLIENT"])() if config.get("CLIENT") else None
+        return RedisBuckets(config.get("URL"),client)
+    raise ValueError(f"unknown throttling backend {name!r}")
+
+
+_backend=None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend=build_backend(config())
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting,**kwargs):
+    global _backend
+    if setting=="THROTTLING":
+        _backend=None
+
+
+def cost(request,conf):
+    match=getattr(request,"resolver_match",None)
+    name=match.url_name if match else None
+    return conf["COSTS"].get(name,conf["DEFAULT_COST"])
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope=None
+
+    def get_key(self,request):
+        raise NotImplementedError
+
+    def allow_request(self,request,view):
+        # DRF asks every throttle; a request refused by one bucket is not
+        # charged to the others, so it costs nothing overall
+        self.delay=0
+        conf=config()
+        if not conf["ENABLED"]:
+            return True
+        key=self.get_key(request)
+        weight=cost(request,conf)
+        if key is None or weight<=0:
+            return True
+        if getattr(request,"_throttle_refused",False):
+            return True
+        capacity,rate=conf["RATES"][self.scope]
+        # a cost above capacity could never be paid
+        charge=(f"throttle:{self.scope}:{key}",capacity,rate,min(weight,capacity))
+        charges=getattr(request,"_throttle_charges",[])
+        backend=get_backend()
+        allowed,self.delay=backend.take(*charge)
+        if allowed:
+            request._throttle_charges=charges+[charge]
+            return True
+        for key,capacity,rate,weight in charges:
+            backend.take(key,capacity,rate,-weight)
+        request._throttle_refused=True
+        return False
+
+    def wait(self):
+        # DRF writes Retry-After with %d, round up so clients never retry early
+        return math.ceil(self.delay)
+
+
+class IPThrottle(TokenBucketThrottle):
+    # X-Forwarded-For is honoured per REST_FRAMEWORK["NUM_PROXIES"]
+    scope="ip"
+
+    def get_key(self,request):
+        return self.get_ident(request)
+
+
+class UserThrottle(TokenBucketThrottle):
+    scope="user"
+
+    def get_key(self,request):
+        user=getattr(request,"user",None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+
+def check(request):
+    # for views outside DRF (the async reports): seconds to wait, or None
+    waits=[]
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle=throttle_class()
+        if not throttle.allow_request(request,None):
+            waits.append(throttle.wait())
+    return max(waits) if waits else None
@@ -0,0 +1,15 @@
+from django.urls import path
+from expenses.views import async_views
+
+# same paths as the sync routes, mounted under /async/ so both can be compared
+urlpatterns = [
+    path('users/transactions/',async_views.recentTransactions,name='async-recent-transactions'),
+    path('users/total/',async_views.total_detail,name='async-total'),
+    path('users/recent-total/',async_views.recentTotal,name='async-recent-total'),
+    path('users/transactions-total/',async_views.recentTransactionsTotal,name='async-recent-transactions-total'),
+    path('users/transactions/csv/',async_views.export_csv,name='async-export-csv'),
+    path('expense/expenseCategory/',async_views.expense_category,name='async-expense-category'),
+    path('expense/transactions/csv/',async_views.export_expense_csv,name='async-expense-export-csv'),
+    path('income/categoryIncome/',async_views.income_category,name='async-income-category'),
+    path('income/transactions/csv/',async_views.export_income_csv,name='async-income-export-csv'),
+]
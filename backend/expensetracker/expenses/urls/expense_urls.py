@@ -6,5 +6,6 @@ urlpatterns = [
     path('expenseCategory/',expense_views.expense_category,name='expense_category'),
     path('transactions/',expense_views.recentTransactionsExpense,name='recent_Transactions'),
     path('transactions/csv/',expense_views.export_csv,name='export-csv'),
+    path('bulk/',expense_views.bulk_expense,name='bulk_expense'),
     path('<int:id>',expense_views.individual_expense,name='get_delete_expense'),
 ]   
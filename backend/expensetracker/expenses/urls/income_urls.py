@@ -6,6 +6,7 @@ urlpatterns = [
     path('categoryIncome/',income_views.income_category,name='income_category'),
     path('transactions/',income_views.recentTransactionsIncome,name='recentTransactions'),
     path('transactions/csv/',income_views.export_csv,name='export-csv'),
+    path('bulk/',income_views.bulk_income,name='bulk_income'),
     path('<int:id>',income_views.individual_income,name='get_delete_income'),
 
 ]
@@ -10,9 +10,16 @@ urlpatterns = [
     path('recent-total/',user_views.recentTotal,name='recent-total'),
     path('transactions-total/',user_views.recentTransactionsTotal,name='recent-transactions-total'),
     path('transactions/csv/',user_views.export_csv,name='export-csv'),
+    path('dashboard/',user_views.dashboard_detail,name='dashboard'),
+    path('rollup/',user_views.rollup,name='rollup'),
+    path('search/',user_views.search_transactions,name='search'),
+    path('categories/',user_views.category_list,name='categories'),
+    path('trend/',user_views.trend,name='trend'),
+    path('import/',user_views.import_transactions,name='import-transactions'),
     path('health/',user_views.health,name='health'),
     path('fetch/',user_views.fetchUser,name='fetchUser'),
     path('forgot-password/',user_views.forgot_password,name='forgot-password'),
     path('reset-password/',user_views.reset_password,name='reset-password'),
     path('verify-email/',user_views.verify_email,name='verify-email'),
+    path('cache-stats/',user_views.cache_stats,name='cache-stats'),
 ]
@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+
+from expenses.models import DataVersion
+
+_local=threading.local()
+
+
+def current(user_id):
+    return DataVersion.objects.filter(user_id=user_id).values_list("version",flat=True).first() or 0
+
+
+async def acurrent(user_id):
+    return await DataVersion.objects.filter(user_id=user_id).values_list("version",flat=True).afirst() or 0
+
+
+def bump(user_id):
+    if user_id is None:
+        return
+    pending=getattr(_local,"pending",None)
+    if pending is not None:
+        pending.add(user_id)
+        return
+    if DataVersion.objects.filter(user_id=user_id).update(version=F("version")+1):
+        return
+    _,created=DataVersion.objects.get_or_create(user_id=user_id,defaults={"version":1})
+    if not created:
+        DataVersion.objects.filter(user_id=user_id).update(version=F("version")+1)
+
+
+@contextmanager
+def deferred():
+    # collapse the per-row bumps of a batch write into one bump per user
+    if getattr(_local,"pending",None) is not None:
+        yield
+        return
+    _local.pending=set()
+    try:
+        yield
+    finally:
+        pending,_local.pending=_local.pending,None
+        for user_id in pending:
+            bump(user_id)
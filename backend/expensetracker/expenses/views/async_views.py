@@ -0,0 +1,141 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed,Throttled
+from rest_framework.status import *
+
+from expenses import cache,conditional,exports,feed,filters,ledger,routers,summaries,throttling,versions
+from expenses.authentication import CookieJWTAuthentication
+from expenses.renderers import JSONRenderer
+from expenses.models import Expense,Income
+from expenses.serializers import RecentTotalSerializer,RecentTransactionsSerializer
+
+# Async twins of the read-only reporting views. @api_view cannot wrap a
+# coroutine, so authentication and rendering are done here with the same
+# authenticator and JSON renderer DRF uses, and the payloads match byte for byte.
+
+renderer=JSONRenderer()
+
+
+def json_response(data,status=HTTP_200_OK,headers=None):
+    return HttpResponse(renderer.render(data),content_type="application/json",status=status,headers=headers)
+
+
+def async_report(view):
+    @wraps(view)
+    async def wrapper(request,*args,**kwargs):
+        if request.method not in ('GET','HEAD'):
+            return json_response({"detail":f'Method "{request.method}" not allowed.'},HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            # token validation and the user cache are sync, and may hit auth_user
+            result=await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return json_response({"detail":e.detail},HTTP_401_UNAUTHORIZED)
+        if result is None:
+            return json_response({"detail":"Authentication credentials were not provided."},HTTP_401_UNAUTHORIZED)
+        request.user,request.auth=result
+        wait=await sync_to_async(throttling.check)(request)
+        if wait is not None:
+            return json_response({"detail":Throttled(wait).detail},HTTP_429_TOO_MANY_REQUESTS,{"Retry-After":str(wait)})
+        try:
+            request.filters=filters.parse(request.GET)
+        except ValueError as e:
+            return json_response({"detail":str(e)},HTTP_400_BAD_REQUEST)
+        replica=not routers.pinned(request)
+        with routers.replica_reads(replica):
+            request.data_version=await versions.acurrent(request.user.id)
+            tag=conditional.etag(request.user.id,request.data_version,request)
+            if conditional.not_modified(request,tag):
+                return conditional.finish(HttpResponse(status=HTTP_304_NOT_MODIFIED),tag)
+            response=await view(request,*args,**kwargs)
+        if response.status_code==200:
+            conditional.finish(response,tag)
+        return routers.follow_stream(response,replica)
+    return wrapper
+
+
+@async_report
+async def total_detail(request):
+    spec=request.filters
+    data=await cache.acached(
+        request,"total",spec.key(),
+        lambda:summaries.atotals(request.user,spec,request.data_version)
+    )
+    return json_response(data)
+
+
+@async_report
+async def recentTotal(request):
+    spec=request.filters
+    try:
+        limit=int(request.GET.get("limit",10))
+        if not 1<=limit<=feed.MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return json_response({"detail":"invalid limit"},HTTP_400_BAD_REQUEST)
+    async def compute():
+        points=await ledger.arecent_points(request.user,spec,limit)
+        return RecentTotalSerializer(points,many=True).data
+    return json_response(await cache.acached(request,"recent_total",(spec.key(),limit),compute))
+
+
+async def transaction_page(request,default_limit):
+    spec=request.filters
+    try:
+        limit=int(request.GET.get("limit",default_limit))
+        if not 1<=limit<=feed.MAX_LIMIT:
+            raise ValueError
+        after=request.GET.get("after")
+        after=feed.decode_cursor(after) if after else None
+    except ValueError:
+        return json_response({"detail":"invalid limit or cursor"},HTTP_400_BAD_REQUEST)
+    async def compute():
+        transactions,next_cursor=await feed.apage(request.user,spec,after,limit)
+        return RecentTransactionsSerializer(transactions,many=True).data,next_cursor
+    data,next_cursor=await cache.acached(request,"transactions",(spec.key(),after,limit),compute)
+    return json_response(data,headers={"X-Next-Cursor":next_cursor} if next_cursor else None)
+
+
+@async_report
+async def recentTransactions(request):
+    return await transaction_page(request,10)
+
+
+@async_report
+async def recentTransactionsTotal(request):
+    if "limit" in request.GET or "after" in request.GET:
+        return await transaction_page(request,50)
+    return exports.json_response(feed.aiterate(request.user,request.filters),RecentTransactionsSerializer)
+
+
+def category_view(model,name):
+    @async_report
+    async def view(request):
+        spec=request.filters
+        data=await cache.acached(
+            request,name,spec.key(),
+            lambda:summaries.acategory_breakdown(model,request.user,spec,request.data_version)
+        )
+        return json_response(data)
+    view.__name__=name
+    return view
+
+
+expense_category=category_view(Expense,"expense_category")
+income_category=category_view(Income,"income_category")
+
+
+@async_report
+async def export_csv(request):
+    return exports.csv_response(request,"transactions.csv",exports.atransaction_rows(request.user,request.filters))
+
+
+@async_report
+async def export_expense_csv(request):
+    return exports.csv_response(request,"transactions-expense.csv",exports.aexpense_rows(request.user,request.filters))
+
+
+@async_report
+async def export_income_csv(request):
+    return exports.csv_response(request,"transactions-income.csv",exports.aincome_rows(request.user,request.filters))
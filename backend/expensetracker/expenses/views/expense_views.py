@@ -12,69 +12,67 @@ from expenses.models import *
 from django.http import HttpResponse
 import csv 
 from datetime import datetime
+from django.db import transaction
+from expenses.summaries import category_breakdown
+from expenses import bookkeeping,exports,cache,conditional,routers,bulk,filters,categories
 
 @api_view(['POST','GET','PUT'])
 @permission_classes([IsAuthenticated])
+@conditional.versioned
+@filters.parsed
 def expense(request):
     
     if request.method=='POST':
         data=request.data
-        category,_=Category.objects.get_or_create(
-            name=data['category']
-        )
+        category=categories.get(data['category'])
         date_str=datetime.strptime(data["date"], "%Y-%m-%d").date()
-        exp=Expense.objects.create(
-            user=request.user,
-            title=data['title'],
-            amount=data['amount'],
-            category=category,
-            notes=data['notes'],
-            date=date_str
+        with transaction.atomic():
+            exp=Expense.objects.create(
+                user=request.user,
+                title=data['title'],
+                amount=data['amount'],
+                category=category,
+                notes=data['notes'],
+                date=date_str
 
             
-        )
+            )
+            bookkeeping.record(request.user.id,added=[bookkeeping.snapshot(exp)])
         serializer=ExpenseSerializer(exp,many=False)
         return Response(serializer.data)
 
     elif request.method=='GET':
-        category=request.query_params.get("category")
-        fromDate=request.query_params.get("from")
-        toDate=request.query_params.get("to")
-        # print("from",fromDate)
-        user=request.user
-        filtered_data=Expense.objects.filter(user=user)
-        if category:
-            filtered_data=filtered_data.filter(category__name=category)
-        if fromDate and toDate:
-            filtered_data=filtered_data.filter(date__gte=fromDate,
-                date__lte=toDate)
-        filtered_data=filtered_data.order_by("-date")
+        filtered_data=filters.apply(Expense.objects.filter(user=request.user),request.filters)
+        filtered_data=filters.order(filtered_data,request.filters)
         serializer=ExpenseSerializer(filtered_data,many=True)
         return Response(serializer.data)
-        
 
     elif request.method=='PUT':
         data=request.data
-        old_expense=Expense.objects.get(user=request.user,id=data['id'])
-        if old_expense.category!=data['categoryName']:
-            category_obj,_=Category.objects.get_or_create(name=data['categoryName'])
-            old_expense.category=category_obj
+        with transaction.atomic():
+            old_expense=Expense.objects.get(user=request.user,id=data['id'])
+            old_entry=bookkeeping.snapshot(old_expense)
+            # from the category cache, so the response's categoryName costs no query either
+            old_expense.category=categories.get(data['categoryName'])
         
-        old_expense.title=data['title']
-        old_expense.amount=data['amount']
-        old_expense.date=data['date']
-
-        date_str=datetime.strptime(data["date"], "%Y-%m-%d").date()
-        old_expense.notes=date_str
-        old_expense.notes=data['notes']
-        old_expense.save()
-
-        new_expense=Expense.objects.get(user=request.user,id=data['id'])
-        expense_serializer=ExpenseSerializer(new_expense,many=False)
+            old_expense.title=data['title']
+            old_expense.amount=data['amount']
+            old_expense.date=datetime.strptime(data["date"], "%Y-%m-%d").date()
+            old_expense.notes=data['notes']
+            old_expense.save()
+            bookkeeping.record(request.user.id,added=[bookkeeping.snapshot(old_expense)],removed=[old_entry])
+
+        expense_serializer=ExpenseSerializer(old_expense,many=False)
     
         return Response({"status":"expense updated","expense":expense_serializer.data})
 
 
+@api_view(['POST','PUT','DELETE'])
+@permission_classes([IsAuthenticated])
+def bulk_expense(request):
+    return bulk.handle(request,Expense,ExpenseSerializer)
+
+
 @api_view(['GET','DELETE'])
 @permission_classes([IsAuthenticated])
 def individual_expense(request,id):
@@ -89,12 +87,15 @@ def individual_expense(request,id):
     elif request.method=='DELETE':
         user=request.user
         try:
-            data_delete=Expense.objects.get(
-                user=user,
-                id=id
-                )
+            with transaction.atomic():
+                data_delete=Expense.objects.get(
+                    user=user,
+                    id=id
+                    )
             
-            Expense.delete(data_delete)
+                removed=bookkeeping.snapshot(data_delete)
+                Expense.delete(data_delete)
+                bookkeeping.record(user.id,removed=[removed])
             return Response({"detail":"expense deleted successfully"})
         except:
             return Response({"detail":"failed to delete data"})
@@ -102,70 +103,33 @@ def individual_expense(request,id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def expense_category(request):
-    category=Category.objects.all()
-    serializer1=CategorySerializer(category,many=True)
-    serializer_data=serializer1.data
-    category_name=[]
-    category_frequency=[]
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    for i in serializer_data:
-        expense=Expense.objects.filter(
-
-            user=request.user,
-            category_id=i["id"])
-        if fromDate and toDate:
-            expense=expense.filter(
-                date__gte=fromDate,
-                date__lte=toDate
-            )
-        expense_serializer=ExpenseSerializer(expense,many=True)
-        if(len(expense_serializer.data)>0):
-
-            category_name.append(i["name"])
-            total=0
-            for i in expense_serializer.data:
-                total=total+float(i["amount"])
-            category_frequency.append(total)
-    return Response({"category_name":category_name,"category_frequency":category_frequency})
+    spec=request.filters
+    data=cache.cached(
+        request,"expense_category",spec.key(),
+        lambda:category_breakdown(Expense,request.user,spec,request.data_version)
+    )
+    return Response(data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def recentTransactionsExpense(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    expense=Expense.objects.filter(user=request.user)
-    if fromDate and toDate:
-        expense=expense.filter(
-            date__gte=fromDate,
-            date__lte=toDate
-        )
-    expense=expense.order_by("-date")[:5]
+    expense=filters.apply(Expense.objects.filter(user=request.user),request.filters)
+    expense=filters.order(expense,request.filters)[:5]
     serializer=ExpenseSerializer(expense,many=True)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def export_csv(request):
-    response=HttpResponse(content_type='text/csv')
-    response['content-Disposition']='attachment; filename="transactions-expense.csv"'
-    writer=csv.writer(response)
-    writer.writerow(['title','amount','category','date','notes'])
-   
-    expense=Expense.objects.filter(user=request.user).order_by("-date")
-    expense_data=[]
-    for i in expense:
-        expense_data.append({
-            "title":i.title,
-            "amount":-1*i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    transactions=expense_data
-    transactions.sort(key=lambda x:x["date"],reverse=True)
-    for i in transactions:
-        writer.writerow([i['title'],i['amount'],i['category'],i['date'],i['notes']])
-    return response
\ No newline at end of file
+    return exports.csv_response(request,"transactions-expense.csv",exports.expense_rows(request.user,request.filters))
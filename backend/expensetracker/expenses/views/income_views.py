@@ -12,67 +12,66 @@ from expenses.models import *
 from django.http import HttpResponse
 import csv 
 from datetime import datetime
+from django.db import transaction
+from expenses.summaries import category_breakdown
+from expenses import bookkeeping,exports,cache,conditional,routers,bulk,filters,categories
 
 @api_view(['POST','GET','PUT'])
 @permission_classes([IsAuthenticated])
+@conditional.versioned
+@filters.parsed
 def income(request):
     if request.method=='POST':
         data=request.data
-        category,_=Category.objects.get_or_create(
-            name=data['category']
-        )
+        category=categories.get(data['category'])
         date_str=datetime.strptime(data["date"], "%Y-%m-%d").date()
-        income=Income.objects.create(
-            user=request.user,
-            source=data['source'],
-            category=category,
-            amount=data['amount'],
-            notes=data['notes'],
-            date=date_str
+        with transaction.atomic():
+            income=Income.objects.create(
+                user=request.user,
+                source=data['source'],
+                category=category,
+                amount=data['amount'],
+                notes=data['notes'],
+                date=date_str
 
             
-        )
+            )
+            bookkeeping.record(request.user.id,added=[bookkeeping.snapshot(income)])
         serializer=IncomeSerializer(income,many=False)
         return Response(serializer.data)
     
     elif request.method=='GET':
-        category=request.query_params.get("category")
-        fromDate=request.query_params.get("from")
-        toDate=request.query_params.get("to")
-        user=request.user
-        filtered_data=Income.objects.filter(user=user)
-        if category:
-            filtered_data=filtered_data.filter(category__name=category)
-        if fromDate and toDate:
-            filtered_data=filtered_data.filter(date__gte=fromDate,
-                date__lte=toDate)
-        filtered_data=filtered_data.order_by("-date")
+        filtered_data=filters.apply(Income.objects.filter(user=request.user),request.filters)
+        filtered_data=filters.order(filtered_data,request.filters)
         serializer=IncomeSerializer(filtered_data,many=True)
         return Response(serializer.data)
 
     elif request.method=='PUT':
             data=request.data
-            old_income=Income.objects.get(user=request.user,id=data['id'])
-            serializer=IncomeSerializer(old_income,many=False)
-            if old_income.category!=data['categoryName']:
-                category_obj,_=Category.objects.get_or_create(name=data['categoryName'])
-                old_income.category=category_obj
+            with transaction.atomic():
+                old_income=Income.objects.get(user=request.user,id=data['id'])
+                old_entry=bookkeeping.snapshot(old_income)
+                # from the category cache, so the response's categoryName costs no query either
+                old_income.category=categories.get(data['categoryName'])
             
-            old_income.source=data['source']
-            old_income.amount=data['amount']
-            old_income.date=data['date']
-
-            date_str=datetime.strptime(data["date"], "%Y-%m-%d").date()
-            old_income.notes=date_str
-            old_income.notes=data['notes']
-            old_income.save()
+                old_income.source=data['source']
+                old_income.amount=data['amount']
+                old_income.date=datetime.strptime(data["date"], "%Y-%m-%d").date()
+                old_income.notes=data['notes']
+                old_income.save()
+                bookkeeping.record(request.user.id,added=[bookkeeping.snapshot(old_income)],removed=[old_entry])
 
-            new_income=Income.objects.get(user=request.user,id=data['id'])
-            income_serializer=IncomeSerializer(new_income,many=False)
+            income_serializer=IncomeSerializer(old_income,many=False)
         
             return Response({"status":"income updated","income":income_serializer.data})
     
 
+@api_view(['POST','PUT','DELETE'])
+@permission_classes([IsAuthenticated])
+def bulk_income(request):
+    return bulk.handle(request,Income,IncomeSerializer)
+
+
 @api_view(['GET','DELETE'])
 @permission_classes([IsAuthenticated])
 def individual_income(request,id):
@@ -87,12 +86,15 @@ def individual_income(request,id):
     elif request.method=='DELETE':
             user=request.user
             try:
-                data_delete=Income.objects.get(
-                    user=user,
-                    id=id
-                    )
+                with transaction.atomic():
+                    data_delete=Income.objects.get(
+                        user=user,
+                        id=id
+                        )
                 
-                Income.delete(data_delete)
+                    removed=bookkeeping.snapshot(data_delete)
+                    Income.delete(data_delete)
+                    bookkeeping.record(user.id,removed=[removed])
                 return Response({"detail":"income deleted successfully"})
             except:
                 return Response({"detail":"failed to delete data"})
@@ -100,69 +102,35 @@ def individual_income(request,id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def income_category(request):
-    category=Category.objects.all()
-    serializer1=CategorySerializer(category,many=True)
-    serializer_data=serializer1.data
-    category_name=[]
-    category_frequency=[]
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    for i in serializer_data:
-        income=Income.objects.filter(
-            user=request.user,
-            category_id=i["id"])
-        if fromDate and toDate:
-            income=income.filter(
-                date__gte=fromDate,
-                date__lte=toDate
-            )
-        income_serializer=IncomeSerializer(income,many=True)
-        total=0
-        if(len(income_serializer.data)>0):
-            category_name.append(i["name"])
-            for i in income_serializer.data:
-                total+=float(i["amount"])
-            category_frequency.append(total)
-    return Response({"category_name":category_name,"category_frequency":category_frequency})
+    spec=request.filters
+    data=cache.cached(
+        request,"income_category",spec.key(),
+        lambda:category_breakdown(Income,request.user,spec,request.data_version)
+    )
+    return Response(data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def recentTransactionsIncome(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    income=Income.objects.filter(user=request.user)
-    if fromDate and toDate:
-        income=income.filter(
-            date__gte=fromDate,
-            date__lte=toDate
-        )
-    income=income.order_by("-date")[:5]
+    income=filters.apply(Income.objects.filter(user=request.user),request.filters)
+    income=filters.order(income,request.filters)[:5]
     serializer=IncomeSerializer(income,many=True)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def export_csv(request):
-    response=HttpResponse(content_type='text/csv')
-    response['content-Disposition']='attachment; filename="transactions-income.csv"'
-    writer=csv.writer(response)
-    writer.writerow(['title','amount','category','date','notes'])
-    income=Income.objects.filter(user=request.user).order_by("-date")
-    income_data=[]
-    for i in income:
-        income_data.append({
-            "title":i.source,
-            "amount":i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    transactions=income_data
-    transactions.sort(key=lambda x:x["date"],reverse=True)
-    for i in transactions:
-        writer.writerow([i['title'],i['amount'],i['category'],i['date'],i['notes']])
-    return response
+    return exports.csv_response(request,"transactions-income.csv",exports.income_rows(request.user,request.filters))
 
@@ -0,0 +1,38 @@
+import hmac
+
+from django.http import Http404,HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from expenses import profiling
+from expenses.authentication import CookieJWTAuthentication
+
+# A plain Django view: scrapers send no cookie, and the scrape must not be
+# throttled or counted against a user. Whenever it is mounted it takes either
+# the METRICS_TOKEN bearer or a staff user, never nobody.
+
+
+def _has_token(request,token):
+    if not token:
+        return False
+    sent=request.headers.get("Authorization","").encode()
+    return hmac.compare_digest(sent,f"Bearer {token}".encode())
+
+
+def _is_staff(request):
+    # a staff login through the admin session or the API's access_token cookie
+    if request.user.is_authenticated:
+        return request.user.is_staff
+    try:
+        found=CookieJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return found is not None and found[0].is_staff
+
+
+def metrics(request):
+    conf=profiling.config()
+    if not conf["ENABLED"]:
+        raise Http404
+    if not (_has_token(request,conf["METRICS_TOKEN"]) or _is_staff(request)):
+        return HttpResponse(status=401)
+    return HttpResponse(profiling.registry.render(),content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -9,7 +9,8 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from expenses.serializers import *
 from rest_framework.status import *
 from expenses.models import *
-from django.http import HttpResponse
+from django.http import HttpResponse,StreamingHttpResponse
+import json
 import csv 
 from django.core.validators import validate_email
 from django.contrib.auth.password_validation import validate_password
@@ -17,10 +18,10 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from expenses.authentication import user_cache
+from expenses import ledger,feed,exports,summaries,cache,conditional,routers,dashboard,importers,mail,rollups,search,filters,categories,analytics
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -107,18 +108,7 @@ def registerUser(request):
                 {"email_url":email_url}
             )
             
-            try:
-                # print(settings.DEFAULT_FROM_EMAIL,"\n",settings.SENDGRID_API_KEY)
-                message=Mail(
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to_emails=user.email,
-                    subject="Expense Tracker verify email request",
-                    html_content=html_content
-                )
-                sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-                sg.send(message)
-            except Exception as e:
-                print("sendgrid error:",e)
+            mail.enqueue(user.email,"Expense Tracker verify email request",html_content)
         return Response({"message":"Verify email sent"},status=HTTP_200_OK)       
     except ValidationError as e:
         message={"message":e.messages}
@@ -153,168 +143,199 @@ def logoutUser(request):
     return response
 
 
+def transaction_page(request,default_limit):
+    spec=request.filters
+    try:
+        limit=int(request.query_params.get("limit",default_limit))
+        if not 1<=limit<=feed.MAX_LIMIT:
+            raise ValueError
+        after=request.query_params.get("after")
+        after=feed.decode_cursor(after) if after else None
+    except ValueError:
+        return Response({"detail":"invalid limit or cursor"},status=HTTP_400_BAD_REQUEST)
+    def compute():
+        transactions,next_cursor=feed.page(request.user,spec,after,limit)
+        return RecentTransactionsSerializer(transactions,many=True).data,next_cursor
+    data,next_cursor=cache.cached(request,"transactions",(spec.key(),after,limit),compute)
+    response=Response(data)
+    if next_cursor:
+        response["X-Next-Cursor"]=next_cursor
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def recentTransactions(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    income=Income.objects.filter(user=request.user).order_by("-date")[:10]
-    # print(fromDate)
-    if fromDate and toDate:
-        # print("working")
-        income=income.filter(date__gte=fromDate,date__lte=toDate)
-    income_data=[]
-    for i in income:
-        income_data.append({
-            "title":i.source,
-            "amount":i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    expense=Expense.objects.filter(user=request.user).order_by("-date")[:10]
-    if fromDate and toDate:
-        expense=expense.filter(date__gte=fromDate,date__lte=toDate)
-    expense_data=[]
-    for i in expense:
-        expense_data.append({
-            "title":i.title,
-            "amount":-1*i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    transactions=income_data+expense_data
-    transactions.sort(key=lambda x:x["date"],reverse=True)
-    transactionsSerializer=RecentTransactionsSerializer(transactions[:10],many=True)
-    return Response(transactionsSerializer.data)
+    return transaction_page(request,10)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def recentTransactionsTotal(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    income=Income.objects.filter(user=request.user).order_by("-date")
-    if fromDate and toDate:
-        income=income.filter(date__gte=fromDate,date__lte=toDate)
-    income_data=[]
-    for i in income:
-        income_data.append({
-            "title":i.source,
-            "amount":i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    expense=Expense.objects.filter(user=request.user).order_by("-date")
-    if fromDate and toDate:
-        expense=expense.filter(date__gte=fromDate,date__lte=toDate)
-    expense_data=[]
-    for i in expense:
-        expense_data.append({
-            "title":i.title,
-            "amount":-1*i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    transactions=income_data+expense_data
-    transactions.sort(key=lambda x:x["date"],reverse=True)
-    transactionsSerializer=RecentTransactionsSerializer(transactions,many=True)
-    return Response(transactionsSerializer.data)
+    if "limit" in request.query_params or "after" in request.query_params:
+        return transaction_page(request,50)
+    # unpaginated callers still get the whole range, merged by the database
+    # and streamed without holding the list
+    return exports.json_response(feed.iterate(request.user,request.filters),RecentTransactionsSerializer)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def total_detail(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    income=Income.objects.filter(user=request.user)
-    if fromDate and toDate:
-        income=income.filter(date__gte=fromDate,date__lte=toDate)
-    income_value=0
-    for i in income:
-        income_value+=i.amount
-    expense=Expense.objects.filter(user=request.user)
-    if fromDate and toDate:
-        expense=expense.filter(date__gte=fromDate,date__lte=toDate)
-    expense_value=0
-    for i in expense:
-        expense_value+=i.amount
-    total_value=income_value-expense_value
-    return Response({"total amount":total_value,"total income":income_value,"total expense":expense_value})
+    spec=request.filters
+    data=cache.cached(request,"total",spec.key(),lambda:summaries.totals(request.user,spec,request.data_version))
+    return Response(data)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def recentTotal(request):
-    fromDate=request.query_params.get("from")
-    toDate=request.query_params.get("to")
-    total=0
-    income=Income.objects.filter(user=request.user).order_by("-date")
-    if fromDate and toDate:
-        income=income.filter(date__gte=fromDate,date__lte=toDate)
-    income_data=[]
-    for i in income:
-        income_data.append({
-            "amount":i.amount,
-            "date":i.date,
-        })
-    expense=Expense.objects.filter(user=request.user).order_by("-date")
-    if fromDate and toDate:
-        expense=expense.filter(date__gte=fromDate,date__lte=toDate)
-    expense_data=[]
-    for i in expense:
-        expense_data.append({
-            "amount":-1*i.amount,
-            "date":i.date,
-        })
-    transactions=income_data+expense_data
-    transactions.sort(key=lambda x:x["date"])
-    final=[]
-    for i in transactions:
-        # print(float(i["amount"]))
-        total+=float(i["amount"])
-        final.append({
-            "amount":i["amount"],
-            "date":i["date"],
-            "total":total
-        })
-    # final.reverse()
-    serializers=RecentTotalSerializer(final[-10:],many=True)
-    return Response(serializers.data)
+    spec=request.filters
+    try:
+        limit=int(request.query_params.get("limit",10))
+        if not 1<=limit<=feed.MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return Response({"detail":"invalid limit"},status=HTTP_400_BAD_REQUEST)
+    def compute():
+        points=ledger.recent_points(request.user,spec,limit)
+        return RecentTotalSerializer(points,many=True).data
+    return Response(cache.cached(request,"recent_total",(spec.key(),limit),compute))
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
+def dashboard_detail(request):
+    spec=request.filters
+    try:
+        fields=dashboard.parse_fields(request.query_params.get("fields"))
+    except ValueError as e:
+        return Response({"detail":str(e)},status=HTTP_400_BAD_REQUEST)
+    try:
+        limit=int(request.query_params.get("limit",10))
+        if not 1<=limit<=feed.MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return Response({"detail":"invalid limit"},status=HTTP_400_BAD_REQUEST)
+    data=cache.cached(
+        request,"dashboard",(spec.key(),sorted(fields),limit),
+        lambda:dashboard.build(request.user,fields,spec,limit,request.data_version)
+    )
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
+def rollup(request):
+    spec=request.filters
+    try:
+        granularity=rollups.parse_granularity(request.query_params.get("granularity"))
+    except ValueError as e:
+        return Response({"detail":str(e)},status=HTTP_400_BAD_REQUEST)
+    buckets=cache.cached(
+        request,"rollup",(granularity,spec.key()),
+        lambda:rollups.rollup(request.user,granularity,spec)
+    )
+    return Response({"granularity":granularity,"buckets":buckets})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
+def search_transactions(request):
+    params=request.query_params
+    spec=request.filters
+    kind=params.get("kind")
+    try:
+        if kind and kind not in ("income","expense"):
+            raise ValueError("kind must be income or expense")
+        offset=max(int(params.get("offset",0)),0)
+        limit=min(max(int(params.get("limit",20)),1),search.MAX_LIMIT)
+    except ValueError as e:
+        return Response({"detail":str(e)},status=HTTP_400_BAD_REQUEST)
+    def compute():
+        rows,next_offset=search.search(request.user,spec,[kind] if kind else None,offset,limit)
+        return {"results":SearchResultSerializer(rows,many=True).data,"next_offset":next_offset}
+    return Response(cache.cached(request,"search",(spec.key(),kind,offset,limit),compute))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
+def trend(request):
+    # daily net with its moving average, from the user's cached history
+    spec=request.filters
+    try:
+        window=int(request.query_params.get("window",7))
+        if not 1<=window<=366:
+            raise ValueError
+    except ValueError:
+        return Response({"detail":"window must be a number of days from 1 to 366"},status=HTTP_400_BAD_REQUEST)
+    def compute():
+        points=analytics.moving_average(analytics.history(request.user,request.data_version),spec,window)
+        return TrendSerializer(points,many=True).data
+    return Response(cache.cached(request,"trend",(spec.key(),window),compute))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+def category_list(request):
+    return Response(cache.cached(request,"categories",(),lambda:categories.for_user(request.user)))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_transactions(request):
+    upload=request.FILES.get("file")
+    if upload is None:
+        return Response({"detail":"upload a statement as the 'file' field"},status=HTTP_400_BAD_REQUEST)
+    name=upload.name.lower()
+    format=request.data.get("format") or ("ofx" if name.endswith((".ofx",".qfx")) else "csv")
+    try:
+        columns=json.loads(request.data.get("columns") or "{}")
+        records=importers.reader(
+            upload.file,
+            format,
+            columns,
+            request.data.get("date_format") or "%Y-%m-%d",
+            request.data.get("category") or importers.DEFAULT_CATEGORY
+        )
+    except ValueError as e:
+        return Response({"detail":str(e)},status=HTTP_400_BAD_REQUEST)
+
+    def progress():
+        # one JSON line per committed batch, the last one has "done": true
+        for state in importers.run(request.user,records):
+            yield json.dumps(state.as_dict())+"\n"
+    return StreamingHttpResponse(progress(),content_type="application/x-ndjson")
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@routers.reporting
+@conditional.versioned
+@filters.parsed
 def export_csv(request):
-    response=HttpResponse(content_type='text/csv')
-    response['content-Disposition']='attachment; filename="transactions.csv"'
-    writer=csv.writer(response)
-    writer.writerow(['title','amount','category','date','notes'])
-    income=Income.objects.filter(user=request.user).order_by("-date")
-    income_data=[]
-    for i in income:
-        income_data.append({
-            "title":i.source,
-            "amount":i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    expense=Expense.objects.filter(user=request.user).order_by("-date")
-    expense_data=[]
-    for i in expense:
-        expense_data.append({
-            "title":i.title,
-            "amount":-1*i.amount,
-            "category":i.category,
-            "date":i.date,
-            "notes":i.notes
-        })
-    transactions=income_data+expense_data
-    transactions.sort(key=lambda x:x["date"],reverse=True)
-    for i in transactions:
-        writer.writerow([i['title'],i['amount'],i['category'],i['date'],i['notes']])
-    return response
+    rows=exports.merged_rows(
+        exports.income_rows(request.user,request.filters),
+        exports.expense_rows(request.user,request.filters)
+    )
+    return exports.csv_response(request,"transactions.csv",rows)
 
 token_generator=PasswordResetTokenGenerator()
 @api_view(['POST'])
@@ -339,17 +360,7 @@ def forgot_password(request):
             {"reset_link":reset_link}
         )
         
-        try:
-            message=Mail(
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to_emails=user.email,
-                subject="Expense Tracker password reset request",
-                html_content=html_content
-            )
-            sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-            sg.send(message)
-        except Exception as e:
-            print("sendgrid error:",e)
+        mail.enqueue(user.email,"Expense Tracker password reset request",html_content)
     return Response({"message":"If user exit, email sent"},status=HTTP_200_OK)
 
 
@@ -408,3 +419,14 @@ def reset_password(request):
 
     return Response({"message":"Password reset Successfully"},
                     status=HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response({
+        "summary":cache.get_summary_cache().stats(),
+        "auth":user_cache.stats(),
+        "categories":categories.category_cache.stats(),
+        "analytics":analytics.get_history_cache().stats()
+    })
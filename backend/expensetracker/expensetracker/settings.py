@@ -48,11 +48,26 @@ INSTALLED_APPS = [
 ]
 
 
+# proxies in front of the app that append to X-Forwarded-For, so the
+# throttles key on the client's address rather than on a header it can forge
+NUM_PROXIES = config("NUM_PROXIES", default="")
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'expenses.authentication.CookieJWTAuthentication',
        
-    )
+    ),
+    # token buckets per client IP and per user, see THROTTLING below
+    'DEFAULT_THROTTLE_CLASSES': (
+        'expenses.throttling.IPThrottle',
+        'expenses.throttling.UserThrottle',
+    ),
+    'NUM_PROXIES': int(NUM_PROXIES) if NUM_PROXIES else None,
+    # amounts go out as exact "12.50" strings, never floats
+    'DEFAULT_RENDERER_CLASSES': (
+        'expenses.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -95,10 +110,28 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# validated access tokens -> user snapshots kept per process; TTL bounds how long
+# another worker can keep serving a user deactivated elsewhere
+AUTH_USER_CACHE = {
+    "MAX_ENTRIES": 10000,
+    "TTL": 60,
+}
+
+# category name -> id kept per process; categories are shared and only added,
+# TTL bounds how long another worker can hand out one deleted in the admin
+CATEGORY_CACHE = {
+    "MAX_ENTRIES": 10000,
+    "TTL": 300,
+}
+
 MIDDLEWARE = [
+    "expenses.middleware.ProfilingMiddleware",
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "expenses.middleware.CompressionMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "expenses.middleware.PrimaryPinMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -137,13 +170,39 @@ WSGI_APPLICATION = 'expensetracker.wsgi.application'
 #         'NAME': BASE_DIR / 'db.sqlite3',
 #     }
 # }
+# DB_POOL=true swaps persistent connections for a psycopg 3 connection pool
+# per worker (Postgres only). DATABASE_REPLICA_URL adds a read replica that the
+# reporting views read from, see expenses/routers.py. Both URLs may be sqlite
+# for local runs, e.g. two copies of the same file.
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+
+
+def database(url):
+    local = url.startswith("sqlite")
+    db = dj_database_url.parse(url, conn_max_age=600, ssl_require=not local)
+    if DB_POOL and db["ENGINE"] == "django.db.backends.postgresql":
+        # pooled connections are returned to the pool after every request,
+        # CONN_MAX_AGE must be 0 with the pool option
+        db["CONN_MAX_AGE"] = 0
+        db.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
+        }
+    return db
+
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=config("DATABASE_URL"),
-        conn_max_age=600,
-        ssl_require=True
-    )
+    'default': database(config("DATABASE_URL"))
 }
+if config("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = database(config("DATABASE_REPLICA_URL"))
+    # under test the replica is the test database itself
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["expenses.routers.ReplicaRouter"]
+# seconds after a write during which the writer keeps reading from the primary
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=10, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -208,6 +267,8 @@ CORS_ALLOWED_ORIGINS = [
     "https://expense-tracker-zlgt.onrender.com"
 ]
 
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor","ETag","Server-Timing","Retry-After"]
+
 CSRF_TRUSTED_ORIGINS = [
     "https://expense-tracker-f87l.onrender.com",  # replace with your real Render backend URL
     "http://localhost:5173",
@@ -224,3 +285,75 @@ DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
 FRONTEND_URL=os.environ.get("FRONTEND_URL")
 SENDGRID_API_KEY=os.environ.get("SENDGRID_API_KEY")
 EMAIL_TIMEOUT = 10
+
+# emails are queued in OutboxEmail and sent by `manage.py send_outbox`;
+# TRANSPORT is "sendgrid", "smtp", "file" (writes .eml files) or "locmem".
+# Sent and failed emails are deleted after RETENTION_DAYS, their links are secrets
+EMAIL_OUTBOX = {
+    "TRANSPORT": os.environ.get("EMAIL_OUTBOX_TRANSPORT", "sendgrid"),
+    "FILE_PATH": os.environ.get("EMAIL_OUTBOX_FILE_PATH"),
+    "BATCH_SIZE": 50,
+    "MAX_ATTEMPTS": 6,
+    "BACKOFF_SECONDS": 30,
+    "RETENTION_DAYS": 7,
+}
+
+# per-user dashboard summary cache; "locmem" (single node), "redis" or "dummy"
+SUMMARY_CACHE = {
+    "BACKEND": os.environ.get("SUMMARY_CACHE_BACKEND", "locmem"),
+    "URL": os.environ.get("REDIS_URL"),
+    "MAX_ENTRIES": 2048,
+    "TIMEOUT": 300,
+}
+
+# token-bucket throttling, see expenses/throttling.py. RATES are
+# (capacity, tokens refilled per second); a request costs COSTS[url name] or
+# DEFAULT_COST. "memory" buckets are per process, "redis" ones are shared
+THROTTLING = {
+    "ENABLED": config("THROTTLE_ENABLED", default=True, cast=bool),
+    "BACKEND": os.environ.get("THROTTLE_BACKEND", "memory"),
+    "URL": os.environ.get("REDIS_URL"),
+    "RATES": {
+        "ip": (120, 2.0),
+        "user": (240, 4.0),
+    },
+    "COSTS": {
+        "health": 0,
+        "login_user": 10,
+        "register_user": 10,
+        "forgot-password": 10,
+        "reset-password": 10,
+        "verify-email": 5,
+        "bulk_expense": 5,
+        "bulk_income": 5,
+        "import-transactions": 30,
+        "export-csv": 20,
+        "async-export-csv": 20,
+        "async-expense-export-csv": 20,
+        "async-income-export-csv": 20,
+    },
+    "DEFAULT_COST": 1,
+}
+
+# request profiling, see expenses/profiling.py. Off by default; when on every
+# response carries Server-Timing and /metrics serves Prometheus histograms.
+# SAMPLE_RATE of requests are profiled into PROFILE_DIR (logged when unset)
+# with cProfile, or pyinstrument when PROFILER is "pyinstrument" and installed.
+# /metrics answers staff users, and scrapers sending "Bearer <METRICS_TOKEN>"
+PROFILING = {
+    "ENABLED": config("PROFILING_ENABLED", default=False, cast=bool),
+    "SAMPLE_RATE": config("PROFILING_SAMPLE_RATE", default=0.0, cast=float),
+    "PROFILER": config("PROFILING_PROFILER", default="cprofile"),
+    "PROFILE_DIR": config("PROFILING_DIR", default="") or None,
+    "DUPLICATE_THRESHOLD": 3,
+    "METRICS_TOKEN": config("METRICS_TOKEN", default="") or None,
+}
+
+# per-user typed-array histories behind /users/trend/, see expenses/analytics.py;
+# kept in process, up to MAX_USERS histories and MAX_ROWS rows per worker. When
+# ENABLED, totals and category breakdowns reuse a history already cached
+ANALYTICS = {
+    "ENABLED": config("ANALYTICS_ENABLED", default=False, cast=bool),
+    "MAX_USERS": 256,
+    "MAX_ROWS": 2000000,
+}
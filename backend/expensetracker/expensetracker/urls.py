@@ -16,10 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path,include
+from expenses.views import metrics_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/',include('expenses.urls.user_urls')),
     path('expense/',include('expenses.urls.expense_urls')),
     path('income/',include('expenses.urls.income_urls')),
+    path('async/',include('expenses.urls.async_urls')),
+    path('metrics',metrics_views.metrics,name='metrics'),
 ]
@@ -51,11 +51,12 @@ const PiechartIncome: React.FC = () => {
 
   const categoryFrequencies = useSelector(
     (state: RootState) => state.categoryIncome.income?.category_frequency
-  ) as number[] | undefined;
+  ) as string[] | undefined;
 
   // Ensure arrays
   const category_name: string[] = Array.isArray(categoryNames) ? categoryNames : [];
-  const category_frequency: number[] = Array.isArray(categoryFrequencies) ? categoryFrequencies : [];
+  // amounts arrive as decimal strings
+  const category_frequency: number[] = Array.isArray(categoryFrequencies) ? categoryFrequencies.map(Number) : [];
 
   // Chart.js Data
   const data: ChartData<"doughnut"> = {
@@ -83,12 +83,13 @@ const ExpenseScreen: React.FC = () => {
     | string[]
     | undefined;
   const categoryFrequencySelector = useSelector((s: RootState) => s.categoryExpense.expense?.category_frequency) as
-    | number[]
+    | string[]
     | undefined;
 
   const rows: ExpenseRow[] = Array.isArray(expenseSelector) ? expenseSelector : [];
   const catNames: string[] = Array.isArray(categoryNameSelector) ? categoryNameSelector : [];
-  const catFreqs: number[] = Array.isArray(categoryFrequencySelector) ? categoryFrequencySelector : [];
+  // amounts arrive as decimal strings
+  const catFreqs: number[] = Array.isArray(categoryFrequencySelector) ? categoryFrequencySelector.map(Number) : [];
   const userSelector=useSelector((s:RootState)=>s.userInfo)
   
   // Category filter
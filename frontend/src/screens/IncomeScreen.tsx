@@ -79,7 +79,7 @@ const IncomeScreen: React.FC = () => {
     | string[]
     | undefined;
   const categoryFrequencySelector = useSelector((s: RootState) => s.categoryIncome.income?.category_frequency) as
-    | number[]
+    | string[]
     | undefined;
   const userSelector = useSelector((s: RootState) => s.userInfo);
 
@@ -89,7 +89,8 @@ const IncomeScreen: React.FC = () => {
 
   const rows: IncomeRow[] = Array.isArray(incomeSelector) ? incomeSelector : [];
   const catNames: string[] = Array.isArray(categoryNameSelector) ? categoryNameSelector : [];
-  const catFreqs: number[] = Array.isArray(categoryFrequencySelector) ? categoryFrequencySelector : [];
+  // amounts arrive as decimal strings
+  const catFreqs: number[] = Array.isArray(categoryFrequencySelector) ? categoryFrequencySelector.map(Number) : [];
 
   const [category, setCategory] = useState<string>("__ALL__");
   const [isModalOpen, setModalOpen] = useState(false);